@@ -0,0 +1,134 @@
+"""
+Archivierung alter Transaktions-Monate (siehe partitions.py).
+
+archive_before() hängt jede Monatspartition vor dem angegebenen Monat ab (DETACH PARTITION),
+schreibt ihre Zeilen per COPY als gzip-komprimiertes CSV nach TRANSACTION_ARCHIVE_DIR,
+vermerkt die Datei in transaction_archives und löscht die Tabelle. Das Abhängen läuft in
+einer eigenen kurzen Transaktion, damit die Sperre auf transactions nicht für die Dauer des
+Exports gehalten wird; eine abgebrochene Archivierung setzt der nächste Lauf bei der bereits
+abgehängten Partition fort.
+
+read_archive() liest eine solche Datei wieder als Dictionaries mit den Typen der Spalten.
+"""
+import csv
+import gzip
+import hashlib
+import os
+from datetime import date, datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models, partitions
+from .config import settings
+
+COLUMNS = [column.name for column in models.Transaction.__table__.columns]
+_TYPES = {column.name: column.type.python_type for column in models.Transaction.__table__.columns}
+
+
+class ArchivedPartition(NamedTuple):
+    name: str
+    month: date
+    file_path: str
+    row_count: int
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _export(conn: Connection, name: str, path: str) -> int:
+    """Schreibt die Partition als CSV.gz nach path und liefert die Zeilenzahl."""
+    tmp_path = f"{path}.tmp"
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(tmp_path, "wb") as f:
+            cursor.copy_expert(
+                f"COPY (SELECT {', '.join(COLUMNS)} FROM {name} ORDER BY date, id) TO STDOUT WITH (FORMAT csv, HEADER)", f
+            )
+            row_count = cursor.rowcount
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+    os.replace(tmp_path, path)
+    return row_count
+
+
+def archive_partition(engine: Engine, partition: partitions.Partition, directory: str) -> ArchivedPartition:
+    if partition.attached:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {partitions.PARENT} DETACH PARTITION {partition.name}"))
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{partition.name}.csv.gz")
+    with engine.begin() as conn:
+        row_count = _export(conn, partition.name, path)
+        expected = conn.execute(text(f"SELECT count(*) FROM {partition.name}")).scalar()
+        if row_count != expected:
+            raise RuntimeError(f"{partition.name}: {row_count} von {expected} Zeilen exportiert")
+        conn.execute(text("""
+            INSERT INTO transaction_archives (month, partition_name, file_path, row_count, checksum)
+            VALUES (:month, :name, :path, :row_count, :checksum)
+            ON CONFLICT (month) DO UPDATE SET file_path = EXCLUDED.file_path, row_count = EXCLUDED.row_count,
+                checksum = EXCLUDED.checksum, archived_at = now()
+        """), {
+            "month": partition.start.date(), "name": partition.name, "path": path,
+            "row_count": row_count, "checksum": _sha256(path),
+        })
+        conn.execute(text(f"DROP TABLE {partition.name}"))
+    return ArchivedPartition(partition.name, partition.start.date(), path, row_count)
+
+
+def archive_before(engine: Engine, before: datetime, directory: Optional[str] = None) -> List[ArchivedPartition]:
+    """Archiviert alle Monatspartitionen, die vor dem Monat `before` enden."""
+    directory = directory or settings.TRANSACTION_ARCHIVE_DIR
+    before = partitions.month_start(before)
+    with engine.connect() as conn:
+        current = partitions.month_start(conn.execute(text("SELECT now()::timestamp")).scalar())
+        if before > current:
+            raise ValueError("Der laufende Monat kann nicht archiviert werden")
+        candidates = [p for p in partitions.list_partitions(conn) if p.end <= before]
+    archived = []
+    for partition in candidates:
+        result = archive_partition(engine, partition, directory)
+        print(f"{result.name}: {result.row_count} Zeilen -> {result.file_path}")
+        archived.append(result)
+    return archived
+
+
+def _convert(column: str, value: str):
+    # COPY schreibt NULL als leeres Feld; leere Strings sind für unsere Spalten gleichbedeutend
+    if value == "":
+        return None
+    python_type = _TYPES.get(column, str)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def read_archive(path: str) -> Iterator[Dict[str, object]]:
+    """Liest eine archivierte Partition; Werte in den Typen des Transaction-Modells."""
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {column: _convert(column, value) for column, value in row.items()}
+
+
+def archived_files(conn: Connection, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[str]:
+    """Archivdateien, deren Monat im Zeitraum [since, until) liegt, älteste zuerst."""
+    query = "SELECT file_path FROM transaction_archives WHERE 1 = 1"
+    params = {}
+    if since:
+        query += " AND month >= :since"
+        params["since"] = partitions.month_start(since).date()
+    if until:
+        query += " AND month < :until"
+        params["until"] = until
+    return [row[0] for row in conn.execute(text(query + " ORDER BY month"), params)]
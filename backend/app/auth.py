@@ -4,28 +4,38 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
-from . import crud, schemas, models
+from . import crud, schemas, models, tenancy, metrics
 from .config import settings
 from .database import get_db
 
-# Password Hashing Setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password Hashing Setup: passlib/bcrypt erst beim ersten Gebrauch laden (Cold Start)
+_pwd_context = None
+
+
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 # OAuth2 Scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/login", auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.bcrypt_timer("verify"):
+        return _get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hashes a plain password."""
-    return pwd_context.hash(password)
+    with metrics.bcrypt_timer("hash"):
+        return _get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -84,6 +94,7 @@ async def get_current_active_user(
             
         print(f"DEBUG: E-Mail aus Token extrahiert: {email}")
         token_data = schemas.TokenData(email=email)
+        claimed_tenant_id = tenancy.token_tenant_id(payload)
         
     except JWTError as e:
         print(f"DEBUG: JWT Error (Dekodierung fehlgeschlagen): {str(e)}")
@@ -102,14 +113,41 @@ async def get_current_active_user(
         print(f"DEBUG: FEHLER - User '{token_data.email}' ist inaktiv.")
         raise HTTPException(status_code=400, detail="Inactive user")
 
+    if claimed_tenant_id is not None and claimed_tenant_id != user.tenant_id:
+        print(f"DEBUG: FEHLER - Token für Mandant {claimed_tenant_id}, User gehört zu Mandant {user.tenant_id}.")
+        raise HTTPException(status_code=403, detail="Token belongs to a different tenant")
+
+    # Ab hier sieht diese Session nur noch Daten des eigenen Mandanten
+    tenancy.set_tenant(db, user.tenant_id)
+
     print(f"DEBUG: Login erfolgreich für User ID: {user.id}")
     return user
 
-async def get_current_tenant(db: Session = Depends(get_db)) -> models.Tenant:
-    # Minimal-Implementierung: Gibt den ersten Tenant zurück oder erstellt einen Standard-Tenant
-    tenant = db.query(models.Tenant).first()
+async def get_current_active_user_for_stream(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> schemas.User:
+    """
+    Wie get_current_active_user, akzeptiert den Token aber auch als ?access_token=,
+    da EventSource im Browser keine eigenen Header senden kann.
+    """
+    token = token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_active_user(token=token, db=db)
+
+async def get_current_tenant(
+    db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)
+) -> models.Tenant:
+    # Mandant des angemeldeten Users; der Standard-Mandant wird beim ersten Zugriff angelegt
+    tenant = db.query(models.Tenant).filter(models.Tenant.id == current_user.tenant_id).first()
     if not tenant:
-        tenant = models.Tenant(id=1, name="Default Tenant")
+        tenant = models.Tenant(id=current_user.tenant_id, name="Default Tenant")
         db.add(tenant)
         db.commit()
         db.refresh(tenant)
@@ -0,0 +1,106 @@
+"""
+Bonus auf Aufladungen, konfigurierbar pro Mandant (Tabellen bonus_schedules / bonus_tiers).
+
+Ein Bonusplan besteht aus Stufen "ab Betrag X gibt es Y Euro Bonus" und optional einem
+Gültigkeitszeitraum (Aktionen). Gilt zu einem Zeitpunkt mehr als ein Plan, gewinnt der mit
+dem spätesten Beginn; ein Plan ohne Beginn ist der Grundplan. Mandanten ohne eigene Pläne
+nutzen DEFAULT_BONUS_TIERS.
+
+Die Pläne werden pro Prozess zu sortierten Schwellwert-Arrays kompiliert und wie die
+Level-Regeln über tenants.bonus_version invalidiert (siehe tenant_cache.py); die Suche
+nach der Stufe ist ein bisect auf dem Array.
+"""
+from bisect import bisect_right
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .tenant_cache import TenantCache
+
+# Transaktionstyp, auf den ein Bonus gewährt wird
+TOPUP_TYPE = "Aufladung"
+
+# (ab Betrag, Bonus) – der bisher fest eingebaute Plan
+DEFAULT_BONUS_TIERS = [(50, 5), (100, 15), (150, 30), (300, 150)]
+
+
+class BonusResult(NamedTuple):
+    bonus: float
+    schedule_id: Optional[int]
+    schedule_name: Optional[str]
+
+
+class CompiledSchedule:
+    def __init__(self, schedule_id: Optional[int], name: Optional[str], valid_from: Optional[datetime],
+                 valid_until: Optional[datetime], tiers: Sequence[Tuple[float, float]]):
+        self.id = schedule_id
+        self.name = name
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        tiers = sorted(tiers)
+        self.thresholds = [float(min_amount) for min_amount, _ in tiers]
+        self.bonuses = [float(bonus) for _, bonus in tiers]
+
+    def is_active(self, at: datetime) -> bool:
+        return (self.valid_from is None or self.valid_from <= at) and (self.valid_until is None or at < self.valid_until)
+
+    def bonus_for(self, amount: float) -> float:
+        position = bisect_right(self.thresholds, amount)
+        return self.bonuses[position - 1] if position else 0.0
+
+
+class BonusIndex:
+    def __init__(self, schedules: List[CompiledSchedule]):
+        # Spätester Beginn zuerst; der Grundplan (ohne Beginn) zuletzt
+        self.schedules = sorted(schedules, key=lambda s: s.valid_from or datetime.min, reverse=True)
+
+    def active_schedule(self, at: Optional[datetime] = None) -> Optional[CompiledSchedule]:
+        at = at or datetime.now()
+        for schedule in self.schedules:
+            if schedule.is_active(at):
+                return schedule
+        return None
+
+    def bonus_for(self, amount: float, at: Optional[datetime] = None) -> BonusResult:
+        schedule = self.active_schedule(at)
+        if schedule is None:
+            return BonusResult(0.0, None, None)
+        return BonusResult(schedule.bonus_for(amount), schedule.id, schedule.name)
+
+
+DEFAULT_INDEX = BonusIndex([CompiledSchedule(None, "Standard", None, None, DEFAULT_BONUS_TIERS)])
+
+
+def _load(db: Session, tenant_id: int) -> BonusIndex:
+    schedules = db.query(models.BonusSchedule).filter(models.BonusSchedule.tenant_id == tenant_id).all()
+    if not schedules:
+        return DEFAULT_INDEX
+    tiers = {}
+    schedule_ids = [s.id for s in schedules]
+    for tier in db.query(models.BonusTier).filter(models.BonusTier.schedule_id.in_(schedule_ids)):
+        tiers.setdefault(tier.schedule_id, []).append((tier.min_amount, tier.bonus))
+    return BonusIndex([
+        CompiledSchedule(s.id, s.name, s.valid_from, s.valid_until, tiers.get(s.id, []))
+        for s in schedules
+    ])
+
+
+_cache = TenantCache(models.Tenant.bonus_version, _load, lambda: settings.RULES_CACHE_TTL_SECONDS)
+
+
+def get_index(db: Session, tenant_id: int) -> BonusIndex:
+    return _cache.get(db, tenant_id)
+
+
+def invalidate(tenant_id: Optional[int] = None):
+    _cache.invalidate(tenant_id)
+
+
+def calculate(db: Session, tenant_id: int, transaction_type: str, amount: float, at: Optional[datetime] = None) -> BonusResult:
+    """Bonus für eine Buchung; nur Aufladungen erhalten einen Bonus."""
+    if transaction_type != TOPUP_TYPE or amount <= 0:
+        return BonusResult(0.0, None, None)
+    return get_index(db, tenant_id).bonus_for(amount, at)
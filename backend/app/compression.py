@@ -0,0 +1,207 @@
+"""
+Komprimierung der API-Antworten (brotli/gzip) als ASGI-Middleware.
+
+Angelehnt an Starlettes GZipMiddleware, aber mit Aushandlung über Accept-Encoding
+(brotli bevorzugt, falls installiert), Mindestgröße und Ausnahmen pro Route.
+"""
+import zlib
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli ist optional, dann wird nur gzip angeboten
+    brotli = None
+
+# Diese Inhalte sind bereits komprimiert oder werden gestreamt.
+UNCOMPRESSIBLE_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "text/event-stream",
+)
+
+
+def _add_vary(message: Message) -> None:
+    """
+    Vary: Accept-Encoding für alle Antworten, die komprimiert werden könnten – auch wenn diese
+    konkrete Antwort unkomprimiert bleibt (zu klein, Client ohne gzip/br, 304). Sonst könnte ein
+    Cache die unkomprimierte Fassung an Clients ausliefern, die eine komprimierte erwarten, oder umgekehrt.
+    """
+    headers = MutableHeaders(raw=message["headers"])
+    if headers.get("content-type", "").startswith(UNCOMPRESSIBLE_CONTENT_TYPES):
+        return
+    headers.add_vary_header("Accept-Encoding")
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Wählt 'br' oder 'gzip' anhand des Accept-Encoding-Headers (inkl. q-Werten)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    def weight(encoding: str) -> float:
+        return accepted.get(encoding, accepted.get("*", 0.0))
+
+    if brotli is not None and weight("br") > 0 and weight("br") >= weight("gzip"):
+        return "br"
+    if weight("gzip") > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        exclude_paths: Iterable[str] = (),
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            async def send_with_vary(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    _add_vary(message)
+                await send(message)
+
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        if encoding == "br":
+            encoder = _BrotliEncoder(self.brotli_quality)
+        else:
+            encoder = _GzipEncoder(self.gzip_level)
+        responder = _CompressionResponder(self.app, encoder, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoder, minimum_size: int) -> None:
+        self.app = app
+        self.encoder = encoder
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _should_skip(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers:
+            return True
+        if message["status"] in (204, 304):
+            return True
+        return headers.get("content-type", "").startswith(UNCOMPRESSIBLE_CONTENT_TYPES)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Header erst senden, wenn klar ist, ob komprimiert wird.
+            self.initial_message = message
+            self.passthrough = self._should_skip(message)
+            if "content-encoding" not in Headers(raw=message["headers"]):
+                _add_vary(message)
+            return
+
+        if message_type != "http.response.body":
+            # z.B. http.response.pathsend: Header unverändert vorausschicken
+            if not self.started:
+                self.started = True
+                self.passthrough = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        if not self.started:
+            self.started = True
+            if len(body) < self.minimum_size and not more_body:
+                # Kleine Antworten lohnen die Komprimierung nicht.
+                await self.send(self.initial_message)
+                await self.send(message)
+                self.passthrough = True
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoder.name
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.encoder.compress(body)
+            else:
+                message["body"] = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        # Weitere Teile einer gestreamten Antwort
+        message["body"] = self.encoder.compress(body) if more_body else self.encoder.finish(body)
+        await self.send(message)
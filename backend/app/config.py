@@ -1,3 +1,6 @@
+import os
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,6 +15,98 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
+    # Mandant für anonyme Anfragen, deren Host keiner Hundeschule zugeordnet ist (tenancy.py)
+    DEFAULT_TENANT_ID: int = 1
+
+    # Tabellen beim Start per create_all anlegen (nur lokale Entwicklung; sonst migrate_db.py)
+    DB_CREATE_ALL_ON_STARTUP: bool = False
+
+    # Antworten unterhalb dieser Größe (Bytes) werden nicht komprimiert
+    COMPRESSION_MIN_SIZE: int = 1024
+
+    # Aufbewahrungsdauer gespeicherter Antworten zu Idempotency-Keys
+    IDEMPOTENCY_TTL_HOURS: int = 24
+
+    # Delta-Sync (/api/sync): der Cursor geht höchstens so weit hinter die aktuelle Zeit zurück,
+    # auch wenn eine Transaktion länger offen ist (z.B. eine hängende "idle in transaction"-Sitzung)
+    SYNC_CURSOR_MAX_LOOKBACK_SECONDS: int = 300
+
+    # Größenlimits für Uploads (MB)
+    UPLOAD_MAX_DOCUMENT_MB: int = 20
+    UPLOAD_MAX_IMAGE_MB: int = 15
+
+    # Bild-Uploads: Breiten der WebP-Varianten, Qualität und Anzahl paralleler Worker
+    IMAGE_RENDITION_WIDTHS: List[int] = [320, 640, 1024, 1600]
+    IMAGE_DEFAULT_WIDTH: int = 1024
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_WORKERS: int = 2
+
+    # Gültigkeit signierter Dokument-URLs; zwischengespeicherte URLs werden nur
+    # wiederverwendet, solange sie noch mindestens SIGNED_URL_MIN_REMAINING_SECONDS gelten
+    SIGNED_URL_TTL_SECONDS: int = 600
+    SIGNED_URL_MIN_REMAINING_SECONDS: int = 60
+
+    # Datei-Storage: "supabase" oder "local" (Dateisystem, siehe storage.py)
+    STORAGE_BACKEND: str = "supabase"
+    # Eigenes Verzeichnis für Kundendokumente, in .gitignore (nicht das alte backend/uploads)
+    LOCAL_STORAGE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage")
+    # Basis-URL der API für lokal signierte URLs, z.B. "https://api.example.com" (leer = relative URLs)
+    STORAGE_PUBLIC_BASE_URL: str = ""
+    # Interner nginx-Pfad für X-Accel-Redirect (leer = Datei direkt aus der App senden)
+    LOCAL_STORAGE_ACCEL_REDIRECT: str = ""
+
+    # Aufrufe an Supabase (siehe remote.py): Timeout pro Versuch, Wiederholungen,
+    # Circuit Breaker (Fehler in Folge bis zum Öffnen, Sekunden bis zum Probeaufruf)
+    REMOTE_TIMEOUT_SECONDS: float = 10.0
+    REMOTE_RETRIES: int = 2
+    REMOTE_RETRY_BASE_SECONDS: float = 0.2
+    REMOTE_BREAKER_THRESHOLD: int = 5
+    REMOTE_BREAKER_RESET_SECONDS: float = 30.0
+    REMOTE_MAX_WORKERS: int = 8
+
+    # Auth-Outbox (outbox.py): Batchgröße, Versuche bis 'failed', Basis des Backoffs,
+    # Abfrageintervall des Workers (0 = nur nach Commits) und Aufbewahrung erledigter Einträge
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: float = 5.0
+    OUTBOX_POLL_SECONDS: float = 30.0
+    OUTBOX_RETENTION_DAYS: int = 7
+
+    # Transaktions-Partitionen (partitions.py): so viele Monate im Voraus anlegen;
+    # Zielverzeichnis für archivierte Monate (archive.py)
+    TRANSACTION_PARTITION_MONTHS_AHEAD: int = 3
+    # Bearer-Token der geplanten Aufgaben unter /api/cron/... (Vercel setzt es aus CRON_SECRET)
+    CRON_SECRET: str = ""
+    # In .gitignore: die Exporte enthalten das Kundenbuch
+    TRANSACTION_ARCHIVE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive")
+
+    # Login-Drossel (throttle.py): Token-Bucket je IP und je Konto (Burst, Nachfüllrate pro Sekunde),
+    # Sperre ab so vielen Fehlversuchen innerhalb des Fensters, Dauer verdoppelt sich bis zum Maximum;
+    # SHARED zählt zusätzlich in der DB (alle Worker), MAX_KEYS begrenzt den Speicher pro Prozess
+    LOGIN_IP_BURST: int = 20
+    LOGIN_IP_PER_SECOND: float = 0.5
+    LOGIN_IP_BACKOFF_AFTER: int = 20
+    LOGIN_ACCOUNT_BURST: int = 5
+    LOGIN_ACCOUNT_PER_SECOND: float = 0.05
+    LOGIN_ACCOUNT_BACKOFF_AFTER: int = 5
+    LOGIN_FAILURE_WINDOW_SECONDS: float = 900.0
+    LOGIN_BACKOFF_BASE_SECONDS: float = 2.0
+    LOGIN_BACKOFF_MAX_SECONDS: float = 900.0
+    LOGIN_THROTTLE_SHARED: bool = True
+    LOGIN_THROTTLE_MAX_KEYS: int = 10000
+    # Proxies (IPs/CIDRs, kommagetrennt), deren X-Forwarded-For vertraut wird; sonst zählt die
+    # Absender-Adresse der Verbindung. "*": jeder Absender, nur wenn die Plattform den Header
+    # selbst setzt (Vercel überschreibt X-Forwarded-For, dort daher Standard)
+    TRUSTED_PROXIES: str = "*" if os.environ.get("VERCEL") else ""
+
+    # Prometheus-Metriken unter /metrics (metrics.py), nur mit "Authorization: Bearer <Token>".
+    # Standardmäßig aus; ohne METRICS_TOKEN antwortet /metrics auch bei METRICS_ENABLED mit 404.
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str = ""
+
+    # Sekunden, nach denen ein Prozess prüft, ob ein anderer die Level-Regeln oder Bonuspläne geändert hat
+    RULES_CACHE_TTL_SECONDS: float = 30.0
+
     class Config:
         env_file = "../.env"
         extra = "ignore"
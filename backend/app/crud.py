@@ -1,37 +1,162 @@
 from sqlalchemy.orm import Session
-from . import models, schemas, auth
+from sqlalchemy import event, func, text
+from . import models, schemas, auth, events, outbox, rules, bonus, tenancy
+from .config import settings
 from fastapi import HTTPException
+import json
 import secrets
+from datetime import datetime, timedelta
 from typing import List, Optional
 
-# In backend/app/crud.py (ganz oben)
+# --- DATENVERSION (ETag) ---
+_TOUCHED_KEY = "touched_tenants"
 
-LEVEL_REQUIREMENTS = {
-  # Level 1 (Welpen) hat keine Anforderungen für den Aufstieg.
-  2: [{"id": 'group_class', "name": 'Gruppenstunde', "required": 6}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
-  3: [{"id": 'group_class', "name": 'Gruppenstunde', "required": 6}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
-  4: [{"id": 'social_walk', "name": 'Social Walk', "required": 6}, {"id": 'tavern_training', "name": 'Wirtshaustraining', "required": 2}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
-  5: [{"id": 'exam', "name": 'Prüfung', "required": 1}],
-}
 
-# In backend/app/crud.py
+def touch_tenant(db: Session, tenant_id: int):
+    """
+    Merkt den Mandanten für bump_data_versions() vor. Die Zeile in tenants teilen sich alle
+    Schreibzugriffe eines Mandanten; hochgezählt wird sie daher erst unmittelbar vor dem
+    Commit, damit die Zeilensperre nur für die Dauer des Commits gehalten wird.
+    """
+    db.info.setdefault(_TOUCHED_KEY, set()).add(tenant_id)
+
+
+def bump_data_versions(db: Session):
+    """Zählt die Datenversion der vorgemerkten Mandanten hoch (im selben Commit wie die Änderung)."""
+    tenant_ids = sorted(db.info.pop(_TOUCHED_KEY, ()))
+    if tenant_ids:
+        db.query(models.Tenant).filter(models.Tenant.id.in_(tenant_ids)).update(
+            {models.Tenant.data_version: models.Tenant.data_version + 1}, synchronize_session=False
+        )
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_before_commit(session):
+    # Sessions mit events.defer() (z.B. /api/batch) geben beim Commit nur einen Savepoint frei;
+    # dort ruft der Aufrufer bump_data_versions() vor dem echten Commit auf.
+    if not events.is_deferred(session):
+        bump_data_versions(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_touched(session, previous_transaction):
+    if not events.is_deferred(session):
+        session.info.pop(_TOUCHED_KEY, None)
+
+
+def get_data_version(db: Session, tenant_id: int) -> Optional[int]:
+    return db.query(models.Tenant.data_version).filter(models.Tenant.id == tenant_id).scalar()
+
+
+# --- IDEMPOTENZ ---
+def get_idempotency_record(db: Session, user_id: int, key: str):
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.expires_at > datetime.now(),
+    ).first()
+
+
+def reserve_idempotency_key(db: Session, user_id: int, key: str, request_hash: str, ttl: timedelta):
+    """
+    Legt den Schlüssel in der laufenden Transaktion an (noch ohne Antwort). Er wird
+    zusammen mit der eigentlichen Schreiboperation committet; ein paralleler Duplikat-
+    Request scheitert dadurch am Unique-Index. Abgelaufene Schlüssel werden dabei entfernt.
+    """
+    purge_expired_idempotency_keys(db)
+    record = models.IdempotencyKey(
+        user_id=user_id, key=key, request_hash=request_hash, expires_at=datetime.now() + ttl
+    )
+    db.add(record)
+    db.flush()
+    return record
+
+
+def complete_idempotency_key(db: Session, record: models.IdempotencyKey, status_code: int, response_body: str):
+    record.status_code = status_code
+    record.response_body = response_body
+    db.add(record)
+    db.commit()
+
+
+def purge_expired_idempotency_keys(db: Session):
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.expires_at <= datetime.now()
+    ).delete(synchronize_session=False)
+
+
+# --- AUTH-OUTBOX (Supabase-Synchronisation) ---
+def enqueue_auth_sync(db: Session, operation: str, email: str, user_id: int = None, **payload):
+    """
+    Merkt eine Änderung für Supabase Auth vor, ohne zu committen: Der Eintrag wird mit dem
+    nächsten Commit der lokalen Änderung gespeichert (oder mit ihr verworfen).
+    """
+    payload = {k: v for k, v in payload.items() if v is not None and v is not False}
+    entry = models.AuthOutbox(
+        operation=operation, user_id=user_id, email=email,
+        payload=json.dumps(payload) if payload else None, status='pending', attempts=0
+    )
+    db.add(entry)
+    outbox.schedule(db)
+    return entry
+
+
+def claim_auth_outbox_batch(db: Session, limit: int):
+    """Fällige Einträge in Reihenfolge; parallel laufende Worker überspringen gesperrte Zeilen."""
+    return db.query(models.AuthOutbox).filter(
+        models.AuthOutbox.status == 'pending',
+        models.AuthOutbox.next_attempt_at <= datetime.now(),
+    ).order_by(models.AuthOutbox.id).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def get_auth_outbox_stats(db: Session, failed_limit: int = 20):
+    counts = dict(
+        db.query(models.AuthOutbox.status, func.count(models.AuthOutbox.id))
+        .group_by(models.AuthOutbox.status).all()
+    )
+    oldest_pending = db.query(func.min(models.AuthOutbox.created_at)).filter(
+        models.AuthOutbox.status == 'pending'
+    ).scalar()
+    failed = db.query(models.AuthOutbox).filter(
+        models.AuthOutbox.status == 'failed'
+    ).order_by(models.AuthOutbox.id.desc()).limit(failed_limit).all()
+    return schemas.AuthSyncStatus(
+        pending=counts.get('pending', 0),
+        done=counts.get('done', 0),
+        failed=counts.get('failed', 0),
+        oldest_pending_at=oldest_pending,
+        recent_failures=failed,
+    )
+
+
+def retry_failed_auth_sync(db: Session) -> int:
+    count = db.query(models.AuthOutbox).filter(models.AuthOutbox.status == 'failed').update(
+        {"status": "pending", "attempts": 0, "next_attempt_at": datetime.now()}, synchronize_session=False
+    )
+    outbox.schedule(db)
+    db.commit()
+    return count
 
-DOGLICENSE_PREREQS = [
-    {"id": 'lecture_bonding', "name": 'Vortrag Bindung & Beziehung', "required": 1},
-    {"id": 'lecture_hunting', "name": 'Vortrag Jagdverhalten', "required": 1},
-    {"id": 'ws_communication', "name": 'WS Kommunikation & Körpersprache', "required": 1},
-    {"id": 'ws_stress', "name": 'WS Stress & Impulskontrolle', "required": 1},
-    {"id": 'theory_license', "name": 'Theorieabend Hundeführerschein', "required": 1},
-    {"id": 'first_aid', "name": 'Erste-Hilfe-Kurs', "required": 1},
-]
 
 # --- USER ---
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
+def get_user_for_update(db: Session, user_id: int):
+    """
+    Lädt den Benutzer mit Zeilensperre (SELECT ... FOR UPDATE) bis zum Commit. Für alle
+    Schreibzugriffe auf users: parallele Buchungen warten aufeinander, statt Guthaben zu
+    überschreiben oder an der Versionsprüfung (version_id_col) zu scheitern.
+    """
+    return db.query(models.User).filter(models.User.id == user_id).with_for_update().populate_existing().first()
+
+
 def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+    # E-Mail-Adressen sind mandantenübergreifend eindeutig (ein Supabase-Auth für alle)
+    return db.query(models.User).filter(models.User.email == email).execution_options(
+        **{tenancy.ALL_TENANTS: True}
+    ).first()
 
 
 def get_users(db: Session, skip: int = 0, limit: int = 100, portfolio_of_user_id: Optional[int] = None):
@@ -69,8 +194,10 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.commit()
     db.refresh(db_user)
     for dog_data in user.dogs:
-        db_dog = models.Dog(**dog_data.model_dump(), owner_id=db_user.id)
+        db_dog = models.Dog(**dog_data.model_dump(), owner_id=db_user.id, tenant_id=db_user.tenant_id)
         db.add(db_dog)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.created", user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -80,52 +207,69 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 # In backend/app/crud.py
 
-def are_prerequisites_met_for_exam(db: Session, customer: models.User) -> bool:
-    """
-    Prüft, ob ein Kunde alle Nicht-Prüfungs-Anforderungen für sein aktuelles Level
-    oder für den Hundeführerschein (Level 5) erfüllt hat.
-    """
-    current_level_id = customer.level_id
+def get_achievement_counts(db: Session, user_id: int) -> dict:
+    """Zählt die unverbrauchten Leistungen eines Kunden pro requirement_id (eine GROUP BY-Abfrage)."""
+    rows = db.query(models.Achievement.requirement_id, func.count(models.Achievement.id)).filter(
+        models.Achievement.user_id == user_id,
+        models.Achievement.is_consumed == False
+    ).group_by(models.Achievement.requirement_id).all()
+    return {req_id: count for req_id, count in rows}
 
-    # *** NEU: Sonderlogik für den Hundeführerschein (Level 5) ***
-    if current_level_id == 5:
-        print("DEBUG: Prüfe Voraussetzungen für Level 5 (Hundeführerschein).")
-        prereqs = DOGLICENSE_PREREQS
-    else:
-        # Bestehende Logik für alle anderen Level
-        requirements_for_level = LEVEL_REQUIREMENTS.get(current_level_id, [])
-        if not requirements_for_level:
-            return True  # Keine Anforderungen, also ist die Prüfung erlaubt.
-        prereqs = [req for req in requirements_for_level if req.get("id") != 'exam']
 
-    if not prereqs:
+def are_prerequisites_met_for_exam(db: Session, customer: models.User, achievement_counts: Optional[dict] = None) -> bool:
+    """
+    Prüft, ob ein Kunde alle Nicht-Prüfungs-Anforderungen seines aktuellen Levels erfüllt hat
+    (beim Hundeführerschein sind das die Zusatzveranstaltungen).
+    """
+    index = rules.get_index(db, customer.tenant_id)
+    if not index.exam_prereqs.get(customer.level_id):
         return True  # Es gibt keine Voraussetzungen außer der Prüfung.
 
     # Zähle alle bisherigen, unverbrauchten Leistungen des Kunden.
-    unconsumed_achievements = db.query(models.Achievement).filter(
-        models.Achievement.user_id == customer.id,
-        models.Achievement.is_consumed == False
-    ).all()
-
-    achievement_counts = {}
-    for ach in unconsumed_achievements:
-        req_id = ach.requirement_id
-        achievement_counts[req_id] = achievement_counts.get(req_id, 0) + 1
+    if achievement_counts is None:
+        achievement_counts = get_achievement_counts(db, customer.id)
+
+    return index.exam_unlocked(customer.level_id, achievement_counts)
+
+
+def get_eligibility(db: Session, customer: models.User, achievement_counts: Optional[dict] = None) -> schemas.Eligibility:
+    """Fortschritt, Prüfungs- und Aufstiegsberechtigung eines Kunden nach den Regeln seines Mandanten."""
+    if achievement_counts is None:
+        achievement_counts = get_achievement_counts(db, customer.id)
+    result = rules.get_index(db, customer.tenant_id).evaluate(customer.level_id, achievement_counts)
+    return schemas.Eligibility(
+        level_id=result.level_id,
+        requirements=[
+            schemas.RequirementProgress(id=req.id, name=req.name, required=req.required, completed=completed)
+            for req, completed in result.progress
+        ],
+        exam_unlocked=result.exam_unlocked,
+        level_up_eligible=result.level_up_eligible,
+    )
 
-    # Prüfe für jede Anforderung, ob die benötigte Anzahl erreicht ist.
-    for req in prereqs:
-        req_id = req.get("id")
-        required_amount = req.get("required")
-        if achievement_counts.get(req_id, 0) < required_amount:
-            print(
-                f"DEBUG: Voraussetzung '{req_id}' nicht erfüllt. Benötigt: {required_amount}, Vorhanden: {achievement_counts.get(req_id, 0)}")
-            return False  # Eine Voraussetzung ist nicht erfüllt.
 
-    print("DEBUG: Alle Voraussetzungen für die Prüfung sind erfüllt.")
-    return True  # Alle Voraussetzungen sind erfüllt.
+def get_customer_aggregate(db: Session, customer: models.User, new_achievements: Optional[list] = None) -> schemas.CustomerAggregate:
+    """
+    Stellt den Stand eines Kunden nach einer Schreiboperation zusammen (Guthaben,
+    neue Leistungen, Fortschritt, Prüfungs- und Aufstiegsberechtigung).
+    Wird vor dem Commit aufgerufen, damit alles aus derselben DB-Transaktion stammt.
+    """
+    db.flush()
+    eligibility = get_eligibility(db, customer)
+    return schemas.CustomerAggregate(
+        user_id=customer.id,
+        balance=customer.balance,
+        level_id=customer.level_id,
+        is_vip=customer.is_vip,
+        is_expert=customer.is_expert,
+        new_achievements=[schemas.Achievement.model_validate(ach) for ach in (new_achievements or [])],
+        requirements=eligibility.requirements,
+        exam_unlocked=eligibility.exam_unlocked,
+        level_up_eligible=eligibility.level_up_eligible,
+    )
 
 def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
-    db_user = get_user(db, user_id=user_id)
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         return None
 
@@ -142,33 +286,47 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
         setattr(db_user, key, value)
 
     db.add(db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.updated", user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def update_user_vip_status(db: Session, user_id: int, is_vip: bool):
-    db_user = get_user(db, user_id=user_id)
+def update_user_vip_status(db: Session, user_id: int, is_vip: bool, with_aggregate: bool = False):
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         return None
     db_user.is_vip = is_vip
     db.add(db_user)
+    if with_aggregate:
+        aggregate = get_customer_aggregate(db, db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.updated", user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
+    if with_aggregate:
+        db_user.aggregate = aggregate
     return db_user
 
-def update_user_expert_status(db: Session, user_id: int, is_expert: bool):
-    db_user = get_user(db, user_id=user_id)
+def update_user_expert_status(db: Session, user_id: int, is_expert: bool, with_aggregate: bool = False):
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         return None
     db_user.is_expert = is_expert
     db.add(db_user)
+    if with_aggregate:
+        aggregate = get_customer_aggregate(db, db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.updated", user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
+    if with_aggregate:
+        db_user.aggregate = aggregate
     return db_user
 
 # In backend/app/crud.py
-def update_user_status(db: Session, user_id: int, status: schemas.UserStatusUpdate):
-    db_user = get_user(db, user_id=user_id)
+def update_user_status(db: Session, user_id: int, status: schemas.UserStatusUpdate, with_aggregate: bool = False):
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         return None
 
@@ -185,40 +343,39 @@ def update_user_status(db: Session, user_id: int, status: schemas.UserStatusUpda
         setattr(db_user, key, value)
 
     db.add(db_user)
+    if with_aggregate:
+        aggregate = get_customer_aggregate(db, db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.updated", user_id=db_user.id)
     db.commit()
     db.refresh(db_user)
+    if with_aggregate:
+        db_user.aggregate = aggregate
     return db_user
 
 def delete_user(db: Session, user_id: int):
-    db_user = get_user(db, user_id=user_id)
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         return None
     db.delete(db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.deleted", user_id=db_user.id)
     db.commit()
     return {"ok": True}
 
 # --- TRANSACTION ---
 # In backend/app/crud.py
 
-def create_transaction(db: Session, transaction: schemas.TransactionCreate, booked_by: models.User):
-    customer = get_user(db, user_id=transaction.user_id)
+def create_transaction(db: Session, transaction: schemas.TransactionCreate, booked_by: models.User, with_aggregate: bool = False):
+    customer = get_user_for_update(db, user_id=transaction.user_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    # Bonus Logic
+    # Bonus nur bei Aufladungen, nach dem aktuell gültigen Bonusplan des Mandanten
     amount_to_add = transaction.amount
-    bonus = 0
-    if transaction.type == "Aufladung":  # Bonus nur bei Aufladungen
-        if amount_to_add >= 300:
-            bonus = 150
-        elif amount_to_add >= 150:
-            bonus = 30
-        elif amount_to_add >= 100:
-            bonus = 15
-        elif amount_to_add >= 50:
-            bonus = 5
-
-    total_change = amount_to_add + bonus
+    topup_bonus = bonus.calculate(db, customer.tenant_id, transaction.type, amount_to_add).bonus
+
+    total_change = amount_to_add + topup_bonus
 
     # Update customer balance
     customer.balance += total_change
@@ -226,17 +383,20 @@ def create_transaction(db: Session, transaction: schemas.TransactionCreate, book
 
     # Transaktion in der DB anlegen
     db_transaction = models.Transaction(
+        tenant_id=customer.tenant_id,
         user_id=customer.id,
         type=transaction.type,
         description=transaction.description,
         amount=total_change,
         balance_after=customer.balance,
+        bonus=topup_bonus,
         booked_by_id=booked_by.id
     )
     db.add(db_transaction)
     db.flush()  # Wichtig, um eine ID für die Transaktion zu bekommen
 
     # *** HIER IST DIE NEUE LOGIK FÜR ACHIEVEMENTS ***
+    new_achievements = []
     if transaction.requirement_id:
         can_create_achievement = True
 
@@ -250,39 +410,213 @@ def create_transaction(db: Session, transaction: schemas.TransactionCreate, book
         # Achievement nur erstellen, wenn die Prüfung erlaubt ist ODER es keine Prüfung ist.
         if can_create_achievement:
             print(f"DEBUG: Achievement '{transaction.requirement_id}' wird für User {customer.id} erstellt.")
-            create_achievement(
+            new_achievements.append(create_achievement(
                 db,
+                tenant_id=customer.tenant_id,
                 user_id=customer.id,
                 requirement_id=transaction.requirement_id,
                 transaction_id=db_transaction.id
-            )
+            ))
+
+    if with_aggregate:
+        aggregate = get_customer_aggregate(db, customer, new_achievements)
 
+    touch_tenant(db, customer.tenant_id)
+    events.emit(
+        db, customer.tenant_id, "transaction.created",
+        id=db_transaction.id, user_id=customer.id, balance=customer.balance,
+        achievements=[a.requirement_id for a in new_achievements],
+    )
     db.commit()
     db.refresh(db_transaction)
+    if with_aggregate:
+        db_transaction.aggregate = aggregate
     return db_transaction
 
-def get_transactions(db: Session, skip: int = 0, limit: int = 100):
-    """Holt eine Liste von Transaktionen, die neuesten zuerst."""
-    return db.query(models.Transaction).order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all()
+def _transactions_since(query, since: Optional[datetime]):
+    # Mit Untergrenze auf date liest Postgres nur die Monatspartitionen ab 'since' (partitions.py)
+    if since is not None:
+        query = query.filter(models.Transaction.date >= since)
+    return query
 
 
-def get_transactions_for_user(db: Session, user_id: int, for_staff: bool = False):
+def get_transactions(db: Session, skip: int = 0, limit: int = 100, since: Optional[datetime] = None):
+    """Holt eine Liste von Transaktionen, die neuesten zuerst; optional nur ab 'since'."""
+    query = _transactions_since(db.query(models.Transaction), since)
+    return query.order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all()
+
+
+def get_transactions_for_user(db: Session, user_id: int, for_staff: bool = False, since: Optional[datetime] = None):
     """
-    Holt Transaktionen.
+    Holt Transaktionen, optional nur ab 'since'.
     - Wenn for_staff=False, holt es alle Transaktionen des Kunden (user_id).
     - Wenn for_staff=True, holt es alle Transaktionen, die vom Mitarbeiter (user_id) gebucht wurden.
     """
     if for_staff:
         # Filter nach der 'booked_by_id' Spalte für Mitarbeiter
-        return db.query(models.Transaction).filter(models.Transaction.booked_by_id == user_id).order_by(models.Transaction.date.desc()).all()
+        query = db.query(models.Transaction).filter(models.Transaction.booked_by_id == user_id)
     else:
         # Filter nach der 'user_id' Spalte für Kunden
-        return db.query(models.Transaction).filter(models.Transaction.user_id == user_id).order_by(models.Transaction.date.desc()).all()
+        query = db.query(models.Transaction).filter(models.Transaction.user_id == user_id)
+    return _transactions_since(query, since).order_by(models.Transaction.date.desc()).all()
+
+# --- DASHBOARD ---
+def get_dashboard(db: Session, current_user: models.User, recent_limit: int = 5, active_limit: int = 4):
+    """
+    Berechnet die Dashboard-Kennzahlen direkt in der Datenbank.
+    - admin: alle Kunden und alle Transaktionen
+    - mitarbeiter: nur selbst gebuchte Transaktionen und die Kunden daraus (wie im Frontend)
+    - kunde: nur das eigene Konto und die eigenen Transaktionen
+    """
+    now = datetime.now()
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = start_of_day.replace(day=1)
+
+    customers = db.query(models.User).filter(models.User.role == 'kunde')
+    transactions = db.query(models.Transaction)
+    if current_user.role == 'kunde':
+        customers = db.query(models.User).filter(models.User.id == current_user.id)
+        transactions = transactions.filter(models.Transaction.user_id == current_user.id)
+    elif current_user.role == 'mitarbeiter':
+        transactions = transactions.filter(models.Transaction.booked_by_id == current_user.id)
+        customers = customers.filter(models.User.id.in_(transactions.with_entities(models.Transaction.user_id)))
+
+    customer_count, total_credit = customers.with_entities(
+        func.count(models.User.id), func.coalesce(func.sum(models.User.balance), 0.0)
+    ).one()
+
+    # Nur die Partition des laufenden Monats lesen
+    month_transactions = transactions.filter(models.Transaction.date >= start_of_month)
+
+    transactions_today, transactions_month = month_transactions.with_entities(
+        func.count(models.Transaction.id).filter(models.Transaction.date >= start_of_day),
+        func.count(models.Transaction.id),
+    ).one()
+
+    # Kunden mit Transaktionen im laufenden Monat, zuletzt aktive zuerst
+    month_activity = month_transactions.with_entities(
+        models.Transaction.user_id.label('user_id'),
+        func.max(models.Transaction.date).label('last_date'),
+    ).group_by(models.Transaction.user_id).subquery()
+
+    active_customers_month = customers.join(
+        month_activity, month_activity.c.user_id == models.User.id
+    ).count()
+
+    first_dog = db.query(models.Dog.name).filter(
+        models.Dog.owner_id == models.User.id
+    ).order_by(models.Dog.id).limit(1).correlate(models.User).scalar_subquery()
+
+    active_rows = customers.join(
+        month_activity, month_activity.c.user_id == models.User.id
+    ).with_entities(
+        models.User.id, models.User.name, models.User.balance, first_dog.label('dog_name')
+    ).order_by(month_activity.c.last_date.desc()).limit(active_limit).all()
+
+    recent_rows = transactions.join(
+        models.User, models.User.id == models.Transaction.user_id
+    ).with_entities(
+        models.Transaction.id,
+        models.Transaction.user_id,
+        models.User.name.label('customer_name'),
+        models.Transaction.date,
+        models.Transaction.type,
+        models.Transaction.description,
+        models.Transaction.amount,
+    ).order_by(models.Transaction.date.desc()).limit(recent_limit).all()
+
+    return {
+        "customer_count": customer_count,
+        "total_credit": total_credit or 0.0,
+        "transactions_today": transactions_today,
+        "transactions_month": transactions_month,
+        "active_customers_month": active_customers_month,
+        "active_customers": [row._asdict() for row in active_rows],
+        "recent_transactions": [row._asdict() for row in recent_rows],
+    }
+
+# --- DELTA-SYNC ---
+# Zusätzliche Reserve für den Cursor. Die eigentliche Absicherung gegen lange Transaktionen
+# ist _sync_cursor; Clients übernehmen Zeilen anhand von (id, version), doppelte Lieferungen
+# sind harmlos.
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+
+def _sync_cursor(db: Session) -> datetime:
+    """
+    Cursor für den nächsten Abruf: Beginn der ältesten noch offenen Transaktion der DB,
+    höchstens die aktuelle Uhrzeit. Eine Transaktion, die jetzt noch nicht committet ist,
+    schreibt updated_at = clock_timestamp() >= ihrem Beginn und wird daher beim nächsten
+    Abruf erfasst, egal wie lange sie läuft. Muss vor dem Lesen der Zeilen abgefragt werden.
+
+    Berücksichtigt nur Backends derselben DB und derselben Rolle wie die App: fremde Rollen
+    schreiben nicht über die App, und deren xact_start wäre ohne die Rolle pg_read_all_stats
+    (GRANT pg_read_all_stats TO <app-rolle>) ohnehin NULL. Transaktionen, die länger als
+    SYNC_CURSOR_MAX_LOOKBACK_SECONDS offen sind, halten den Cursor nicht weiter zurück;
+    ihre Änderungen deckt dann nur noch die Erst-Synchronisation ab.
+    """
+    return db.execute(text("""
+        SELECT least(clock_timestamp(), min(xact_start))
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND usename = current_user
+          AND xact_start IS NOT NULL AND pid <> pg_backend_pid()
+          AND xact_start >= clock_timestamp() - make_interval(secs => :max_lookback)
+    """), {"max_lookback": settings.SYNC_CURSOR_MAX_LOOKBACK_SECONDS}).scalar()
+
+
+def get_changes(db: Session, current_user: models.User, since: Optional[datetime] = None):
+    """
+    Holt alle Zeilen, die sich seit 'since' geändert haben, plus Löschungen.
+    Ohne 'since' wird ein vollständiger Stand geliefert (Erst-Synchronisation).
+    Die Sichtbarkeit entspricht den Listen-Endpunkten der jeweiligen Rolle.
+    """
+    # Der Cursor kommt aus der DB-Uhr, damit er zu den updated_at-Werten passt.
+    cursor = _sync_cursor(db)
+
+    users = db.query(models.User)
+    dogs = db.query(models.Dog)
+    transactions = db.query(models.Transaction)
+    achievements = db.query(models.Achievement)
+    documents = db.query(models.Document)
+    deletions = db.query(models.Tombstone)
+
+    if current_user.role == 'kunde':
+        users = users.filter(models.User.id == current_user.id)
+        dogs = dogs.filter(models.Dog.owner_id == current_user.id)
+        transactions = transactions.filter(models.Transaction.user_id == current_user.id)
+        achievements = achievements.filter(models.Achievement.user_id == current_user.id)
+        documents = documents.filter(models.Document.user_id == current_user.id)
+        deletions = deletions.filter(models.Tombstone.user_id == current_user.id)
+    elif current_user.role == 'mitarbeiter':
+        transactions = transactions.filter(models.Transaction.booked_by_id == current_user.id)
+
+    if since is not None:
+        since = since - SYNC_CURSOR_OVERLAP
+        users = users.filter(models.User.updated_at >= since)
+        dogs = dogs.filter(models.Dog.updated_at >= since)
+        transactions = transactions.filter(models.Transaction.updated_at >= since)
+        achievements = achievements.filter(models.Achievement.updated_at >= since)
+        documents = documents.filter(models.Document.updated_at >= since)
+        deletions = deletions.filter(models.Tombstone.deleted_at >= since)
+
+    return {
+        "cursor": cursor.isoformat(),
+        "full": since is None,
+        "users": users.order_by(models.User.updated_at).all(),
+        "dogs": dogs.order_by(models.Dog.updated_at).all(),
+        "transactions": transactions.order_by(models.Transaction.updated_at).all(),
+        "achievements": achievements.order_by(models.Achievement.updated_at).all(),
+        "documents": documents.order_by(models.Document.updated_at).all(),
+        # Bei der Erst-Synchronisation gibt es nichts zu löschen.
+        "deleted": deletions.order_by(models.Tombstone.deleted_at).all() if since is not None else [],
+    }
+
 # --- ACHIEVEMENT ---
-def create_achievement(db: Session, user_id: int, requirement_id: str, transaction_id: int):
+def create_achievement(db: Session, tenant_id: int, user_id: int, requirement_id: str, transaction_id: int):
     # Die alte "exists"-Prüfung wurde entfernt.
     # Es wird jetzt immer ein neuer Eintrag erstellt.
     db_achievement = models.Achievement(
+        tenant_id=tenant_id,
         user_id=user_id,
         requirement_id=requirement_id,
         transaction_id=transaction_id
@@ -291,12 +625,13 @@ def create_achievement(db: Session, user_id: int, requirement_id: str, transacti
     return db_achievement
 
 # --- USER LEVEL ---
-def update_user_level(db: Session, user_id: int, new_level_id: int):
-    db_user = get_user(db, user_id=user_id)
+def update_user_level(db: Session, user_id: int, new_level_id: int, with_aggregate: bool = False):
+    db_user = get_user_for_update(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    dog_license_prereq_ids = {req['id'] for req in DOGLICENSE_PREREQS}
+    # Zusatzveranstaltungen (Hundeführerschein) bleiben laut Regeln des Mandanten erhalten
+    kept_ids = rules.get_index(db, db_user.tenant_id).kept_on_level_up
 
     unconsumed_achievements = db.query(models.Achievement).filter_by(
         user_id=user_id, is_consumed=False
@@ -304,16 +639,111 @@ def update_user_level(db: Session, user_id: int, new_level_id: int):
 
     for ach in unconsumed_achievements:
         # Zusatzveranstaltungen werden NICHT verbraucht, alles andere schon.
-        if ach.requirement_id not in dog_license_prereq_ids:
+        if ach.requirement_id not in kept_ids:
             ach.is_consumed = True
             db.add(ach)
 
     db_user.level_id = new_level_id
     db.add(db_user)
+    if with_aggregate:
+        aggregate = get_customer_aggregate(db, db_user)
+    touch_tenant(db, db_user.tenant_id)
+    events.emit(db, db_user.tenant_id, "user.level_changed", user_id=db_user.id, level_id=new_level_id)
     db.commit()
     db.refresh(db_user)
+    if with_aggregate:
+        db_user.aggregate = aggregate
     return db_user
 
+# --- LEVEL-REGELN ---
+def get_level_rules(db: Session, tenant_id: int) -> List[schemas.LevelRules]:
+    index = rules.get_index(db, tenant_id)
+    return [
+        schemas.LevelRules(level_id=level_id, requirements=[schemas.LevelRequirement(**req._asdict()) for req in reqs])
+        for level_id, reqs in sorted(index.levels.items())
+    ]
+
+
+def replace_level_requirements(db: Session, tenant_id: int, level_id: int, requirements: List[schemas.LevelRequirement]):
+    """Ersetzt die Anforderungen eines Levels; beim ersten Eingriff werden die Standardregeln übernommen."""
+    has_rules = db.query(models.LevelRequirement.id).filter(models.LevelRequirement.tenant_id == tenant_id).first()
+    if has_rules is None:
+        for default_level_id, reqs in rules.DEFAULT_LEVEL_RULES.items():
+            if default_level_id != level_id:
+                _add_level_requirements(db, tenant_id, default_level_id, [schemas.LevelRequirement(**r) for r in reqs])
+    else:
+        db.query(models.LevelRequirement).filter(
+            models.LevelRequirement.tenant_id == tenant_id, models.LevelRequirement.level_id == level_id
+        ).delete(synchronize_session=False)
+    _add_level_requirements(db, tenant_id, level_id, requirements)
+
+    db.query(models.Tenant).filter(models.Tenant.id == tenant_id).update(
+        {models.Tenant.rules_version: models.Tenant.rules_version + 1}, synchronize_session=False
+    )
+    touch_tenant(db, tenant_id)
+    events.emit(db, tenant_id, "level_rules.updated", level_id=level_id)
+    db.commit()
+    rules.invalidate(tenant_id)
+    return schemas.LevelRules(level_id=level_id, requirements=requirements)
+
+
+def _add_level_requirements(db: Session, tenant_id: int, level_id: int, requirements: List[schemas.LevelRequirement]):
+    for position, req in enumerate(requirements):
+        db.add(models.LevelRequirement(
+            tenant_id=tenant_id, level_id=level_id, requirement_id=req.id, name=req.name,
+            required=req.required, position=position, consumed_on_level_up=req.consumed_on_level_up,
+        ))
+
+
+# --- BONUSPLÄNE ---
+def get_bonus_schedules(db: Session, tenant_id: int):
+    return db.query(models.BonusSchedule).filter(
+        models.BonusSchedule.tenant_id == tenant_id
+    ).order_by(models.BonusSchedule.valid_from.asc().nullsfirst(), models.BonusSchedule.id).all()
+
+
+def get_active_bonus_schedule(db: Session, tenant_id: int) -> schemas.BonusSchedule:
+    schedule = bonus.get_index(db, tenant_id).active_schedule()
+    if schedule is None:
+        return schemas.BonusSchedule(name="Kein Bonus")
+    return schemas.BonusSchedule(
+        id=schedule.id, name=schedule.name, valid_from=schedule.valid_from, valid_until=schedule.valid_until,
+        tiers=[schemas.BonusTier(min_amount=m, bonus=b) for m, b in zip(schedule.thresholds, schedule.bonuses)],
+    )
+
+
+def create_bonus_schedule(db: Session, tenant_id: int, schedule: schemas.BonusScheduleCreate):
+    db_schedule = models.BonusSchedule(
+        tenant_id=tenant_id, name=schedule.name, valid_from=schedule.valid_from, valid_until=schedule.valid_until,
+        tiers=[models.BonusTier(min_amount=t.min_amount, bonus=t.bonus) for t in schedule.tiers],
+    )
+    db.add(db_schedule)
+    _bump_bonus_version(db, tenant_id)
+    db.commit()
+    bonus.invalidate(tenant_id)
+    db.refresh(db_schedule)
+    return db_schedule
+
+
+def delete_bonus_schedule(db: Session, tenant_id: int, schedule_id: int):
+    db_schedule = db.query(models.BonusSchedule).filter(
+        models.BonusSchedule.id == schedule_id, models.BonusSchedule.tenant_id == tenant_id
+    ).first()
+    if db_schedule is None:
+        return None
+    db.delete(db_schedule)
+    _bump_bonus_version(db, tenant_id)
+    db.commit()
+    bonus.invalidate(tenant_id)
+    return {"ok": True}
+
+
+def _bump_bonus_version(db: Session, tenant_id: int):
+    db.query(models.Tenant).filter(models.Tenant.id == tenant_id).update(
+        {models.Tenant.bonus_version: models.Tenant.bonus_version + 1}, synchronize_session=False
+    )
+
+
 def get_dog(db: Session, dog_id: int):
     return db.query(models.Dog).filter(models.Dog.id == dog_id).first()
 
@@ -327,17 +757,23 @@ def update_dog(db: Session, dog_id: int, dog: schemas.DogBase):
         setattr(db_dog, key, value)
 
     db.add(db_dog)
+    touch_tenant(db, db_dog.owner.tenant_id)
+    events.emit(db, db_dog.owner.tenant_id, "dog.updated", id=db_dog.id, user_id=db_dog.owner_id)
     db.commit()
     db.refresh(db_dog)
     return db_dog
 
 # In backend/app/crud.py
 
-def create_document(db: Session, user_id: int, tenant_id: int, file_name: str, file_type: str, file_path: str):
+def create_document(db: Session, user_id: int, tenant_id: int, file_name: str, file_type: str, file_path: str, file_size: int = None, checksum: str = None):
     db_doc = models.Document(
-        user_id=user_id, tenant_id=tenant_id, file_name=file_name, file_type=file_type, file_path=file_path
+        user_id=user_id, tenant_id=tenant_id, file_name=file_name, file_type=file_type, file_path=file_path,
+        file_size=file_size, checksum=checksum
     )
     db.add(db_doc)
+    touch_tenant(db, tenant_id)
+    db.flush()
+    events.emit(db, tenant_id, "document.created", id=db_doc.id, user_id=user_id)
     db.commit()
     db.refresh(db_doc)
     return db_doc
@@ -348,17 +784,29 @@ def get_document(db: Session, document_id: int, tenant_id: int = None):
         query = query.filter(models.Document.tenant_id == tenant_id)
     return query.first()
 
+def get_documents_for_user(db: Session, user_id: int, tenant_id: int = None):
+    query = db.query(models.Document).filter(models.Document.user_id == user_id)
+    if tenant_id:
+        query = query.filter(models.Document.tenant_id == tenant_id)
+    return query.order_by(models.Document.id).all()
+
 def delete_document(db: Session, document_id: int, tenant_id: int = None):
     db_doc = get_document(db, document_id, tenant_id)
     if db_doc:
         db.delete(db_doc)
+        touch_tenant(db, db_doc.tenant_id)
+        events.emit(db, db_doc.tenant_id, "document.deleted", id=db_doc.id, user_id=db_doc.user_id)
         db.commit()
         return True
     return False
 
 def create_dog_for_user(db: Session, dog: schemas.DogCreate, user_id: int):
-    db_dog = models.Dog(**dog.model_dump(), owner_id=user_id)
+    tenant_id = get_user(db, user_id=user_id).tenant_id
+    db_dog = models.Dog(**dog.model_dump(), owner_id=user_id, tenant_id=tenant_id)
     db.add(db_dog)
+    touch_tenant(db, tenant_id)
+    db.flush()
+    events.emit(db, tenant_id, "dog.created", id=db_dog.id, user_id=user_id)
     db.commit()
     db.refresh(db_dog)
     return db_dog
@@ -367,6 +815,9 @@ def delete_dog(db: Session, dog_id: int):
     db_dog = get_dog(db, dog_id=dog_id)
     if not db_dog:
         return None
+    tenant_id = db_dog.owner.tenant_id
     db.delete(db_dog)
+    touch_tenant(db, tenant_id)
+    events.emit(db, tenant_id, "dog.deleted", id=db_dog.id, user_id=db_dog.owner_id)
     db.commit()
     return {"ok": True}
\ No newline at end of file
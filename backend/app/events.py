@@ -0,0 +1,156 @@
+"""
+Änderungs-Benachrichtigungen pro Mandant für /api/events (Server-Sent Events).
+
+Die crud-Schreibfunktionen merken Ereignisse mit emit() in der Session vor; erst
+nach einem erfolgreichen Commit werden sie an alle verbundenen Clients verteilt.
+Der Broadcaster lebt im Prozess: Clients erhalten nur Ereignisse aus Schreibzugriffen,
+die von derselben Instanz verarbeitet wurden.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Maximale Anzahl wartender Ereignisse pro Client, bevor er als zu langsam gilt
+CLIENT_QUEUE_SIZE = 100
+# Sekunden ohne Ereignis, nach denen ein Kommentar als Heartbeat gesendet wird
+HEARTBEAT_SECONDS = 15
+
+_PENDING_KEY = "pending_events"
+_DEFER_KEY = "defer_events"
+
+
+class Subscription:
+    def __init__(self, tenant_id: int, user_id: Optional[int], loop: asyncio.AbstractEventLoop):
+        self.tenant_id = tenant_id
+        # Gesetzt für Kunden: sie erhalten nur Ereignisse zu ihrem eigenen Konto
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+
+    def wants(self, payload: dict) -> bool:
+        return self.user_id is None or payload.get("user_id") == self.user_id
+
+    def offer(self, payload: dict):
+        """Läuft im Event-Loop des Clients. Ein voller Puffer wird durch ein 'resync' ersetzt."""
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Client kommt nicht hinterher: statt unbegrenzt zu puffern, alles verwerfen
+            # und ihm mitteilen, dass er per /api/sync neu abgleichen soll.
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, tenant_id: int, user_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(tenant_id, user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(tenant_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.tenant_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.tenant_id]
+
+    def client_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def publish(self, tenant_id: int, payload: dict):
+        """Thread-sicher; wird aus den (synchronen) Endpunkten im Threadpool aufgerufen."""
+        payload = {**payload, "event_id": next(self._ids)}
+        with self._lock:
+            subscribers = list(self._subscriptions.get(tenant_id, ()))
+        for subscription in subscribers:
+            if subscription.wants(payload):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, payload)
+                except RuntimeError:
+                    # Event-Loop ist bereits beendet, der Client wird beim Aufräumen entfernt
+                    pass
+
+
+broadcaster = Broadcaster()
+
+
+def emit(db: Session, tenant_id: int, event_type: str, **data):
+    """Merkt ein Ereignis vor; es wird erst nach dem Commit der Session verteilt."""
+    db.info.setdefault(_PENDING_KEY, []).append((tenant_id, {"type": event_type, **data}))
+
+
+def defer(db: Session):
+    """
+    Für Sessions, deren Commit nur einen Savepoint freigibt (z.B. /api/batch): Ereignisse
+    bleiben vorgemerkt, bis der Aufrufer nach dem echten Commit publish_deferred() aufruft.
+    """
+    db.info[_DEFER_KEY] = True
+
+
+def is_deferred(db: Session) -> bool:
+    return bool(db.info.get(_DEFER_KEY))
+
+
+def pending_count(db: Session) -> int:
+    return len(db.info.get(_PENDING_KEY, []))
+
+
+def discard_since(db: Session, count: int):
+    """Verwirft die Ereignisse, die nach dem Stand 'count' vorgemerkt wurden."""
+    del db.info.setdefault(_PENDING_KEY, [])[count:]
+
+
+def publish_deferred(db: Session):
+    for tenant_id, payload in db.info.pop(_PENDING_KEY, []):
+        broadcaster.publish(tenant_id, payload)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    if not session.info.get(_DEFER_KEY):
+        publish_deferred(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    if not session.info.get(_DEFER_KEY):
+        session.info.pop(_PENDING_KEY, None)
+
+
+def format_sse(payload: dict) -> str:
+    lines = [f"event: {payload['type']}"]
+    if "event_id" in payload:
+        lines.append(f"id: {payload['event_id']}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(subscription: Subscription):
+    """Liefert die SSE-Nachrichten eines Clients inklusive Heartbeats, bis er sich trennt."""
+    try:
+        yield "retry: 5000\n: connected\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(payload)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,80 @@
+"""
+Bildverarbeitung für /api/upload/image.
+
+Hochgeladene Fotos (vom Handy oft 5–12 MB) werden beim Upload dekodiert, anhand der
+EXIF-Orientierung gedreht und als WebP in mehreren Breiten neu kodiert. Beim Neukodieren
+werden keine Metadaten übernommen, EXIF (inkl. GPS-Position) ist danach entfernt.
+Die Arbeit läuft in einem begrenzten Thread-Pool außerhalb des Event-Loops; Pillow gibt
+beim Dekodieren, Skalieren und Kodieren den GIL frei.
+"""
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+import pillow_heif
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .config import settings
+
+# iPhone-Fotos kommen als HEIC; uploads.IMAGE_TYPES lässt sie zu, Pillow selbst kann sie nicht lesen
+pillow_heif.register_heif_opener()
+
+# Schutz vor "Dekompressionsbomben" (winzige Datei, riesige Pixelmaße)
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class Rendition:
+    def __init__(self, width: int, height: int, data: bytes):
+        self.width = width
+        self.height = height
+        self.data = data
+
+
+class ImageProcessingError(Exception):
+    pass
+
+
+def _executor_instance() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+    return _executor
+
+
+def build_renditions(path: str, widths: Sequence[int], quality: int) -> List[Rendition]:
+    """Erzeugt WebP-Varianten (größte zuerst) ohne Hochskalieren über die Originalbreite."""
+    try:
+        with Image.open(path) as img:
+            # JPEGs direkt in reduzierter Auflösung dekodieren, wenn das Original viel größer ist
+            img.draft("RGB", (max(widths), max(widths)))
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageProcessingError(str(e)) from e
+
+    targets = sorted({min(w, img.width) for w in widths}, reverse=True)
+    renditions = []
+    current = img
+    for width in targets:
+        height = max(1, round(img.height * width / img.width))
+        if (width, height) != current.size:
+            # Jede Stufe aus der nächstgrößeren berechnen statt immer aus dem Original
+            current = current.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        current.save(buffer, "WEBP", quality=quality, method=4)
+        renditions.append(Rendition(width, height, buffer.getvalue()))
+    return renditions
+
+
+async def process_image(path: str) -> List[Rendition]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor_instance(), build_renditions, path, settings.IMAGE_RENDITION_WIDTHS, settings.IMAGE_WEBP_QUALITY
+    )
+
+
+def srcset(urls_and_widths) -> str:
+    return ", ".join(f"{url} {width}w" for url, width in urls_and_widths)
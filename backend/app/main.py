@@ -1,33 +1,62 @@
 import os
 # import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
 import secrets
 
 # from starlette.responses import FileResponse
-from fastapi import Depends, FastAPI, HTTPException, status, UploadFile, File
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, status, UploadFile, File, Request, Response, Header
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
-
-from . import crud, models, schemas, auth
-from .database import engine, get_db
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
+
+from . import crud, models, schemas, auth, events, uploads, remote, outbox, rules, bonus, tenancy, partitions, throttle, metrics
+from .compression import CompressionMiddleware
+from .signed_urls import SignedUrlCache
+from .storage import get_storage, LocalStorage
+from .serialization import DefaultResponse, orm_response, USER_SERIALIZER, USER_LIST_SERIALIZER, TRANSACTION_LIST_SERIALIZER
+from .database import engine, get_db, SessionLocal
 from .config import settings
-from supabase import create_client, Client
-from jose import jwt
 import time
-
-# This creates the tables if they don't exist.
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+import hashlib
+import json
+import re
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+async def _poll_auth_outbox():
+    # Holt Wiederholungen und Einträge nach, deren Anstoß verloren ging (z.B. Neustart)
+    while True:
+        outbox.kick()
+        await asyncio.sleep(settings.OUTBOX_POLL_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema-Verwaltung läuft über migrate_db.py; create_all nur noch auf Wunsch (lokale Entwicklung),
+    # damit der Import der App (Cold Start auf Vercel) keinen DB-Roundtrip kostet.
+    if settings.DB_CREATE_ALL_ON_STARTUP:
+        await asyncio.to_thread(models.Base.metadata.create_all, bind=engine)
+    # Level-Regeln im Hintergrund kompilieren; der Start wartet nicht auf die DB
+    threading.Thread(target=rules.preload, name="rules-preload", daemon=True).start()
+    poller = asyncio.create_task(_poll_auth_outbox()) if settings.OUTBOX_POLL_SECONDS > 0 else None
+    yield
+    if poller:
+        poller.cancel()
+
+
+app = FastAPI(default_response_class=DefaultResponse, lifespan=lifespan)
 # LÖSCHEN:
 # UPLOADS_DIR = "uploads"
 # os.makedirs(UPLOADS_DIR, exist_ok=True)
 
-# HINZUFÜGEN (Supabase Client):
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+# Der Supabase-Client wird erst beim ersten Gebrauch erzeugt (remote.get_supabase_client).
 
 # Suchen und anpassen:
 origins_regex = r"https://(.*\.)?pfotencard\.de|https://.*\.vercel\.app|http://localhost:\d+"
@@ -40,18 +69,169 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Komprimierung für JSON-Antworten (brotli/gzip). Routen mit Stream-Antworten
+# (z.B. Server-Sent Events) hier per Pfad-Präfix ausnehmen.
+COMPRESSION_EXCLUDED_PATHS: List[str] = ["/api/events", "/api/storage/"]
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    exclude_paths=COMPRESSION_EXCLUDED_PATHS,
+)
+
+# Prometheus-Metriken (metrics.py); als äußerste Middleware, damit die Komprimierung mitgemessen wird.
+# Langlebige Streams (SSE) würden das Latenz-Histogramm verzerren.
+METRICS_EXCLUDED_PATHS: List[str] = ["/api/events", "/metrics"]
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, exclude_paths=METRICS_EXCLUDED_PATHS)
+    metrics.instrument_engine(engine)
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    # Optimistische Sperre (version): die Zeile wurde zwischen Lesen und Schreiben geändert.
+    # Schreibzugriffe auf users sperren die Zeile vorab (crud.get_user_for_update); das hier
+    # fängt die übrigen Fälle ab, der Client lädt neu und versucht es erneut.
+    return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": "The record was modified concurrently, please retry"})
+
+
+# --- CONDITIONAL GET (ETag) ---
+def _make_etag(request: Request, db: Session, current_user) -> Optional[str]:
+    """
+    Schwacher ETag aus der Datenversion des Mandanten, dem Benutzer (Rollen-Sicht)
+    und der angefragten URL. Kostet nur eine Primärschlüssel-Abfrage. Schwach, weil er für
+    alle Kodierungen der Antwort (identity, gzip, br; compression.py) gleich ist und ein
+    starker ETag byte-genaue Gleichheit zusagen würde (RFC 9110, Abschnitt 8.8.3).
+    """
+    data_version = crud.get_data_version(db, current_user.tenant_id)
+    if data_version is None:
+        return None
+    key = f"{current_user.tenant_id}:{data_version}:{current_user.id}:{request.url.path}?{request.url.query}"
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def _opaque_tag(etag: str) -> str:
+    # Schwacher Vergleich für If-None-Match: W/ wird ignoriert (RFC 9110, Abschnitt 8.8.3.2)
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _check_not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """Setzt ETag-Header und gibt eine 304-Antwort zurück, wenn der Client schon aktuell ist."""
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or _opaque_tag(etag) in [_opaque_tag(t) for t in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+# --- IDEMPOTENZ (Idempotency-Key) ---
+def _request_hash(scope: str, payload: BaseModel) -> str:
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(f"{scope}\n{body}".encode()).hexdigest()
+
+
+def _replay_idempotent(record: models.IdempotencyKey, request_hash: str) -> Response:
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if record.status_code is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _run_idempotent(db: Session, key: Optional[str], user_id: int, scope: str, payload: BaseModel, response_schema, run):
+    """
+    Führt run() höchstens einmal pro (Benutzer, Idempotency-Key) aus. Der Schlüssel wird in
+    derselben DB-Transaktion wie die Schreiboperation gespeichert; Wiederholungen erhalten
+    die gespeicherte Antwort, ohne Guthaben- oder Achievement-Logik erneut auszuführen.
+    """
+    if not key:
+        return run()
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+
+    request_hash = _request_hash(scope, payload)
+    record = crud.get_idempotency_record(db, user_id, key)
+    if record is None:
+        try:
+            reserved = crud.reserve_idempotency_key(
+                db, user_id, key, request_hash, timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+            )
+        except IntegrityError:
+            # Paralleler Request mit demselben Schlüssel war schneller
+            db.rollback()
+            record = crud.get_idempotency_record(db, user_id, key)
+            if record is None:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    if record is not None:
+        return _replay_idempotent(record, request_hash)
+
+    try:
+        result = run()
+    except Exception:
+        # Fehler werden nicht gespeichert, der Client darf mit demselben Schlüssel erneut senden.
+        db.rollback()
+        raise
+    body = response_schema.model_validate(result).model_dump_json()
+    crud.complete_idempotency_key(db, reserved, 200, body)
+    return Response(content=body, media_type="application/json")
+
+
 @app.get("/")
 def read_root():
     return {"message": "Willkommen bei Pfotencard!"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics(authorization: Optional[str] = Header(None)):
+    # async, damit die Auslastung des Threadpools gelesen wird, ohne selbst einen Thread zu belegen
+    # Ohne Token nicht ausliefern: Routen, Last und Pool-/Breaker-Zustand sind nicht öffentlich
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if metrics.prometheus_client is None:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    if not secrets.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+# --- GEPLANTE AUFGABEN (Vercel Cron, siehe vercel.json) ---
+@app.get("/api/cron/partitions")
+def run_partition_maintenance(authorization: Optional[str] = Header(None)):
+    """Legt die Transaktions-Partitionen der kommenden Monate an (täglich, idempotent)."""
+    # Vercel sendet CRON_SECRET als Bearer-Token; ohne konfiguriertes Secret ist der Endpunkt aus
+    if not settings.CRON_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {settings.CRON_SECRET}"):
+        raise HTTPException(status_code=401, detail="Invalid cron secret")
+    try:
+        created = partitions.maintain()
+    except Exception as e:
+        print(f"FEHLER beim Anlegen der Transaktions-Partitionen: {e}")
+        raise HTTPException(status_code=503, detail="Partition maintenance failed, retry later")
+    return {"created": created}
+
 # --- AUTHENTICATION ---
 @app.post("/api/login", response_model=schemas.Token)
-async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+def login_for_access_token(request: Request, db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    # Synchron, damit bcrypt im Threadpool statt in der Event-Loop rechnet.
+    # Gedrosselte Anfragen scheitern vor jedem bcrypt-Aufruf (throttle.py).
     print(f"Login attempt for: {form_data.username}")
+    throttle_keys = throttle.keys_for(request, form_data.username)
+    throttle.check(db, throttle_keys)
     user = crud.get_user_by_email(db, email=form_data.username)
     
     if not user or not auth.verify_password(form_data.password, user.hashed_password):
         print(f"Login failed for: {form_data.username}")
+        throttle.record_failure(db, throttle_keys)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -59,9 +239,11 @@ async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth
         )
     
     print(f"Login successful for: {form_data.username}")
+    tenancy.set_tenant(db, user.tenant_id)
+    throttle.record_success(db, throttle_keys)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "email": user.email, "tenant_id": user.tenant_id}, expires_delta=access_token_expires
     )
     
     # Fetch full user details for the response
@@ -70,52 +252,55 @@ async def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth
     return {"access_token": access_token, "token_type": "bearer", "user": full_user_details}
 
 @app.get("/api/users/me", response_model=schemas.User)
-async def read_users_me(current_user: schemas.User = Depends(auth.get_current_active_user)):
-    return current_user
+def read_users_me(
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    not_modified = _check_not_modified(request, response, _make_etag(request, db, current_user))
+    if not_modified:
+        return not_modified
+    return orm_response(USER_SERIALIZER, current_user, response)
 
 # --- USERS / CUSTOMERS ---
 @app.post("/api/users", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    # --- SUPABASE AUTH SYNC START ---
-    # Wenn ein Admin einen User anlegt und ein Passwort vergibt,
-    # legen wir diesen User auch in Supabase an.
-    if user.password:
-        try:
-            # KORREKTUR: Wir nutzen direkt den Service Role Key aus der Config
-            # Statt den Token selbst zu signieren.
-            supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-            
-            # 3. User in Supabase erstellen
-            # email_confirm: True -> Admin hat ihn erstellt, also ist er sofort bestätigt
-            supabase.auth.admin.create_user({
-                "email": user.email,
-                "password": user.password,
-                "email_confirm": True,
-                "user_metadata": { "name": user.name } # Optional: Name auch in Metadaten speichern
-            })
-            print(f"Supabase User via Admin-Panel erstellt: {user.email}")
-            
-        except Exception as e:
-            # WICHTIG: Prüfen Sie die Logs. Wenn hier ein Fehler auftritt, existiert der User evtl. schon.
-            # Wenn es ein kritischer Fehler ist, sollten Sie hier evtl. 'raise HTTPException' machen,
-            # damit die Daten nicht inkonsistent werden (User in DB aber nicht in Auth).
-            print(f"FEHLER beim Erstellen des Supabase Users: {e}")
-            # Optional: Abbrechen, wenn Auth fehlschlägt:
-            # raise HTTPException(status_code=500, detail=f"Fehler bei Auth-Erstellung: {e}")
+def create_user(
+    user: schemas.UserCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    # Nur Admins und Mitarbeiter legen Benutzer an; der neue Benutzer gehört zu ihrem
+    # Mandanten (von get_current_active_user in der Session gesetzt).
+    if current_user.role not in ['admin', 'mitarbeiter']:
+        raise HTTPException(status_code=403, detail="Not authorized to perform this action")
+    # Mitarbeiter dürfen nur Kunden anlegen, keine weiteren Mitarbeiter oder Admins
+    if user.role != 'kunde' and current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Only administrators can create staff accounts")
+
+    def run():
+        # Lokalen Datenbank-Eintrag erstellen (Standard-Logik)
+        db_user = crud.get_user_by_email(db, email=user.email)
+        if db_user:
+            raise HTTPException(status_code=400, detail="Email already registered")
 
-    # --- SUPABASE AUTH SYNC END ---
+        # --- SUPABASE AUTH SYNC ---
+        # Wenn ein Admin einen User anlegt und ein Passwort vergibt, legen wir diesen User
+        # auch in Supabase an – asynchron über die Outbox, im selben Commit wie der User.
+        if user.password:
+            crud.enqueue_auth_sync(db, "create", user.email, name=user.name)
+        return crud.create_user(db=db, user=user)
 
-    # 4. Lokalen Datenbank-Eintrag erstellen (Standard-Logik)
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    return _run_idempotent(db, idempotency_key, current_user.id, "POST /api/users", user, schemas.User, run)
 
 
 # In backend/app/main.py
 
 @app.get("/api/users", response_model=List[schemas.User])
 def read_users(
+        request: Request,
+        response: Response,
         skip: int = 0,
         limit: int = 100,
         db: Session = Depends(get_db),
@@ -125,43 +310,94 @@ def read_users(
     if current_user.role not in ['admin', 'mitarbeiter']:
         raise HTTPException(status_code=403, detail="Not authorized to access this resource")
 
+    not_modified = _check_not_modified(request, response, _make_etag(request, db, current_user))
+    if not_modified:
+        return not_modified
+
     # Hier können wir die Logik für Mitarbeiter-Portfolios später einfügen, falls nötig.
     # Fürs Erste ist die Funktion für berechtigte Nutzer unverändert.
     users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    return orm_response(USER_LIST_SERIALIZER, users, response)
 
-@app.put("/api/users/{user_id}/level", response_model=schemas.User)
+@app.put("/api/users/{user_id}/level", response_model=schemas.UserResult)
 def update_user_level_endpoint(
     user_id: int,
     level_update: schemas.UserLevelUpdate,
+    include_aggregate: bool = False,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role not in ['admin', 'mitarbeiter']:
          raise HTTPException(status_code=403, detail="Not authorized to perform this action")
-    return crud.update_user_level(db=db, user_id=user_id, new_level_id=level_update.level_id)
+    return crud.update_user_level(db=db, user_id=user_id, new_level_id=level_update.level_id, with_aggregate=include_aggregate)
+
+
+@app.get("/api/users/{user_id}/eligibility", response_model=schemas.Eligibility)
+def read_user_eligibility(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Fortschritt im aktuellen Level sowie Prüfungs- und Aufstiegsberechtigung."""
+    if current_user.role not in ['admin', 'mitarbeiter'] and current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    db_user = crud.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return crud.get_eligibility(db, db_user)
+
 
-@app.put("/api/users/{user_id}/vip", response_model=schemas.User)
+@app.get("/api/levels/requirements", response_model=List[schemas.LevelRules])
+def read_level_requirements(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Anforderungen aller Level des Mandanten (ersetzt die Konstanten im Frontend)."""
+    return crud.get_level_rules(db, current_user.tenant_id)
+
+
+@app.put("/api/levels/{level_id}/requirements", response_model=schemas.LevelRules)
+def update_level_requirements(
+    level_id: int,
+    requirements: List[schemas.LevelRequirement],
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Ersetzt die Anforderungen eines Levels (eigener Lehrplan der Hundeschule)."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if level_id < 1:
+        raise HTTPException(status_code=400, detail="Invalid level")
+    ids = [req.id.strip() for req in requirements]
+    if any(not req_id for req_id in ids) or len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Requirement ids must be unique and non-empty")
+    if any(req.required < 1 for req in requirements):
+        raise HTTPException(status_code=400, detail="Required amount must be at least 1")
+    return crud.replace_level_requirements(db, current_user.tenant_id, level_id, requirements)
+
+@app.put("/api/users/{user_id}/vip", response_model=schemas.UserResult)
 def update_user_vip_status_endpoint(
     user_id: int,
     vip_update: schemas.UserVipUpdate,
+    include_aggregate: bool = False,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role not in ['admin', 'mitarbeiter']:
         raise HTTPException(status_code=403, detail="Not authorized to perform this action")
-    return crud.update_user_vip_status(db=db, user_id=user_id, is_vip=vip_update.is_vip)
+    return crud.update_user_vip_status(db=db, user_id=user_id, is_vip=vip_update.is_vip, with_aggregate=include_aggregate)
 
-@app.put("/api/users/{user_id}/expert", response_model=schemas.User)
+@app.put("/api/users/{user_id}/expert", response_model=schemas.UserResult)
 def update_user_expert_status_endpoint(
     user_id: int,
     expert_update: schemas.UserExpertUpdate,
+    include_aggregate: bool = False,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role not in ['admin', 'mitarbeiter']:
         raise HTTPException(status_code=403, detail="Not authorized to perform this action")
-    return crud.update_user_expert_status(db=db, user_id=user_id, is_expert=expert_update.is_expert)
+    return crud.update_user_expert_status(db=db, user_id=user_id, is_expert=expert_update.is_expert, with_aggregate=include_aggregate)
 
 @app.put("/api/users/{user_id}", response_model=schemas.User)
 def update_user_endpoint(
@@ -208,68 +444,39 @@ def update_user_endpoint(
     password_changed = user_update.password is not None
     name_changed = user_update.name and user_update.name != db_user.name
 
-    # 5. SUPABASE SYNC START
+    # 5. SUPABASE SYNC: über die Outbox, im selben Commit wie das lokale Update
     if email_changed or password_changed or name_changed:
-        try:
-            print(f"DEBUG: Starte Supabase Sync für User {db_user.email}...")
-            supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-            
-            # A) User in Supabase finden (über die ALTE E-Mail)
-            found_uid = None
-            users_response = supabase.auth.admin.list_users(page=1, per_page=1000)
-            user_list = users_response if isinstance(users_response, list) else getattr(users_response, 'users', [])
-            
-            search_email = db_user.email.lower().strip()
-            for u in user_list:
-                if u.email and u.email.lower().strip() == search_email:
-                    found_uid = u.id
-                    break
-            
-            if found_uid:
-                attributes = {}
-                if email_changed:
-                    attributes["email"] = user_update.email
-                
-                if password_changed:
-                    if len(user_update.password) < 6:
-                        raise ValueError("Passwort muss mindestens 6 Zeichen lang sein.")
-                    attributes["password"] = user_update.password
-                
-                if name_changed:
-                    attributes["user_metadata"] = { "name": user_update.name }
-                
-                if attributes:
-                    supabase.auth.admin.update_user_by_id(found_uid, attributes)
-                    print(f"DEBUG: Supabase Update erfolgreich für {found_uid}")
-            else:
-                # Nur warnen, damit lokale DB trotzdem aktualisiert wird (Selbstheilung)
-                print(f"WARNUNG: User {db_user.email} in Supabase nicht gefunden. Sync übersprungen.")
-
-        except Exception as e:
-            print(f"FEHLER beim Supabase Update: {e}")
-            raise HTTPException(status_code=400, detail=f"Fehler bei der Aktualisierung: {str(e)}")
-    # SUPABASE SYNC END
+        if password_changed and len(user_update.password) < 6:
+            raise HTTPException(status_code=400, detail="Fehler bei der Aktualisierung: Passwort muss mindestens 6 Zeichen lang sein.")
+        crud.enqueue_auth_sync(
+            db, "update", db_user.email, user_id=db_user.id,
+            new_email=user_update.email if email_changed else None,
+            name=user_update.name if name_changed else None,
+            password=password_changed,
+        )
 
     # 6. Lokales Update durchführen
     updated_user = crud.update_user(db=db, user_id=user_id, user=user_update)
     
     return updated_user
 
-@app.put("/api/users/{user_id}/status", response_model=schemas.User)
+@app.put("/api/users/{user_id}/status", response_model=schemas.UserResult)
 def update_user_status_endpoint(
     user_id: int,
     status_update: schemas.UserStatusUpdate,
+    include_aggregate: bool = False,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     if current_user.role not in ['admin', 'mitarbeiter']:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.update_user_status(db=db, user_id=user_id, status=status_update)
+    return crud.update_user_status(db=db, user_id=user_id, status=status_update, with_aggregate=include_aggregate)
 
 @app.get("/api/users/search", response_model=List[schemas.User])
-def search_users(q: str, db: Session = Depends(get_db)):
+def search_users(q: str, request: Request, db: Session = Depends(get_db)):
+    tenancy.set_tenant(db, tenancy.resolve_request_tenant_id(request, db))
     users = crud.search_users(db, search_term=q)
-    return users
+    return orm_response(USER_LIST_SERIALIZER, users)
 
 
 # In backend/app/main.py
@@ -277,19 +484,27 @@ def search_users(q: str, db: Session = Depends(get_db)):
 @app.get("/api/users/{user_id}", response_model=schemas.User)
 def read_user(
         user_id: int,
+        request: Request,
+        response: Response,
         db: Session = Depends(get_db),
         current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
+    is_allowed = current_user.role in ['admin', 'mitarbeiter'] or (current_user.role == 'kunde' and current_user.id == user_id)
+    if is_allowed:
+        not_modified = _check_not_modified(request, response, _make_etag(request, db, current_user))
+        if not_modified:
+            return not_modified
+
     # Admins und Mitarbeiter dürfen jeden beliebigen Nutzer/Kunden aufrufen.
     if current_user.role in ['admin', 'mitarbeiter']:
         db_user = crud.get_user(db, user_id=user_id)
         if db_user is None:
             raise HTTPException(status_code=404, detail="User not found")
-        return db_user
+        return orm_response(USER_SERIALIZER, db_user, response)
 
     # Kunden dürfen nur ihr eigenes Profil aufrufen.
     elif current_user.role == 'kunde' and current_user.id == user_id:
-        return crud.get_user(db, user_id=user_id)
+        return orm_response(USER_SERIALIZER, crud.get_user(db, user_id=user_id), response)
 
     # Alle anderen Anfragen werden blockiert.
     else:
@@ -309,74 +524,177 @@ def delete_user_endpoint(
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 2. SUPABASE SYNC: User auch dort löschen
-    try:
-        supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
-        
-        # Workaround: Supabase ID anhand der E-Mail finden
-        # (Da wir lokal nur Integer-IDs speichern)
-        found_uid = None
-        # Holt standardmäßig die ersten 50 User. Für größere Apps müsste man paginieren.
-        users_response = supabase.auth.admin.list_users() 
-        
-        # Hinweis: Die Struktur der Response kann je nach Library-Version variieren, 
-        # meist ist es direkt eine Liste oder ein Objekt mit einem 'users'-Attribut.
-        user_list = users_response if isinstance(users_response, list) else getattr(users_response, 'users', [])
-
-        for u in user_list:
-            if u.email == user_to_delete.email:
-                found_uid = u.id
-                break
-        
-        if found_uid:
-            supabase.auth.admin.delete_user(found_uid)
-            print(f"Supabase User erfolgreich gelöscht: {user_to_delete.email}")
-        else:
-            print(f"Warnung: User {user_to_delete.email} konnte in Supabase nicht gefunden werden (evtl. schon gelöscht).")
-
-    except Exception as e:
-        print(f"FEHLER beim Löschen in Supabase: {e}")
-        # Optional: Hier Fehler werfen, wenn man das lokale Löschen verhindern will
-        # raise HTTPException(status_code=500, detail="Supabase Sync failed")
+    # 2. SUPABASE SYNC: User auch dort löschen (über die Outbox, im selben Commit)
+    crud.enqueue_auth_sync(db, "delete", user_to_delete.email, user_id=user_to_delete.id)
 
     # 3. Lokal löschen
     result = crud.delete_user(db=db, user_id=user_id)
     return result
 
 # --- TRANSACTIONS ---
-@app.post("/api/transactions", response_model=schemas.Transaction)
+@app.post("/api/transactions", response_model=schemas.TransactionResult)
 def create_transaction(
     transaction: schemas.TransactionCreate,
+    include_aggregate: bool = False,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_active_user)
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     # Only admins and staff can book transactions
     if current_user.role not in ['admin', 'mitarbeiter']:
          raise HTTPException(status_code=403, detail="Not authorized to perform this action")
-    return crud.create_transaction(db=db, transaction=transaction, booked_by=current_user)
+    # include_aggregate=true liefert den neuen Kundenstand mit, damit kein erneutes Laden aller Daten nötig ist
+    return _run_idempotent(
+        db, idempotency_key, current_user.id,
+        f"POST /api/transactions?include_aggregate={include_aggregate}", transaction, schemas.TransactionResult,
+        lambda: crud.create_transaction(db=db, transaction=transaction, booked_by=current_user, with_aggregate=include_aggregate),
+    )
 
 
 # In backend/app/main.py
 
+@app.get("/api/bonus/preview", response_model=schemas.BonusPreview)
+def preview_bonus(
+    amount: float,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Berechnet den Bonus für eine Aufladung nach dem aktuell gültigen Plan, ohne etwas zu buchen."""
+    if current_user.role not in ['admin', 'mitarbeiter']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    result = bonus.calculate(db, current_user.tenant_id, bonus.TOPUP_TYPE, amount)
+    return schemas.BonusPreview(
+        amount=amount, bonus=result.bonus, total=amount + result.bonus,
+        schedule_id=result.schedule_id, schedule_name=result.schedule_name,
+    )
+
+
+@app.get("/api/bonus/schedules", response_model=List[schemas.BonusSchedule])
+def read_bonus_schedules(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    if current_user.role not in ['admin', 'mitarbeiter']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return crud.get_bonus_schedules(db, current_user.tenant_id)
+
+
+@app.get("/api/bonus/schedules/active", response_model=schemas.BonusSchedule)
+def read_active_bonus_schedule(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Aktuell gültige Bonusstufen (Aufladen-Buttons im Frontend)."""
+    if current_user.role not in ['admin', 'mitarbeiter']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return crud.get_active_bonus_schedule(db, current_user.tenant_id)
+
+
+@app.post("/api/bonus/schedules", response_model=schemas.BonusSchedule)
+def create_bonus_schedule(
+    schedule: schemas.BonusScheduleCreate,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Legt einen Bonusplan an; mit valid_from/valid_until als zeitlich begrenzte Aktion."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if schedule.valid_from and schedule.valid_until and schedule.valid_until <= schedule.valid_from:
+        raise HTTPException(status_code=400, detail="valid_until must be after valid_from")
+    thresholds = [tier.min_amount for tier in schedule.tiers]
+    if len(set(thresholds)) != len(thresholds):
+        raise HTTPException(status_code=400, detail="Tier thresholds must be unique")
+    if any(tier.min_amount <= 0 or tier.bonus < 0 for tier in schedule.tiers):
+        raise HTTPException(status_code=400, detail="Tier amounts must be positive")
+    return crud.create_bonus_schedule(db, current_user.tenant_id, schedule)
+
+
+@app.delete("/api/bonus/schedules/{schedule_id}")
+def delete_bonus_schedule(
+    schedule_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Not authorized")
+    result = crud.delete_bonus_schedule(db, current_user.tenant_id, schedule_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Bonus schedule not found")
+    return result
+
+
 @app.get("/api/transactions", response_model=List[schemas.Transaction])
 def read_transactions(
+        request: Request,
+        response: Response,
         skip: int = 0,
         limit: int = 200,
+        since: Optional[datetime] = None,
         db: Session = Depends(get_db),
         current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
+    # since: nur Buchungen ab diesem Zeitpunkt (liest dann nur die betroffenen Monatspartitionen)
+    if current_user.role in ['admin', 'mitarbeiter', 'kunde']:
+        not_modified = _check_not_modified(request, response, _make_etag(request, db, current_user))
+        if not_modified:
+            return not_modified
+
     if current_user.role == 'kunde':
-        return crud.get_transactions_for_user(db=db, user_id=current_user.id)
+        return orm_response(TRANSACTION_LIST_SERIALIZER, crud.get_transactions_for_user(db=db, user_id=current_user.id, since=since), response)
 
     # NEU: Eigener Fall für Mitarbeiter
     if current_user.role == 'mitarbeiter':
-        return crud.get_transactions_for_user(db=db, user_id=current_user.id, for_staff=True)
+        return orm_response(TRANSACTION_LIST_SERIALIZER, crud.get_transactions_for_user(db=db, user_id=current_user.id, for_staff=True, since=since), response)
 
     if current_user.role == 'admin':
-        return crud.get_transactions(db=db, skip=skip, limit=limit)
+        return orm_response(TRANSACTION_LIST_SERIALIZER, crud.get_transactions(db=db, skip=skip, limit=limit, since=since), response)
 
     raise HTTPException(status_code=403, detail="Not authorized to perform this action")
 
+# --- DASHBOARD ---
+@app.get("/api/dashboard", response_model=schemas.Dashboard)
+def read_dashboard(
+        db: Session = Depends(get_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    # Kennzahlen werden per Aggregat-Query berechnet, statt alle User und Transaktionen zu laden.
+    if current_user.role not in ['admin', 'mitarbeiter', 'kunde']:
+        raise HTTPException(status_code=403, detail="Not authorized to access this resource")
+    return crud.get_dashboard(db=db, current_user=current_user)
+
+# --- DELTA-SYNC ---
+@app.get("/api/sync", response_model=schemas.SyncResponse)
+def sync_changes(
+        since: Optional[str] = None,
+        db: Session = Depends(get_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    # 'since' ist der Cursor aus der letzten Antwort; ohne Cursor gibt es den vollständigen Stand.
+    since_dt = None
+    if since:
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return crud.get_changes(db=db, current_user=current_user, since=since_dt)
+
+# --- LIVE-EREIGNISSE (SSE) ---
+@app.get("/api/events")
+async def stream_events(
+        db: Session = Depends(get_db),
+        current_user: schemas.User = Depends(auth.get_current_active_user_for_stream)
+):
+    # Kunden erhalten nur Ereignisse zum eigenen Konto, Mitarbeiter alle des Mandanten.
+    user_filter = current_user.id if current_user.role == 'kunde' else None
+    subscription = events.broadcaster.subscribe(current_user.tenant_id, user_id=user_filter)
+    # Die DB-Verbindung wird für den Stream nicht gebraucht und sofort an den Pool zurückgegeben.
+    db.close()
+    return StreamingResponse(
+        events.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
     # FÜGE DIESEN CODE ZUM TESTEN AM ENDE DER DATEI HINZU
 @app.get("/api/test-password")
 def test_password_verification():
@@ -424,6 +742,7 @@ def update_dog_endpoint(
 @app.post("/api/users/{user_id}/documents", response_model=schemas.Document)
 async def upload_document(  # WICHTIG: async hinzufügen
     user_id: int,
+    request: Request,
     upload_file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user),
@@ -432,24 +751,65 @@ async def upload_document(  # WICHTIG: async hinzufügen
     if current_user.role not in ['admin', 'mitarbeiter'] and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Dateiinhalt lesen (await ist hier wichtig!)
-    file_content = await upload_file.read()
-    
+    max_size = settings.UPLOAD_MAX_DOCUMENT_MB * 1024 * 1024
+    uploads.check_content_length(request, max_size)
+
     # Pfad im Bucket: tenant_id/user_id/filename
-    file_path_in_bucket = f"{tenant.id}/{user_id}/{upload_file.filename}"
+    file_name = uploads.safe_filename(upload_file.filename)
+    file_path_in_bucket = f"{tenant.id}/{user_id}/{file_name}"
+
+    # Datei blockweise prüfen und zwischenspeichern, statt sie komplett in den Speicher zu laden
+    with await uploads.spool_upload(upload_file, max_size, uploads.DOCUMENT_TYPES) as spooled:
+        try:
+            await remote.acall("storage", uploads.store_spooled, get_storage(), "documents", file_path_in_bucket, spooled)
+        except remote.RemoteUnavailable as e:
+            print(f"Upload Error: {e}")
+            raise HTTPException(status_code=503, detail="Storage temporarily unavailable")
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Upload Error: {e}")
+            raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    # In DB speichern (Pfad ist jetzt der Bucket-Pfad)
+    return crud.create_document(
+        db, user_id, tenant.id, file_name, spooled.content_type, file_path_in_bucket,
+        file_size=spooled.size, checksum=spooled.checksum
+    )
+
+signed_url_cache = SignedUrlCache(settings.SIGNED_URL_TTL_SECONDS, settings.SIGNED_URL_MIN_REMAINING_SECONDS)
+
+
+def _sign_document_paths(paths: List[str], expires_in: int) -> dict:
+    # Ein Storage-Aufruf für alle Pfade
+    return remote.call("storage", get_storage().sign_many, "documents", paths, expires_in)
+
+
+@app.get("/api/users/{user_id}/documents/urls", response_model=List[schemas.SignedDocumentUrl])
+def read_document_urls(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    tenant: models.Tenant = Depends(auth.get_current_tenant)
+):
+    """Signierte URLs für alle Dokumente eines Kunden in einem Durchgang (Dokumente-Tab)."""
+    if current_user.role not in ['admin', 'mitarbeiter'] and current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
 
+    docs = crud.get_documents_for_user(db, user_id, tenant.id)
+    if not docs:
+        return []
     try:
-        supabase.storage.from_("documents").upload(
-            path=file_path_in_bucket,
-            file=file_content,
-            file_options={"content-type": upload_file.content_type, "upsert": "true"}
-        )
+        signed = signed_url_cache.get_many("documents", [doc.file_path for doc in docs], _sign_document_paths)
     except Exception as e:
-        print(f"Upload Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+        print(f"Signing Error: {e}")
+        raise HTTPException(status_code=502, detail="Storage not available")
+
+    return [
+        schemas.SignedDocumentUrl(id=doc.id, url=signed[doc.file_path][0], expires_at=datetime.fromtimestamp(signed[doc.file_path][1]))
+        for doc in docs if doc.file_path in signed
+    ]
 
-    # In DB speichern (Pfad ist jetzt der Bucket-Pfad)
-    return crud.create_document(db, user_id, tenant.id, upload_file.filename, upload_file.content_type, file_path_in_bucket)
 
 @app.get("/api/documents/{document_id}")
 def read_document(
@@ -466,12 +826,15 @@ def read_document(
         raise HTTPException(status_code=403, detail="Not authorized")
         
     try:
-        # Signierte URL für 60 Sekunden erstellen
-        res = supabase.storage.from_("documents").create_signed_url(doc.file_path, 60)
-        # Wir geben die URL als JSON zurück
-        return {"url": res["signedURL"]}
+        # Signierte URL aus dem Cache, solange sie noch lange genug gültig ist
+        signed = signed_url_cache.get("documents", doc.file_path, _sign_document_paths)
     except Exception as e:
-         raise HTTPException(status_code=404, detail="File not found in storage")
+        print(f"Signing Error: {e}")
+        signed = None
+    if signed is None:
+        raise HTTPException(status_code=404, detail="File not found in storage")
+    # Wir geben die URL als JSON zurück
+    return {"url": signed[0], "expires_at": datetime.fromtimestamp(signed[1])}
 
 @app.delete("/api/documents/{document_id}")
 def delete_document(
@@ -486,11 +849,12 @@ def delete_document(
     if current_user.role not in ['admin', 'mitarbeiter'] and current_user.id != doc.user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Datei aus Supabase löschen
+    # Datei aus dem Storage löschen
+    signed_url_cache.invalidate("documents", doc.file_path)
     try:
-        supabase.storage.from_("documents").remove([doc.file_path])
+        remote.call("storage", get_storage().delete, "documents", [doc.file_path])
     except Exception as e:
-        print(f"Supabase Delete Error: {e}")
+        print(f"Storage Delete Error: {e}")
 
     crud.delete_document(db, document_id, tenant.id)
     return {"ok": True}
@@ -528,18 +892,37 @@ def delete_dog_endpoint(
 
 
 @app.post("/api/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    # Wir prüfen nur, ob die Email in der lokalen DB schon existiert
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Wir erstellen NUR den lokalen Datenbank-User.
-    # Der Supabase-Auth-User wurde bereits vom Frontend erstellt.
-    return crud.create_user(db=db, user=user)
-
-@app.post("/api/upload/image")
+def register_user(
+    user: schemas.UserCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    # Registrierung hasht das Passwort mit bcrypt: pro IP drosseln
+    throttle.check(db, throttle.keys_for(request))
+    # Neue Kunden gehören zur Hundeschule, über deren Domain sie sich registrieren
+    tenant_id = tenancy.resolve_request_tenant_id(request, db)
+    tenancy.set_tenant(db, tenant_id)
+
+    def run():
+        # Wir prüfen nur, ob die Email in der lokalen DB schon existiert
+        db_user = crud.get_user_by_email(db, email=user.email)
+        if db_user:
+            raise HTTPException(status_code=400, detail="Email already registered")
+
+        # Wir erstellen NUR den lokalen Datenbank-User.
+        # Der Supabase-Auth-User wurde bereits vom Frontend erstellt.
+        return crud.create_user(db=db, user=user)
+    if idempotency_key:
+        # Ohne Anmeldung teilen sich alle Clients user_id 0: Schlüssel pro Mandant und E-Mail (nur als Hash)
+        # trennen, damit niemand mit einem erratenen Schlüssel die Antwort einer fremden Registrierung abruft
+        digest = hashlib.sha256(f"{tenant_id}:{user.email.strip().lower()}".encode()).hexdigest()[:32]
+        idempotency_key = f"register:{digest}:{idempotency_key}"
+    return _run_idempotent(db, idempotency_key, 0, "POST /api/register", user, schemas.User, run)
+
+@app.post("/api/upload/image", response_model=schemas.ImageUpload)
 async def upload_public_image( # WICHTIG: async hinzufügen
+    request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     tenant: models.Tenant = Depends(auth.get_current_tenant),
@@ -548,21 +931,190 @@ async def upload_public_image( # WICHTIG: async hinzufügen
     if current_user.role not in ['admin', 'mitarbeiter']:
          raise HTTPException(status_code=403, detail="Not authorized")
          
-    file_ext = os.path.splitext(file.filename)[1]
-    safe_name = f"{tenant.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(4)}{file_ext}"
-    
-    file_content = await file.read()
-    
-    try:
-        supabase.storage.from_("public_uploads").upload(
-            path=safe_name,
-            file=file_content,
-            file_options={"content-type": file.content_type, "upsert": "true"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Storage Error: {str(e)}")
-        
-    project_url = settings.SUPABASE_URL
-    public_url = f"{project_url}/storage/v1/object/public/public_uploads/{safe_name}"
-    
-    return {"url": public_url}
+    max_size = settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024
+    uploads.check_content_length(request, max_size)
+
+    base_name = f"{tenant.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(4)}"
+
+    # Pillow erst hier laden: selten genutzt und teuer beim Import (Cold Start)
+    from . import images
+
+    # Original wird nicht gespeichert: nur die verkleinerten WebP-Varianten ohne EXIF-Daten
+    with await uploads.spool_upload(file, max_size, uploads.IMAGE_TYPES) as spooled:
+        try:
+            renditions = await images.process_image(spooled.path)
+        except images.ImageProcessingError as e:
+            print(f"Image processing error: {e}")
+            raise HTTPException(status_code=415, detail="Could not process image")
+
+    storage = get_storage()
+    result = []
+    for rendition in renditions:
+        name = f"{base_name}_{rendition.width}w.webp"
+        try:
+            # Dateinamen sind eindeutig und ändern sich nie, daher lange cachebar
+            await remote.acall("storage", storage.upload, "public_uploads", name, rendition.data, "image/webp", cache_control="31536000")
+        except remote.RemoteUnavailable as e:
+            print(f"Storage Error: {e}")
+            raise HTTPException(status_code=503, detail="Storage temporarily unavailable")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Storage Error: {str(e)}")
+        url = storage.public_url("public_uploads", name)
+        result.append(schemas.ImageRendition(url=url, width=rendition.width, height=rendition.height))
+
+    result.sort(key=lambda r: r.width)
+    default = next((r for r in reversed(result) if r.width <= settings.IMAGE_DEFAULT_WIDTH), result[0])
+    return schemas.ImageUpload(
+        url=default.url,
+        srcset=images.srcset((r.url, r.width) for r in result),
+        width=result[-1].width,
+        height=result[-1].height,
+        renditions=result,
+    )
+
+
+@app.get("/api/admin/auth-sync", response_model=schemas.AuthSyncStatus)
+def read_auth_sync_status(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Stand der Synchronisation mit Supabase Auth (Outbox)."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return crud.get_auth_outbox_stats(db)
+
+
+@app.post("/api/admin/auth-sync/retry")
+def retry_auth_sync(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """Setzt endgültig fehlgeschlagene Einträge zurück und stößt den Worker an."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"requeued": crud.retry_failed_auth_sync(db)}
+
+
+@app.get("/api/storage/{bucket}/{file_path:path}")
+def read_stored_file(bucket: str, file_path: str, expires: Optional[int] = None, signature: Optional[str] = None):
+    """Liefert Dateien des lokalen Storage aus (nur STORAGE_BACKEND=local), geschützt per HMAC-Signatur."""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not storage.verify(bucket, file_path, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    return storage.stream(bucket, file_path)
+
+
+# --- BATCH (Offline-Warteschlange) ---
+# Operationen, die der Service Worker offline vormerken kann. Jede Zeile:
+# (Methode, Pfad-Muster, Handler(match, body, db, user), Antwort-Schema)
+BATCH_MAX_OPERATIONS = 100
+
+BATCH_ROUTES = [
+    ("POST", re.compile(r"^/api/transactions$"),
+     lambda m, body, db, user: create_transaction(transaction=schemas.TransactionCreate(**body), include_aggregate=False, db=db, current_user=user, idempotency_key=None),
+     schemas.TransactionResult),
+    ("PUT", re.compile(r"^/api/users/(\d+)/level$"),
+     lambda m, body, db, user: update_user_level_endpoint(user_id=int(m.group(1)), level_update=schemas.UserLevelUpdate(**body), include_aggregate=False, db=db, current_user=user),
+     schemas.UserResult),
+    ("PUT", re.compile(r"^/api/users/(\d+)/status$"),
+     lambda m, body, db, user: update_user_status_endpoint(user_id=int(m.group(1)), status_update=schemas.UserStatusUpdate(**body), include_aggregate=False, db=db, current_user=user),
+     schemas.UserResult),
+    ("PUT", re.compile(r"^/api/users/(\d+)/vip$"),
+     lambda m, body, db, user: update_user_vip_status_endpoint(user_id=int(m.group(1)), vip_update=schemas.UserVipUpdate(**body), include_aggregate=False, db=db, current_user=user),
+     schemas.UserResult),
+    ("PUT", re.compile(r"^/api/users/(\d+)/expert$"),
+     lambda m, body, db, user: update_user_expert_status_endpoint(user_id=int(m.group(1)), expert_update=schemas.UserExpertUpdate(**body), include_aggregate=False, db=db, current_user=user),
+     schemas.UserResult),
+    ("PUT", re.compile(r"^/api/users/(\d+)$"),
+     lambda m, body, db, user: update_user_endpoint(user_id=int(m.group(1)), user_update=schemas.UserUpdate(**body), db=db, current_user=user),
+     schemas.User),
+    ("POST", re.compile(r"^/api/users/(\d+)/dogs$"),
+     lambda m, body, db, user: create_dog_for_user_endpoint(user_id=int(m.group(1)), dog=schemas.DogCreate(**body), db=db, current_user=user),
+     schemas.Dog),
+    ("PUT", re.compile(r"^/api/dogs/(\d+)$"),
+     lambda m, body, db, user: update_dog_endpoint(dog_id=int(m.group(1)), dog_update=schemas.DogBase(**body), db=db, current_user=user),
+     schemas.Dog),
+    ("DELETE", re.compile(r"^/api/dogs/(\d+)$"),
+     lambda m, body, db, user: delete_dog_endpoint(dog_id=int(m.group(1)), db=db, current_user=user),
+     None),
+]
+
+
+def _run_batch_operation(op: schemas.BatchOperation, db: Session, current_user) -> schemas.BatchResult:
+    path = urlsplit(op.path).path
+    for method, pattern, handler, response_schema in BATCH_ROUTES:
+        match = pattern.match(path)
+        if match and method == op.method.upper():
+            if op.idempotency_key and response_schema is not None:
+                # Wie der Idempotency-Key-Header, pro Benutzer: eine erneut gesendete Offline-Warteschlange
+                # erhält die gespeicherte Antwort, statt Aufladungen oder Level-Aufstiege doppelt zu buchen.
+                # DELETE (ohne Antwort-Schema) ist von sich aus wiederholbar.
+                response = _run_idempotent(
+                    db, op.idempotency_key, current_user.id, f"BATCH {method} {path}", op.model_copy(update={"id": None}),
+                    response_schema, lambda: handler(match, op.body or {}, db, current_user),
+                )
+                return schemas.BatchResult(id=op.id, status=response.status_code, body=json.loads(response.body))
+            result = handler(match, op.body or {}, db, current_user)
+            if response_schema is not None:
+                result = response_schema.model_validate(result).model_dump(mode="json")
+            return schemas.BatchResult(id=op.id, status=200, body=result)
+    raise HTTPException(status_code=404, detail=f"Operation not supported in batch: {op.method} {path}")
+
+
+@app.post("/api/batch", response_model=schemas.BatchResponse)
+def run_batch(
+    batch: schemas.BatchRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """
+    Führt die Operationen der Reihe nach in einer DB-Transaktion aus. Die Commits der
+    crud-Funktionen geben dabei nur einen Savepoint pro Operation frei; scheitert eine
+    Operation, wird nur ihr Savepoint zurückgerollt (oder bei atomic=True der ganze Batch).
+    """
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+
+    results = []
+    with engine.connect() as connection:
+        outer = connection.begin()
+        db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+        tenancy.set_tenant(db, current_user.tenant_id)
+        events.defer(db)
+        try:
+            # Der Benutzer muss in der Batch-Session leben, da die Handler ihn an crud weitergeben.
+            user = crud.get_user(db, user_id=current_user.id)
+            failed = False
+            for op in batch.operations:
+                events_before = events.pending_count(db)
+                try:
+                    results.append(_run_batch_operation(op, db, user))
+                except Exception as e:
+                    db.rollback()
+                    events.discard_since(db, events_before)
+                    failed = True
+                    if isinstance(e, HTTPException):
+                        results.append(schemas.BatchResult(id=op.id, status=e.status_code, body={"detail": e.detail}))
+                    elif isinstance(e, ValidationError):
+                        results.append(schemas.BatchResult(id=op.id, status=422, body={"detail": e.errors(include_url=False)}))
+                    elif isinstance(e, StaleDataError):
+                        results.append(schemas.BatchResult(id=op.id, status=409, body={"detail": "The record was modified concurrently, please retry"}))
+                    else:
+                        # Details nur ins Log, nicht zum Client (SQL, interne Namen)
+                        print(f"FEHLER in Batch-Operation {op.method} {op.path}: {e}")
+                        results.append(schemas.BatchResult(id=op.id, status=500, body={"detail": "Internal Server Error"}))
+                    if batch.atomic:
+                        break
+
+            if failed and batch.atomic:
+                outer.rollback()
+                return {"committed": False, "results": results}
+            # Datenversion erst jetzt hochzählen: die Sperre auf tenants nicht über den ganzen Batch halten
+            crud.bump_data_versions(db)
+            db.commit()
+            outer.commit()
+            events.publish_deferred(db)
+            return {"committed": True, "results": results}
+        finally:
+            db.close()
@@ -0,0 +1,182 @@
+"""
+Prometheus-Metriken für /metrics (Kapazitätsplanung und Alarme auf Sättigung).
+
+  - Anfragen: Latenz-Histogramm nach Methode, Route (Pfad-Vorlage wie /api/users/{user_id})
+    und Status sowie die Zahl laufender Anfragen (MetricsMiddleware)
+  - DB-Pool von database.engine: Wartezeit bis zur Verbindung, Größe, ausgeliehene
+    Verbindungen, Overflow und Auslastung
+  - Supabase (remote.py): Dauer jedes Versuchs nach Dienst und Ergebnis, Fehler nach Art,
+    Warteschlange des Remote-Thread-Pools und offene Circuit Breaker
+  - bcrypt: laufende Hash-Berechnungen und ihre Dauer; bcrypt läuft in synchronen Endpunkten
+    im Threadpool von AnyIO, dessen belegte Threads und wartende Aufgaben daher die
+    eigentliche Warteschlange vor bcrypt sind
+
+Die Zählerstände gelten pro Prozess; jeder Worker wird einzeln abgefragt. Ohne
+prometheus_client sind alle Funktionen wirkungslos und /metrics antwortet mit 503.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import prometheus_client
+except ImportError:  # prometheus_client ist optional, dann werden keine Metriken erhoben
+    prometheus_client = None
+
+PREFIX = "pfotencard"
+# Anfragen: von schnellen Cache-Treffern (304) bis zu langsamen Uploads
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Wartezeit auf eine DB-Verbindung: im Normalfall Mikrosekunden
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# Nicht zugeordnete Pfade (404) unter einem Label, damit die Zahl der Zeitreihen begrenzt bleibt
+UNMATCHED_ROUTE = "unmatched"
+
+if prometheus_client is not None:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    REQUEST_LATENCY = Histogram(f"{PREFIX}_http_request_duration_seconds", "Dauer der HTTP-Anfragen",
+                                ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+    REQUESTS_IN_PROGRESS = Gauge(f"{PREFIX}_http_requests_in_progress", "Laufende HTTP-Anfragen")
+
+    POOL_WAIT = Histogram(f"{PREFIX}_db_pool_checkout_wait_seconds", "Wartezeit bis zur DB-Verbindung aus dem Pool",
+                          buckets=POOL_WAIT_BUCKETS)
+    POOL_SIZE = Gauge(f"{PREFIX}_db_pool_size", "Verbindungen im Pool (ohne Overflow)")
+    POOL_CHECKED_OUT = Gauge(f"{PREFIX}_db_pool_checked_out", "Ausgeliehene DB-Verbindungen")
+    POOL_OVERFLOW = Gauge(f"{PREFIX}_db_pool_overflow", "Verbindungen über die Poolgröße hinaus")
+    POOL_UTILIZATION = Gauge(f"{PREFIX}_db_pool_utilization", "Ausgeliehene Verbindungen / (Poolgröße + max. Overflow)")
+
+    REMOTE_LATENCY = Histogram(f"{PREFIX}_remote_call_duration_seconds", "Dauer eines Supabase-Aufrufs (je Versuch)",
+                               ["service", "outcome"], buckets=LATENCY_BUCKETS)
+    REMOTE_ERRORS = Counter(f"{PREFIX}_remote_call_errors_total", "Fehlgeschlagene Supabase-Aufrufe (je Versuch)",
+                            ["service", "kind"])
+    REMOTE_QUEUE = Gauge(f"{PREFIX}_remote_executor_queue_depth", "Aufrufe, die auf einen Thread des Remote-Pools warten")
+    REMOTE_CIRCUIT_OPEN = Gauge(f"{PREFIX}_remote_circuit_open", "1, solange der Circuit Breaker offen ist", ["service"])
+
+    BCRYPT_IN_PROGRESS = Gauge(f"{PREFIX}_bcrypt_in_progress", "Laufende bcrypt-Berechnungen")
+    BCRYPT_LATENCY = Histogram(f"{PREFIX}_bcrypt_duration_seconds", "Dauer einer bcrypt-Berechnung", ["operation"],
+                               buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0))
+    THREADPOOL_IN_USE = Gauge(f"{PREFIX}_threadpool_in_use", "Belegte Threads des AnyIO-Threadpools (synchrone Endpunkte, bcrypt)")
+    THREADPOOL_SIZE = Gauge(f"{PREFIX}_threadpool_size", "Größe des AnyIO-Threadpools")
+    THREADPOOL_WAITING = Gauge(f"{PREFIX}_threadpool_waiting", "Aufgaben, die auf einen Thread des AnyIO-Threadpools warten")
+
+
+class MetricsMiddleware:
+    """Misst jede HTTP-Anfrage; die Route wird nach dem Routing aus scope["endpoint"] bestimmt."""
+
+    def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.exclude_paths = tuple(exclude_paths)
+        self._routes: Optional[Dict[object, str]] = None
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if self._routes is None:
+            # Routen stehen nach dem Start fest; erste Zuordnung gewinnt
+            self._routes = {}
+            for route in scope["app"].routes:
+                self._routes.setdefault(getattr(route, "endpoint", None), getattr(route, "path", UNMATCHED_ROUTE))
+        return self._routes.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if prometheus_client is None or scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            REQUEST_LATENCY.labels(scope["method"], self._route(scope), str(status_code)).observe(time.perf_counter() - start)
+
+
+_engines = []
+
+
+def instrument_engine(engine):
+    """Misst die Wartezeit bis zur Verbindung (Pool.connect) für alle Sessions der Engine."""
+    if prometheus_client is None:
+        return
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    _engines.append(engine)
+
+
+def observe_remote(service: str, seconds: Optional[float], outcome: str):
+    """outcome: success, client_error (4xx, nicht wiederholt), timeout, error oder
+    circuit_open (ohne Aufruf abgewiesen, seconds=None)."""
+    if prometheus_client is None:
+        return
+    if seconds is not None:
+        REMOTE_LATENCY.labels(service, outcome).observe(seconds)
+    if outcome not in ("success", "client_error"):
+        REMOTE_ERRORS.labels(service, outcome).inc()
+
+
+@contextmanager
+def bcrypt_timer(operation: str):
+    if prometheus_client is None:
+        yield
+        return
+    BCRYPT_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        BCRYPT_IN_PROGRESS.dec()
+        BCRYPT_LATENCY.labels(operation).observe(time.perf_counter() - start)
+
+
+def _sample():
+    """Setzt die Zustands-Gauges unmittelbar vor der Ausgabe (im Event-Loop aufrufen)."""
+    from . import remote
+
+    for engine in _engines:
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue  # z.B. SQLite ohne QueuePool
+        size, checked_out, overflow = pool.size(), pool.checkedout(), max(0, pool.overflow())
+        POOL_SIZE.set(size)
+        POOL_CHECKED_OUT.set(checked_out)
+        POOL_OVERFLOW.set(overflow)
+        capacity = size + max(0, getattr(pool, "_max_overflow", 0))
+        POOL_UTILIZATION.set(checked_out / capacity if capacity > 0 else 0)
+
+    REMOTE_QUEUE.set(remote.queue_depth())
+    for service, state in remote.breaker_states().items():
+        REMOTE_CIRCUIT_OPEN.labels(service).set(1 if state == "open" else 0)
+
+    from anyio import to_thread
+
+    statistics = to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL_IN_USE.set(statistics.borrowed_tokens)
+    THREADPOOL_SIZE.set(statistics.total_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+
+def render() -> Tuple[bytes, str]:
+    """Metriken im Prometheus-Textformat (Inhalt, Content-Type)."""
+    _sample()
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
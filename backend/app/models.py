@@ -1,18 +1,48 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Boolean
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Boolean, Index, Text, UniqueConstraint, event
+from sqlalchemy.orm import relationship, declarative_base, declared_attr, Session
 from sqlalchemy.sql import func
  
 Base = declarative_base()
+
+
+class TenantMixin:
+    # Mandantenbezogene Tabelle: Abfragen werden automatisch gefiltert (siehe tenancy.py).
+    # Indizes auf diesen Tabellen beginnen mit tenant_id.
+    tenant_id = Column(Integer, default=1, nullable=False)
+
+
+class SyncMixin:
+    # Änderungsverfolgung für /api/sync: updated_at dient als Cursor (Index je Tabelle mit tenant_id),
+    # version wird von SQLAlchemy bei jedem UPDATE automatisch hochgezählt.
+    # clock_timestamp() statt now(): Zeitpunkt des Schreibens, nicht des Transaktionsbeginns
+    # (passend zum Cursor aus crud.get_changes).
+    updated_at = Column(DateTime, server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(), nullable=False)
+    version = Column(Integer, default=1, nullable=False)
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.version}
  
 class Tenant(Base):
     __tablename__ = 'tenants'
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
+    # Wird von den crud-Schreibfunktionen hochgezählt und dient als ETag-Validator.
+    data_version = Column(Integer, default=1, server_default='1', nullable=False)
+    # Host, unter dem die Hundeschule erreichbar ist (Zuordnung anonymer Anfragen, z.B. Registrierung)
+    domain = Column(String(255), unique=True, nullable=True)
+    # Wird bei jeder Änderung der Level-Anforderungen hochgezählt (Cache-Invalidierung in rules.py)
+    rules_version = Column(Integer, default=0, server_default='0', nullable=False)
+    # Dasselbe für die Bonuspläne (bonus.py)
+    bonus_version = Column(Integer, default=0, server_default='0', nullable=False)
  
-class User(Base):
+class User(TenantMixin, SyncMixin, Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_tenant_id_role_name', 'tenant_id', 'role', 'name'),
+        Index('ix_users_tenant_id_updated_at', 'tenant_id', 'updated_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    tenant_id = Column(Integer, default=1, nullable=False) # NEU
     auth_id = Column(String(255), unique=True, index=True, nullable=True) # NEU
     name = Column(String(255), index=True, nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -31,9 +61,16 @@ class User(Base):
     achievements = relationship("Achievement", back_populates="user", cascade="all, delete-orphan")
     documents = relationship("Document", back_populates="user", cascade="all, delete-orphan")
 
+    # Nicht persistiert: wird von crud bei with_aggregate=True gesetzt (siehe schemas.UserResult)
+    aggregate = None
 
-class Dog(Base):
+
+class Dog(TenantMixin, SyncMixin, Base):
     __tablename__ = 'dogs'
+    __table_args__ = (
+        Index('ix_dogs_tenant_id_owner_id', 'tenant_id', 'owner_id'),
+        Index('ix_dogs_tenant_id_updated_at', 'tenant_id', 'updated_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     name = Column(String(255), index=True, nullable=False)
@@ -43,41 +80,195 @@ class Dog(Base):
     owner = relationship("User", back_populates="dogs")
 
 
-class Transaction(Base):
+class Transaction(TenantMixin, SyncMixin, Base):
     __tablename__ = 'transactions'
-    id = Column(Integer, primary_key=True, index=True)
+    # Dashboard/Listen filtern nach Mandant und Kunde bzw. Mitarbeiter und sortieren nach Datum.
+    # Monatlich nach date partitioniert (partitions.py); der Primärschlüssel muss daher date enthalten.
+    __table_args__ = (
+        Index('ix_transactions_tenant_id_date', 'tenant_id', 'date'),
+        Index('ix_transactions_tenant_id_user_id_date', 'tenant_id', 'user_id', 'date'),
+        Index('ix_transactions_tenant_id_booked_by_id_date', 'tenant_id', 'booked_by_id', 'date'),
+        Index('ix_transactions_tenant_id_updated_at', 'tenant_id', 'updated_at'),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    date = Column(DateTime, server_default=func.now())
+    date = Column(DateTime, primary_key=True, server_default=func.now())
     type = Column(String(255), nullable=False)
     description = Column(String(255))
     amount = Column(Float, nullable=False)
     balance_after = Column(Float, nullable=False)
+    bonus = Column(Float, default=0.0, server_default='0', nullable=False)  # in amount enthaltener Bonus
     booked_by_id = Column(Integer, ForeignKey('users.id'), nullable=False)
 
     # HIER DIE KORREKTUR: Wir weisen jede Beziehung explizit einer Fremdschlüssel-Spalte zu.
     user = relationship("User", foreign_keys=[user_id], back_populates="transactions")
     booked_by = relationship("User", foreign_keys=[booked_by_id])
 
+    # Nicht persistiert: wird von crud bei with_aggregate=True gesetzt (siehe schemas.TransactionResult)
+    aggregate = None
+
+    @declared_attr
+    def __mapper_args__(cls):
+        # Für das ORM bleibt id allein der Schlüssel; date kommt per RETURNING aus dem server_default
+        return {"version_id_col": cls.version, "primary_key": [cls.id], "eager_defaults": True}
+
+
+class TransactionArchive(Base):
+    # Archivierte Monatspartitionen von transactions (archive.py)
+    __tablename__ = 'transaction_archives'
+    id = Column(Integer, primary_key=True)
+    month = Column(Date, unique=True, nullable=False)
+    partition_name = Column(String(63), nullable=False)
+    file_path = Column(String(512), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    checksum = Column(String(64), nullable=False)  # SHA-256 (hex) der Datei
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+
 
-class Achievement(Base):
+class Achievement(TenantMixin, SyncMixin, Base):
     __tablename__ = 'achievements'
+    __table_args__ = (
+        Index('ix_achievements_tenant_id_user_id_is_consumed', 'tenant_id', 'user_id', 'is_consumed'),
+        Index('ix_achievements_tenant_id_updated_at', 'tenant_id', 'updated_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     requirement_id = Column(String(255), nullable=False)
     date_achieved = Column(DateTime, server_default=func.now())
-    transaction_id = Column(Integer, ForeignKey('transactions.id'), nullable=True)
+    # Ohne Fremdschlüssel: transactions ist partitioniert und alte Monate werden archiviert
+    transaction_id = Column(Integer, nullable=True)
     is_consumed = Column(Boolean, default=False, nullable=False)  # <-- NEUE ZEILE
 
     user = relationship("User", back_populates="achievements")
 
-class Document(Base):
+class Document(TenantMixin, SyncMixin, Base):
     __tablename__ = 'documents'
+    __table_args__ = (
+        Index('ix_documents_tenant_id_user_id', 'tenant_id', 'user_id'),
+        Index('ix_documents_tenant_id_updated_at', 'tenant_id', 'updated_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    tenant_id = Column(Integer, default=1, nullable=False) # NEU
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_type = Column(String(100), nullable=False)
     upload_date = Column(DateTime, server_default=func.now())
     file_path = Column(String(512), nullable=False)
+    file_size = Column(Integer, nullable=True)  # Bytes
+    checksum = Column(String(64), nullable=True)  # SHA-256 (hex) des Inhalts
 
     user = relationship("User", back_populates="documents")
+
+
+class IdempotencyKey(Base):
+    # Gespeicherte Antworten zu Idempotency-Key-Headern (POST /api/transactions, Benutzeranlage)
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_id_key'),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, default=0, nullable=False)  # 0 = nicht angemeldet (z.B. /api/register)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL = Anfrage läuft noch bzw. wurde abgebrochen
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class LoginThrottle(Base):
+    # Gemeinsame Zähler der Login-Drossel über alle Worker (throttle.py); key ist "ip:..." bzw. "account:<Hash>"
+    __tablename__ = 'login_throttle'
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    refilled_at = Column(DateTime, nullable=False, index=True)
+    failures = Column(Integer, default=0, nullable=False)
+    last_failure_at = Column(DateTime, nullable=True)
+    blocked_until = Column(DateTime, nullable=True)
+
+
+class AuthOutbox(Base):
+    # Ausstehende Änderungen an Supabase Auth; wird in derselben Transaktion wie die lokale
+    # Änderung geschrieben und von outbox.py abgearbeitet. Enthält nie Klartext-Passwörter.
+    __tablename__ = 'auth_outbox'
+    __table_args__ = (Index('ix_auth_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),)
+    id = Column(Integer, primary_key=True, index=True)
+    operation = Column(String(20), nullable=False)  # create, update, delete
+    user_id = Column(Integer, nullable=True)  # lokaler User (bei delete bereits gelöscht)
+    email = Column(String(255), nullable=False)  # E-Mail, unter der der User in Supabase geführt wird
+    payload = Column(Text, nullable=True)  # JSON, z.B. {"new_email": ..., "name": ..., "password": true}
+    status = Column(String(20), default='pending', nullable=False)  # pending, done, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime, nullable=True)
+
+
+class LevelRequirement(TenantMixin, Base):
+    # Anforderungen für den Aufstieg pro Mandant und Level (siehe rules.py)
+    __tablename__ = 'level_requirements'
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'level_id', 'requirement_id', name='uq_level_requirements_tenant_level_requirement'),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    level_id = Column(Integer, nullable=False)
+    requirement_id = Column(String(100), nullable=False)  # z.B. 'group_class', 'exam'
+    name = Column(String(255), nullable=False)
+    required = Column(Integer, default=1, nullable=False)
+    position = Column(Integer, default=0, nullable=False)  # Reihenfolge in der Anzeige
+    consumed_on_level_up = Column(Boolean, default=True, nullable=False)
+
+
+class BonusSchedule(TenantMixin, Base):
+    # Bonusplan für Aufladungen; ohne valid_from der Grundplan, sonst eine zeitlich begrenzte Aktion
+    __tablename__ = 'bonus_schedules'
+    __table_args__ = (Index('ix_bonus_schedules_tenant_id_valid_from', 'tenant_id', 'valid_from'),)
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    valid_from = Column(DateTime, nullable=True)
+    valid_until = Column(DateTime, nullable=True)  # exklusiv
+    created_at = Column(DateTime, server_default=func.now())
+
+    tiers = relationship("BonusTier", cascade="all, delete-orphan", order_by="BonusTier.min_amount")
+
+
+class BonusTier(Base):
+    __tablename__ = 'bonus_tiers'
+    __table_args__ = (UniqueConstraint('schedule_id', 'min_amount', name='uq_bonus_tiers_schedule_id_min_amount'),)
+    id = Column(Integer, primary_key=True, index=True)
+    schedule_id = Column(Integer, ForeignKey('bonus_schedules.id', ondelete='CASCADE'), nullable=False)
+    min_amount = Column(Float, nullable=False)  # ab diesem Aufladebetrag ...
+    bonus = Column(Float, nullable=False)  # ... gibt es diesen Bonus
+
+
+class Tombstone(TenantMixin, Base):
+    # Merkt sich gelöschte Datensätze, damit /api/sync Löschungen ausliefern kann.
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        Index('ix_tombstones_tenant_id_deleted_at', 'tenant_id', 'deleted_at'),
+        Index('ix_tombstones_tenant_id_user_id', 'tenant_id', 'user_id'),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)  # Besitzer, für die Rollen-Filterung
+    deleted_at = Column(DateTime, server_default=func.clock_timestamp(), nullable=False)
+
+
+def _tombstone_owner_id(obj):
+    if isinstance(obj, User):
+        return obj.id
+    if isinstance(obj, Dog):
+        return obj.owner_id
+    return getattr(obj, "user_id", None)
+
+
+@event.listens_for(Session, "before_flush")
+def _record_tombstones(session, flush_context, instances):
+    for obj in list(session.deleted):
+        if isinstance(obj, SyncMixin):
+            session.add(Tombstone(
+                tenant_id=obj.tenant_id,
+                table_name=obj.__tablename__,
+                row_id=obj.id,
+                user_id=_tombstone_owner_id(obj),
+            ))
@@ -0,0 +1,212 @@
+"""
+Transaktionale Outbox für die Synchronisation mit Supabase Auth.
+
+Die Admin-Endpunkte rufen Supabase nicht mehr direkt auf, sondern legen mit
+crud.enqueue_auth_sync() einen Eintrag in auth_outbox an – in derselben Transaktion wie
+die lokale Änderung. Nach dem Commit startet ein Hintergrund-Thread, der die fälligen
+Einträge in Batches abarbeitet; fehlgeschlagene Einträge werden mit Backoff erneut
+versucht und nach OUTBOX_MAX_ATTEMPTS als 'failed' markiert (siehe /api/admin/auth-sync).
+
+Passwörter werden nicht gespeichert: Supabase erhält den bcrypt-Hash aus users.hashed_password.
+"""
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, models, remote, tenancy
+from .config import settings
+from .database import SessionLocal
+
+_SCHEDULE_KEY = "auth_outbox_scheduled"
+# Supabase meldet bereits vorhandene E-Mail-Adressen mit 422
+_ALREADY_EXISTS_STATUS = 422
+
+_drain_lock = threading.Lock()
+_rerun = threading.Event()
+
+
+def schedule(db: Session):
+    """Nach dem nächsten Commit dieser Session den Worker anstoßen."""
+    db.info[_SCHEDULE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _kick_after_commit(session):
+    if session.info.pop(_SCHEDULE_KEY, False):
+        kick()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_schedule(session, previous_transaction):
+    session.info.pop(_SCHEDULE_KEY, None)
+
+
+def kick():
+    """Startet den Worker-Thread, falls er nicht schon läuft (sonst läuft er noch eine Runde)."""
+    if not _drain_lock.acquire(blocking=False):
+        _rerun.set()
+        return
+    threading.Thread(target=_drain_thread, name="auth-outbox", daemon=True).start()
+
+
+def _drain_thread():
+    try:
+        while True:
+            _rerun.clear()
+            try:
+                drain()
+            except Exception as e:
+                print(f"FEHLER im Auth-Outbox-Worker: {e}")
+            if not _rerun.is_set():
+                break
+    finally:
+        _drain_lock.release()
+
+
+def drain() -> int:
+    """Arbeitet alle fälligen Einträge ab; liefert die Anzahl erledigter Einträge."""
+    done = 0
+    db = SessionLocal()
+    tenancy.all_tenants(db)  # Worker für alle Mandanten
+    try:
+        _purge_done(db)
+        while True:
+            processed, succeeded = process_batch(db)
+            done += succeeded
+            if processed == 0 or succeeded == 0:
+                break
+    finally:
+        db.close()
+    return done
+
+
+def _purge_done(db: Session):
+    cutoff = datetime.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    db.query(models.AuthOutbox).filter(
+        models.AuthOutbox.status == 'done', models.AuthOutbox.processed_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def process_batch(db: Session):
+    entries = crud.claim_auth_outbox_batch(db, settings.OUTBOX_BATCH_SIZE)
+    if not entries:
+        db.commit()
+        return 0, 0
+
+    client = remote.get_supabase_client()
+    succeeded = 0
+    # Reihenfolge pro E-Mail einhalten: nach einem Fehler warten spätere Einträge mit
+    blocked = {}
+    uids = None
+    for entry in entries:
+        key = entry.email.lower().strip()
+        if key in blocked:
+            entry.next_attempt_at = blocked[key]
+            continue
+        if remote.breaker("auth").state == "open":
+            blocked[key] = entry.next_attempt_at = datetime.now() + timedelta(seconds=settings.REMOTE_BREAKER_RESET_SECONDS)
+            continue
+        try:
+            if uids is None and entry.operation != 'create':
+                uids = _load_auth_uids(client)
+            _apply(client, db, entry, uids)
+        except Exception as e:
+            _mark_failed(entry, e)
+            blocked[key] = entry.next_attempt_at
+            print(f"FEHLER beim Auth-Sync ({entry.operation} {entry.email}, Versuch {entry.attempts}): {e}")
+        else:
+            entry.status = 'done'
+            entry.processed_at = datetime.now()
+            succeeded += 1
+    db.commit()
+    return len(entries), succeeded
+
+
+def _load_auth_uids(client) -> dict:
+    """E-Mail -> Supabase-UID für alle Auth-User (ein Aufruf pro 1000 User statt pro Eintrag)."""
+    uids = {}
+    page = 1
+    while True:
+        response = remote.call("auth", client.auth.admin.list_users, page=page, per_page=1000)
+        users = response if isinstance(response, list) else getattr(response, 'users', [])
+        for u in users:
+            if u.email:
+                uids[u.email.lower().strip()] = u.id
+        if len(users) < 1000:
+            return uids
+        page += 1
+
+
+def _apply(client, db: Session, entry: models.AuthOutbox, uids: dict):
+    payload = json.loads(entry.payload) if entry.payload else {}
+    key = entry.email.lower().strip()
+
+    if entry.operation == 'create':
+        db_user = crud.get_user_by_email(db, email=entry.email)
+        if db_user is None:
+            entry.last_error = "Lokaler User existiert nicht mehr"
+            return
+        attributes = {
+            "email": entry.email,
+            "password_hash": db_user.hashed_password,
+            "email_confirm": True,  # Admin hat ihn erstellt, also ist er sofort bestätigt
+            "user_metadata": {"name": payload.get("name", db_user.name)},
+            # Landet im JWT (app_metadata.tenant_id), siehe tenancy.token_tenant_id
+            "app_metadata": {"tenant_id": db_user.tenant_id},
+        }
+        try:
+            # retries=0: Anlegen ist nicht idempotent, Wiederholung übernimmt die Outbox
+            response = remote.call("auth", client.auth.admin.create_user, attributes, retries=0)
+        except Exception as e:
+            if getattr(e, "status", None) == _ALREADY_EXISTS_STATUS:
+                entry.last_error = f"Existiert bereits in Supabase: {e}"
+                return
+            raise
+        if uids is not None and getattr(response, "user", None):
+            uids[key] = response.user.id
+
+    elif entry.operation == 'update':
+        uid = uids.get(key)
+        if uid is None:
+            # Wie bisher: nur vermerken, lokale Daten bleiben maßgeblich
+            entry.last_error = "User in Supabase nicht gefunden, übersprungen"
+            return
+        attributes = {}
+        if payload.get("new_email"):
+            attributes["email"] = payload["new_email"]
+        if payload.get("name"):
+            attributes["user_metadata"] = {"name": payload["name"]}
+        if payload.get("password"):
+            db_user = crud.get_user(db, user_id=entry.user_id)
+            if db_user is not None:
+                attributes["password_hash"] = db_user.hashed_password
+        if attributes:
+            remote.call("auth", client.auth.admin.update_user_by_id, uid, attributes)
+        if payload.get("new_email"):
+            uids[payload["new_email"].lower().strip()] = uids.pop(key)
+
+    elif entry.operation == 'delete':
+        uid = uids.get(key)
+        if uid is None:
+            entry.last_error = "User in Supabase nicht gefunden (evtl. schon gelöscht)"
+            return
+        remote.call("auth", client.auth.admin.delete_user, uid)
+        uids.pop(key, None)
+
+    else:
+        raise ValueError(f"Unbekannte Operation: {entry.operation}")
+
+
+def _mark_failed(entry: models.AuthOutbox, error: Exception):
+    entry.attempts += 1
+    entry.last_error = str(error)[:1000]
+    if entry.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        entry.status = 'failed'
+        return
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** (entry.attempts - 1)), 3600)
+    entry.next_attempt_at = datetime.now() + timedelta(seconds=random.uniform(delay / 2, delay))
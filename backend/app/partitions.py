@@ -0,0 +1,156 @@
+"""
+Monatliche Partitionierung der Tabelle transactions (PARTITION BY RANGE (date)).
+
+Jeder Monat liegt in einer eigenen Partition transactions_JJJJ_MM. Abfragen mit einer
+Bedingung auf date (Dashboard, Listen mit `since`) lesen nur die betroffenen Monate;
+ORDER BY date DESC LIMIT liest die Partitionen vom neuesten Monat an und bricht früh ab.
+
+Partitionen werden von migrate_db.py und täglich per Cron (GET /api/cron/partitions, siehe
+vercel.json) für den laufenden und die nächsten TRANSACTION_PARTITION_MONTHS_AHEAD Monate
+angelegt; der Start der App legt nichts an (kein DDL pro Cold Start). Was in keinen Monat fällt, landet in transactions_default; legt ensure_partitions
+später den passenden Monat an, werden diese Zeilen dorthin verschoben.
+
+Alte Monate lagert archive.py in komprimierte Dateien aus (DETACH PARTITION + DROP).
+"""
+import re
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import DDL, event, text
+from sqlalchemy.engine import Connection
+
+from . import models
+from .config import settings
+from .database import engine
+
+PARENT = models.Transaction.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+_NAME_PATTERN = re.compile(rf"^{PARENT}_(\d{{4}})_(\d{{2}})$")
+
+# Neue Datenbanken (create_all) erhalten die Default-Partition gleich mit der Tabelle,
+# damit Inserts vor dem ersten ensure_partitions nicht fehlschlagen.
+event.listen(
+    models.Transaction.__table__, "after_create",
+    DDL(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT").execute_if(dialect="postgresql"),
+)
+
+
+class Partition(NamedTuple):
+    name: str
+    start: datetime  # inklusive
+    end: datetime  # exklusive
+    attached: bool
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_{month.year:04d}_{month.month:02d}"
+
+
+def parse_month(value: str) -> datetime:
+    """'2024-03' -> 1. März 2024 (Monatsangaben der Kommandozeile)."""
+    return datetime.strptime(value, "%Y-%m")
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"
+    ), {"name": PARENT}).scalar() or False
+
+
+def list_partitions(conn: Connection) -> List[Partition]:
+    """Monatspartitionen nach Monat sortiert, auch bereits abgehängte (noch nicht archivierte)."""
+    rows = conn.execute(text("""
+        SELECT c.relname, c.relispartition
+        FROM pg_class c
+        WHERE c.relkind = 'r' AND c.relname LIKE :prefix AND c.relnamespace = 'public'::regnamespace
+    """), {"prefix": f"{PARENT}\\_%"}).all()
+    partitions = []
+    for name, attached in rows:
+        match = _NAME_PATTERN.match(name)
+        if match:
+            start = datetime(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append(Partition(name, start, add_months(start, 1), attached))
+    return sorted(partitions, key=lambda p: p.start)
+
+
+def create_partition(conn: Connection, month: datetime) -> bool:
+    """Legt die Partition eines Monats an; Zeilen dieses Monats aus der Default-Partition
+    werden übernommen. False, wenn es sie schon gab."""
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+    start, end = month, add_months(month, 1)
+    bounds = f"FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    in_month = {"start": start, "end": end}
+    has_default = conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    if not has_default or not conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end)"
+    ), in_month).scalar():
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES {bounds}"))
+        return True
+    # Postgres verweigert die neue Partition, solange die Default-Partition Zeilen aus ihrem
+    # Bereich enthält: Zeilen zwischenparken, Partition anlegen, Zeilen dort einfügen.
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _stray_transactions ON COMMIT DROP AS
+        WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end RETURNING *)
+        SELECT * FROM moved
+    """), in_month)
+    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES {bounds}"))
+    moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM _stray_transactions")).rowcount
+    conn.execute(text("DROP TABLE _stray_transactions"))
+    print(f"Partition {name}: {moved} Zeilen aus {DEFAULT_PARTITION} übernommen.")
+    return True
+
+
+def ensure_partitions(conn: Connection, first_month: Optional[datetime] = None, months_ahead: Optional[int] = None) -> List[str]:
+    """Legt fehlende Monatspartitionen von first_month (Standard: laufender Monat) bis
+    months_ahead Monate in die Zukunft an; liefert die Namen der neuen Partitionen."""
+    if not is_partitioned(conn):
+        return []
+    # Mehrere Prozesse starten gleichzeitig (Vercel); nur einer legt an
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": PARENT})
+    if months_ahead is None:
+        months_ahead = settings.TRANSACTION_PARTITION_MONTHS_AHEAD
+    # Monatsgrenzen nach der Uhr der Datenbank, die auch date (server_default now()) setzt
+    current = month_start(conn.execute(text("SELECT now()::timestamp")).scalar())
+    month = month_start(first_month) if first_month else current
+    # Archivierte Monate nicht wieder anlegen
+    archived_before = _archived_before(conn)
+    if archived_before and month < archived_before:
+        month = archived_before
+    created = []
+    last = add_months(current, months_ahead)
+    while month <= last:
+        if create_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    return created
+
+
+def _archived_before(conn: Connection) -> Optional[datetime]:
+    """Erster Monat nach der jüngsten archivierten Partition (siehe archive.py)."""
+    if not conn.execute(text("SELECT to_regclass('transaction_archives')")).scalar():
+        return None
+    month = conn.execute(text("SELECT max(month) FROM transaction_archives")).scalar()
+    return add_months(month_start(month), 1) if month else None
+
+
+def maintain() -> List[str]:
+    """Geplanter Lauf (Cron): Partitionen für die kommenden Monate sicherstellen."""
+    with engine.begin() as conn:
+        # Nicht endlos auf Sperren laufender Requests warten; der nächste Lauf versucht es erneut
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        created = ensure_partitions(conn)
+    if created:
+        print(f"Neue Transaktions-Partitionen: {', '.join(created)}")
+    return created
@@ -0,0 +1,200 @@
+"""
+Aufrufe an entfernte Dienste (Supabase Auth und Storage).
+
+Jeder Aufruf läuft in einem begrenzten Thread-Pool mit Timeout, wird bei Fehlern mit
+exponentiellem Backoff und Jitter wiederholt und ist pro Dienst durch einen Circuit
+Breaker geschützt: Nach REMOTE_BREAKER_THRESHOLD Fehlern in Folge schlagen weitere
+Aufrufe sofort fehl, bis REMOTE_BREAKER_RESET_SECONDS vergangen sind. Ein langsamer
+Dienst hält so weder den Event-Loop noch alle Worker-Threads fest.
+
+call() ist für synchrone Endpunkte (die bereits im Threadpool laufen), acall() für
+async-Endpunkte.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Optional
+
+from . import metrics
+from .config import settings
+
+
+class RemoteUnavailable(Exception):
+    """Der Dienst ist (vorübergehend) nicht erreichbar oder der Circuit Breaker ist offen."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int, reset_seconds: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        # Im Zustand "half-open" wird ein Probeaufruf durchgelassen
+        if self.state == "open":
+            raise RemoteUnavailable(f"{self.name}: circuit open")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_breakers = {}
+_client = None
+
+
+def _executor_instance() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.REMOTE_MAX_WORKERS, thread_name_prefix="remote")
+        return _executor
+
+
+def breaker(service: str) -> CircuitBreaker:
+    with _executor_lock:
+        if service not in _breakers:
+            _breakers[service] = CircuitBreaker(service, settings.REMOTE_BREAKER_THRESHOLD, settings.REMOTE_BREAKER_RESET_SECONDS)
+        return _breakers[service]
+
+
+def queue_depth() -> int:
+    """Aufrufe, die auf einen freien Thread des Pools warten (für metrics.py)."""
+    with _executor_lock:
+        executor = _executor
+    return executor._work_queue.qsize() if executor is not None else 0
+
+
+def breaker_states() -> dict:
+    with _executor_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.state for b in breakers}
+
+
+def _before_call(service: str, circuit: CircuitBreaker):
+    try:
+        circuit.before_call()
+    except RemoteUnavailable:
+        metrics.observe_remote(service, None, "circuit_open")
+        raise
+
+
+def get_supabase_client():
+    """Gemeinsamer Supabase-Client (Service Role), erst beim ersten Gebrauch erzeugt."""
+    global _client
+    if _client is None:
+        from supabase import create_client
+        from supabase.lib.client_options import ClientOptions
+        _client = create_client(
+            settings.SUPABASE_URL,
+            settings.SUPABASE_SERVICE_ROLE_KEY,
+            options=ClientOptions(storage_client_timeout=int(settings.REMOTE_TIMEOUT_SECONDS)),
+        )
+    return _client
+
+
+def _is_client_error(error: Exception) -> bool:
+    """4xx-Antworten (außer 429) sind Fehler der Anfrage, nicht des Dienstes: nicht wiederholen."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status is None and error.args and isinstance(error.args[0], dict):
+        status = error.args[0].get("statusCode")  # storage3.StorageException
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= status < 500 and status != 429
+
+
+def _backoff(attempt: int) -> float:
+    # "Full Jitter": zufällig zwischen 0 und der exponentiell wachsenden Obergrenze
+    return random.uniform(0, settings.REMOTE_RETRY_BASE_SECONDS * (2 ** attempt))
+
+
+def call(service: str, fn, *args, retries: Optional[int] = None, timeout: Optional[float] = None, **kwargs):
+    """Führt fn(*args, **kwargs) mit Timeout, Wiederholungen und Circuit Breaker aus."""
+    retries = settings.REMOTE_RETRIES if retries is None else retries
+    timeout = settings.REMOTE_TIMEOUT_SECONDS if timeout is None else timeout
+    circuit = breaker(service)
+    for attempt in range(retries + 1):
+        _before_call(service, circuit)
+        start = time.perf_counter()
+        future = _executor_instance().submit(fn, *args, **kwargs)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Der Thread läuft weiter, bis der HTTP-Client selbst abbricht; wir warten nicht darauf
+            future.cancel()
+            metrics.observe_remote(service, time.perf_counter() - start, "timeout")
+            error = RemoteUnavailable(f"{service}: timeout after {timeout}s")
+        except Exception as e:
+            if _is_client_error(e):
+                metrics.observe_remote(service, time.perf_counter() - start, "client_error")
+                circuit.record_success()
+                raise
+            metrics.observe_remote(service, time.perf_counter() - start, "error")
+            error = e
+        else:
+            metrics.observe_remote(service, time.perf_counter() - start, "success")
+            circuit.record_success()
+            return result
+        circuit.record_failure()
+        print(f"Remote-Aufruf {service} fehlgeschlagen (Versuch {attempt + 1}/{retries + 1}): {error}")
+        if attempt == retries:
+            raise error
+        time.sleep(_backoff(attempt))
+
+
+async def acall(service: str, fn, *args, retries: Optional[int] = None, timeout: Optional[float] = None, **kwargs):
+    """Wie call(), aber ohne den Event-Loop oder einen Threadpool-Thread zu blockieren."""
+    retries = settings.REMOTE_RETRIES if retries is None else retries
+    timeout = settings.REMOTE_TIMEOUT_SECONDS if timeout is None else timeout
+    circuit = breaker(service)
+    loop = asyncio.get_running_loop()
+    for attempt in range(retries + 1):
+        _before_call(service, circuit)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(loop.run_in_executor(_executor_instance(), partial(fn, *args, **kwargs)), timeout)
+        except asyncio.TimeoutError:
+            metrics.observe_remote(service, time.perf_counter() - start, "timeout")
+            error = RemoteUnavailable(f"{service}: timeout after {timeout}s")
+        except Exception as e:
+            if _is_client_error(e):
+                metrics.observe_remote(service, time.perf_counter() - start, "client_error")
+                circuit.record_success()
+                raise
+            metrics.observe_remote(service, time.perf_counter() - start, "error")
+            error = e
+        else:
+            metrics.observe_remote(service, time.perf_counter() - start, "success")
+            circuit.record_success()
+            return result
+        circuit.record_failure()
+        print(f"Remote-Aufruf {service} fehlgeschlagen (Versuch {attempt + 1}/{retries + 1}): {error}")
+        if attempt == retries:
+            raise error
+        await asyncio.sleep(_backoff(attempt))
@@ -0,0 +1,129 @@
+"""
+Level-Anforderungen pro Mandant (Tabelle level_requirements) als In-Memory-Regelindex.
+
+Die Regeln werden beim Start (preload) bzw. beim ersten Zugriff pro Mandant aus der DB
+geladen und zu einem RuleIndex kompiliert; die Auswertung ist danach ein reiner
+Dictionary-Lookup ohne DB-Zugriff. Ändert ein Admin die Regeln, zählt crud
+tenants.rules_version hoch und verwirft den Eintrag im eigenen Prozess sofort. Andere
+Prozesse bemerken die neue Version spätestens nach RULES_CACHE_TTL_SECONDS.
+
+Mandanten ohne eigene Regeln nutzen DEFAULT_LEVEL_RULES (der bisherige Lehrplan).
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models, tenancy
+from .config import settings
+from .database import SessionLocal
+from .tenant_cache import TenantCache
+
+EXAM_REQUIREMENT_ID = 'exam'
+
+# level_id -> Anforderungen; consumed_on_level_up=False: Leistung bleibt beim Aufstieg erhalten
+# (Zusatzveranstaltungen für den Hundeführerschein). Level 1 (Welpen) hat keine Anforderungen.
+DEFAULT_LEVEL_RULES = {
+    2: [{"id": 'group_class', "name": 'Gruppenstunde', "required": 6}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
+    3: [{"id": 'group_class', "name": 'Gruppenstunde', "required": 6}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
+    4: [{"id": 'social_walk', "name": 'Social Walk', "required": 6}, {"id": 'tavern_training', "name": 'Wirtshaustraining', "required": 2}, {"id": 'exam', "name": 'Prüfung', "required": 1}],
+    5: [
+        {"id": 'lecture_bonding', "name": 'Vortrag Bindung & Beziehung', "required": 1, "consumed_on_level_up": False},
+        {"id": 'lecture_hunting', "name": 'Vortrag Jagdverhalten', "required": 1, "consumed_on_level_up": False},
+        {"id": 'ws_communication', "name": 'WS Kommunikation & Körpersprache', "required": 1, "consumed_on_level_up": False},
+        {"id": 'ws_stress', "name": 'WS Stress & Impulskontrolle', "required": 1, "consumed_on_level_up": False},
+        {"id": 'theory_license', "name": 'Theorieabend Hundeführerschein', "required": 1, "consumed_on_level_up": False},
+        {"id": 'first_aid', "name": 'Erste-Hilfe-Kurs', "required": 1, "consumed_on_level_up": False},
+        {"id": 'exam', "name": 'Prüfung', "required": 1},
+    ],
+}
+
+
+class Requirement(NamedTuple):
+    id: str
+    name: str
+    required: int
+    consumed_on_level_up: bool = True
+
+
+class Eligibility(NamedTuple):
+    level_id: int
+    progress: List[Tuple[Requirement, int]]  # (Anforderung, erreichte Anzahl)
+    exam_unlocked: bool
+    level_up_eligible: bool
+
+
+class RuleIndex:
+    """Kompilierte Regeln eines Mandanten; unveränderlich, daher ohne Lock lesbar."""
+
+    def __init__(self, levels: Dict[int, List[Requirement]]):
+        self.levels: Dict[int, Tuple[Requirement, ...]] = {level_id: tuple(reqs) for level_id, reqs in levels.items()}
+        self.exam_prereqs: Dict[int, Tuple[Requirement, ...]] = {
+            level_id: tuple(r for r in reqs if r.id != EXAM_REQUIREMENT_ID) for level_id, reqs in self.levels.items()
+        }
+        # Leistungen, die beim Aufstieg nicht verbraucht werden
+        self.kept_on_level_up = frozenset(r.id for reqs in self.levels.values() for r in reqs if not r.consumed_on_level_up)
+
+    @classmethod
+    def from_dicts(cls, levels: Dict[int, List[dict]]) -> "RuleIndex":
+        return cls({
+            level_id: [Requirement(r["id"], r["name"], r["required"], r.get("consumed_on_level_up", True)) for r in reqs]
+            for level_id, reqs in levels.items()
+        })
+
+    def requirements_for(self, level_id: int) -> Tuple[Requirement, ...]:
+        return self.levels.get(level_id, ())
+
+    def exam_unlocked(self, level_id: int, counts: Dict[str, int]) -> bool:
+        """Alle Anforderungen des Levels außer der Prüfung selbst sind erfüllt."""
+        return all(counts.get(r.id, 0) >= r.required for r in self.exam_prereqs.get(level_id, ()))
+
+    def evaluate(self, level_id: int, counts: Dict[str, int]) -> Eligibility:
+        progress = [(r, counts.get(r.id, 0)) for r in self.requirements_for(level_id)]
+        return Eligibility(
+            level_id=level_id,
+            progress=progress,
+            exam_unlocked=self.exam_unlocked(level_id, counts),
+            level_up_eligible=all(done >= r.required for r, done in progress),
+        )
+
+
+DEFAULT_INDEX = RuleIndex.from_dicts(DEFAULT_LEVEL_RULES)
+
+
+def _load(db: Session, tenant_id: int) -> RuleIndex:
+    rows = db.query(models.LevelRequirement).filter(
+        models.LevelRequirement.tenant_id == tenant_id
+    ).order_by(models.LevelRequirement.level_id, models.LevelRequirement.position).all()
+    if not rows:
+        return DEFAULT_INDEX
+    levels: Dict[int, List[Requirement]] = {}
+    for row in rows:
+        levels.setdefault(row.level_id, []).append(
+            Requirement(row.requirement_id, row.name, row.required, row.consumed_on_level_up)
+        )
+    return RuleIndex(levels)
+
+
+_cache = TenantCache(models.Tenant.rules_version, _load, lambda: settings.RULES_CACHE_TTL_SECONDS)
+
+
+def get_index(db: Session, tenant_id: int) -> RuleIndex:
+    """Regelindex des Mandanten; fragt die DB nur nach Ablauf der TTL (Version) bzw. bei Änderung."""
+    return _cache.get(db, tenant_id)
+
+
+def invalidate(tenant_id: Optional[int] = None):
+    _cache.invalidate(tenant_id)
+
+
+def preload():
+    """Kompiliert die Regeln aller Mandanten beim Start, damit der erste Request sie schon vorfindet."""
+    db = SessionLocal()
+    tenancy.all_tenants(db)
+    try:
+        for (tenant_id,) in db.query(models.Tenant.id).all():
+            get_index(db, tenant_id)
+    except Exception as e:
+        print(f"FEHLER beim Laden der Level-Regeln: {e}")
+    finally:
+        db.close()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime, date
 from uuid import UUID
 
@@ -92,6 +92,7 @@ class Transaction(TransactionBase):
     user_id: int
     date: datetime
     balance_after: float
+    bonus: float = 0.0
     booked_by_id: int
 
     class Config:
@@ -104,11 +105,19 @@ class Document(BaseModel):
     file_type: str
     upload_date: datetime
     file_path: str
+    file_size: Optional[int] = None
+    checksum: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class SignedDocumentUrl(BaseModel):
+    id: int
+    url: str
+    expires_at: datetime
+
+
 class User(UserBase):
     id: int
     tenant_id: int
@@ -144,4 +153,227 @@ class UserVipUpdate(BaseModel):
     is_vip: bool
 
 class UserExpertUpdate(BaseModel):
-    is_expert: bool
\ No newline at end of file
+    is_expert: bool
+
+# --- Antworten von Schreiboperationen mit Kundenstand ---
+class RequirementProgress(BaseModel):
+    id: str
+    name: str
+    required: int
+    completed: int
+
+
+# --- Bonus auf Aufladungen ---
+class BonusTier(BaseModel):
+    min_amount: float
+    bonus: float
+
+    class Config:
+        from_attributes = True
+
+
+class BonusScheduleCreate(BaseModel):
+    name: str
+    valid_from: Optional[datetime] = None  # leer = Grundplan
+    valid_until: Optional[datetime] = None
+    tiers: List[BonusTier] = []
+
+
+class BonusSchedule(BonusScheduleCreate):
+    id: Optional[int] = None  # None = eingebauter Standardplan
+
+    class Config:
+        from_attributes = True
+
+
+class BonusPreview(BaseModel):
+    amount: float
+    bonus: float
+    total: float
+    schedule_id: Optional[int] = None
+    schedule_name: Optional[str] = None
+
+
+class Eligibility(BaseModel):
+    level_id: int
+    requirements: List[RequirementProgress] = []
+    exam_unlocked: bool
+    level_up_eligible: bool
+
+
+class LevelRequirement(BaseModel):
+    id: str
+    name: str
+    required: int = 1
+    # False: Leistung bleibt beim Aufstieg erhalten (z.B. Zusatzveranstaltungen Hundeführerschein)
+    consumed_on_level_up: bool = True
+
+
+class LevelRules(BaseModel):
+    level_id: int
+    requirements: List[LevelRequirement] = []
+
+
+class CustomerAggregate(BaseModel):
+    user_id: int
+    balance: float
+    level_id: int
+    is_vip: bool
+    is_expert: bool
+    new_achievements: List[Achievement] = []
+    requirements: List[RequirementProgress] = []
+    exam_unlocked: bool
+    level_up_eligible: bool
+
+
+class TransactionResult(Transaction):
+    aggregate: Optional[CustomerAggregate] = None
+
+
+class UserResult(User):
+    aggregate: Optional[CustomerAggregate] = None
+
+
+# --- Dashboard ---
+class DashboardCustomer(BaseModel):
+    id: int
+    name: str
+    balance: float
+    dog_name: Optional[str] = None
+
+
+class DashboardTransaction(BaseModel):
+    id: int
+    user_id: int
+    customer_name: Optional[str] = None
+    date: datetime
+    type: str
+    description: Optional[str] = None
+    amount: float
+
+
+class Dashboard(BaseModel):
+    customer_count: int
+    total_credit: float
+    transactions_today: int
+    transactions_month: int
+    active_customers_month: int
+    active_customers: List[DashboardCustomer] = []
+    recent_transactions: List[DashboardTransaction] = []
+
+
+# --- Delta-Sync ---
+class SyncMeta(BaseModel):
+    updated_at: datetime
+    version: int
+
+
+class SyncUser(UserBase, SyncMeta):
+    id: int
+    tenant_id: int
+    auth_id: Optional[UUID] = None
+    customer_since: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncDog(Dog, SyncMeta):
+    pass
+
+
+class SyncTransaction(Transaction, SyncMeta):
+    pass
+
+
+class SyncAchievement(Achievement, SyncMeta):
+    user_id: int
+    transaction_id: Optional[int] = None
+
+
+class SyncDocument(Document, SyncMeta):
+    user_id: int
+
+
+class SyncDeletion(BaseModel):
+    table_name: str
+    row_id: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncResponse(BaseModel):
+    cursor: str
+    full: bool
+    users: List[SyncUser] = []
+    dogs: List[SyncDog] = []
+    transactions: List[SyncTransaction] = []
+    achievements: List[SyncAchievement] = []
+    documents: List[SyncDocument] = []
+    deleted: List[SyncDeletion] = []
+
+
+# --- Auth-Synchronisation (Outbox) ---
+class AuthOutboxEntry(BaseModel):
+    id: int
+    operation: str
+    email: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    next_attempt_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AuthSyncStatus(BaseModel):
+    pending: int
+    done: int
+    failed: int
+    oldest_pending_at: Optional[datetime] = None
+    recent_failures: List[AuthOutboxEntry] = []
+
+
+# --- Bild-Uploads ---
+class ImageRendition(BaseModel):
+    url: str
+    width: int
+    height: int
+
+
+class ImageUpload(BaseModel):
+    url: str  # Standard-Variante für <img src>
+    srcset: str  # für <img srcset>, z.B. "…_320w.webp 320w, …_640w.webp 640w"
+    width: int  # Maße der größten Variante
+    height: int
+    renditions: List[ImageRendition]
+
+
+# --- Batch (Offline-Warteschlange) ---
+class BatchOperation(BaseModel):
+    id: Optional[str] = None  # vom Client vergebene Kennung, z.B. der IndexedDB-Schlüssel
+    method: str
+    path: str
+    body: Optional[dict] = None
+    # Stabil über Wiederholungen desselben Batches (Antwort verloren): wie der Idempotency-Key-Header
+    idempotency_key: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    # atomic=True: ein Fehler verwirft den gesamten Batch, sonst nur die fehlerhafte Operation
+    atomic: bool = False
+
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchResult]
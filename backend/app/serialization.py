@@ -0,0 +1,118 @@
+"""
+Schneller Serialisierungspfad für die großen Listen-Antworten.
+
+FastAPI validiert den Rückgabewert gegen das response_model und kodiert ihn danach
+noch einmal mit dem Standard-JSON-Encoder. ORM-Objekte aus unserer eigenen DB sind
+aber bereits vertrauenswürdig: OrmSerializer liest die Felder des Schemas nach einem
+einmal kompilierten Plan direkt aus den ORM-Objekten und schreibt sie mit orjson.
+Ohne orjson wird auf einen vorab gebauten TypeAdapter (pydantic-core) zurückgefallen.
+"""
+from typing import Any, List, Optional, Type, Union, get_args, get_origin
+from uuid import UUID
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from . import schemas
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:  # orjson ist optional, dann bleibt es beim Standard-Encoder
+    orjson = None
+    DefaultResponse = JSONResponse
+
+
+def _unwrap_optional(annotation):
+    if get_origin(annotation) is Union:
+        inner = [a for a in get_args(annotation) if a is not type(None)]
+        if len(inner) == 1:
+            return inner[0]
+    return annotation
+
+
+def _nested_model(annotation):
+    """Liefert (Schema, is_list), falls das Feld ein verschachteltes Schema ist."""
+    annotation = _unwrap_optional(annotation)
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin in (list, List) and args:
+        model, _ = _nested_model(args[0])
+        return model, True
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+def _to_float(value):
+    # Float-Spalten können ints enthalten (z.B. balance=0 vor dem Refresh); Pydantic schreibt 0.0
+    return value if type(value) is float else float(value)
+
+
+def _to_uuid(value):
+    # auth_id ist in der DB ein String; Pydantic normalisiert ihn (klein, mit Bindestrichen)
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+# Skalare Typen, deren JSON-Form sich bei Pydantic vom Rohwert aus der DB unterscheiden kann
+_CONVERTERS = {float: _to_float, UUID: _to_uuid}
+
+
+def _compile_plan(model: Type[BaseModel]):
+    plan = []
+    for name, field in model.model_fields.items():
+        nested, many = _nested_model(field.annotation)
+        default = field.get_default(call_default_factory=True)
+        convert = _CONVERTERS.get(_unwrap_optional(field.annotation))
+        plan.append((name, default, _compile_plan(nested) if nested else None, many, convert))
+    return plan
+
+
+def _dump_row(obj, plan) -> dict:
+    # Geladene Spalten liegen im __dict__; nur fehlende (z.B. noch nicht geladene
+    # Beziehungen) gehen über den Deskriptor und damit ggf. über Lazy Loading.
+    values = obj.__dict__
+    row = {}
+    for name, default, nested, many, convert in plan:
+        value = values[name] if name in values else getattr(obj, name, default)
+        if value is not None:
+            if nested is not None:
+                value = [_dump_row(item, nested) for item in value] if many else _dump_row(value, nested)
+            elif convert is not None:
+                value = convert(value)
+        row[name] = value
+    return row
+
+
+class OrmSerializer:
+    """Serialisiert ORM-Objekte (oder Listen davon) gemäß einem Pydantic-Schema zu JSON-Bytes."""
+
+    def __init__(self, schema: Type[BaseModel], many: bool = False):
+        self.many = many
+        self.plan = _compile_plan(schema)
+        # Einmal pro Prozess gebaut, statt bei jeder Anfrage ein Schema zu kompilieren
+        self.adapter = TypeAdapter(List[schema] if many else schema)
+
+    def dump_json(self, data: Any) -> bytes:
+        if orjson is None:
+            return self.adapter.dump_json(self.adapter.validate_python(data, from_attributes=True))
+        if self.many:
+            return orjson.dumps([_dump_row(obj, self.plan) for obj in data])
+        return orjson.dumps(_dump_row(data, self.plan))
+
+
+USER_SERIALIZER = OrmSerializer(schemas.User)
+USER_LIST_SERIALIZER = OrmSerializer(schemas.User, many=True)
+TRANSACTION_LIST_SERIALIZER = OrmSerializer(schemas.Transaction, many=True)
+
+
+def orm_response(serializer: OrmSerializer, data: Any, response: Optional[Response] = None) -> Response:
+    """
+    Baut die JSON-Antwort ohne die zweite Validierung durch FastAPI. Header, die der
+    Endpunkt auf dem injizierten Response-Objekt gesetzt hat (z.B. ETag), werden übernommen.
+    """
+    result = Response(content=serializer.dump_json(data), media_type="application/json")
+    if response is not None:
+        result.headers.update(response.headers)
+    return result
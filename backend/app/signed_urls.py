@@ -0,0 +1,69 @@
+"""
+Cache für signierte Download-URLs von Dokumenten.
+
+Jede signierte URL ist ein Remote-Aufruf beim Storage. Solange eine bereits erzeugte URL
+noch lange genug gültig ist, wird sie wiederverwendet; fehlende oder bald ablaufende
+URLs werden gesammelt in einem einzigen Aufruf neu signiert. Der Cache lebt im Prozess
+und ist nach Anzahl der Einträge begrenzt (LRU).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# sign_many(paths, expires_in) -> {path: url}
+Signer = Callable[[List[str], int], Dict[str, str]]
+
+
+class SignedUrlCache:
+    def __init__(self, ttl_seconds: int, min_remaining_seconds: int, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.min_remaining_seconds = min_remaining_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, now: float) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] - now < self.min_remaining_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_many(self, namespace: str, paths: Iterable[str], sign_many: Signer) -> Dict[str, Tuple[str, float]]:
+        """
+        Liefert {path: (url, expires_at)} für alle Pfade, die signiert werden konnten.
+        expires_at ist ein Unix-Zeitstempel.
+        """
+        now = time.time()
+        result = {}
+        missing = []
+        with self._lock:
+            for path in dict.fromkeys(paths):
+                entry = self._lookup((namespace, path), now)
+                if entry is None:
+                    missing.append(path)
+                else:
+                    result[path] = entry
+
+        if missing:
+            expires_at = now + self.ttl_seconds
+            signed = sign_many(missing, self.ttl_seconds)
+            with self._lock:
+                for path, url in signed.items():
+                    self._entries[(namespace, path)] = (url, expires_at)
+                    self._entries.move_to_end((namespace, path))
+                    result[path] = (url, expires_at)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def get(self, namespace: str, path: str, sign_many: Signer) -> Optional[Tuple[str, float]]:
+        return self.get_many(namespace, [path], sign_many).get(path)
+
+    def invalidate(self, namespace: str, path: str):
+        with self._lock:
+            self._entries.pop((namespace, path), None)
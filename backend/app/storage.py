@@ -0,0 +1,218 @@
+"""
+Austauschbares Datei-Storage für Dokumente und Bilder.
+
+Die Methoden blockieren; Aufrufer gehen über remote.call()/remote.acall() (Timeout,
+Wiederholungen, Circuit Breaker).
+
+STORAGE_BACKEND wählt die Implementierung:
+- "supabase": Supabase Storage (Standard, wie bisher)
+- "local": Dateisystem unter LOCAL_STORAGE_DIR, ausgeliefert über /api/storage/... mit
+  HMAC-signierten URLs. Ohne Netzwerk nutzbar (Tests, Benchmarks, Self-Hosting).
+
+Buckets entsprechen bei "local" Unterordnern, Pfade im Bucket bleiben gleich
+(z.B. documents/<tenant>/<user>/<datei>).
+"""
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Union
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from .config import settings
+
+# Buckets, deren Dateien ohne Signatur abrufbar sind
+PUBLIC_BUCKETS = ("public_uploads",)
+
+
+class StorageBackend:
+    """Gemeinsame Schnittstelle; `file` ist entweder ein Pfad zu einer lokalen Datei oder Bytes."""
+
+    def upload(self, bucket: str, path: str, file: Union[str, bytes], content_type: str, cache_control: Optional[str] = None):
+        raise NotImplementedError
+
+    def stream(self, bucket: str, path: str) -> Response:
+        raise NotImplementedError
+
+    def delete(self, bucket: str, paths: List[str]):
+        raise NotImplementedError
+
+    def sign_many(self, bucket: str, paths: List[str], expires_in: int) -> Dict[str, str]:
+        """Signiert mehrere Pfade auf einmal; nicht vorhandene Dateien fehlen im Ergebnis."""
+        raise NotImplementedError
+
+    def public_url(self, bucket: str, path: str) -> str:
+        raise NotImplementedError
+
+
+class SupabaseStorage(StorageBackend):
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .remote import get_supabase_client
+            self._client = get_supabase_client()
+        return self._client
+
+    def upload(self, bucket, path, file, content_type, cache_control=None):
+        file_options = {"content-type": content_type, "upsert": "true"}
+        if cache_control:
+            file_options["cache-control"] = cache_control
+        # Bei einem Dateipfad liest der Client die Datei blockweise
+        self.client.storage.from_(bucket).upload(path=path, file=file, file_options=file_options)
+
+    def stream(self, bucket, path):
+        # Supabase liefert die Datei selbst aus; wir leiten nur auf eine kurzlebige URL um
+        if bucket in PUBLIC_BUCKETS:
+            return RedirectResponse(self.public_url(bucket, path))
+        signed = self.sign_many(bucket, [path], 60)
+        if path not in signed:
+            raise HTTPException(status_code=404, detail="File not found in storage")
+        return RedirectResponse(signed[path])
+
+    def delete(self, bucket, paths):
+        self.client.storage.from_(bucket).remove(paths)
+
+    def sign_many(self, bucket, paths, expires_in):
+        signed = self.client.storage.from_(bucket).create_signed_urls(paths, expires_in)
+        return {item["path"]: item["signedURL"] for item in signed if not item.get("error")}
+
+    def public_url(self, bucket, path):
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{bucket}/{path}"
+
+
+class SendfileResponse(FileResponse):
+    """
+    FileResponse, die die Datei ohne Kopie über den Userspace ausliefert, wenn der
+    ASGI-Server das anbietet (Erweiterungen "http.response.pathsend" bzw.
+    "http.response.zerocopysend", z.B. Granian). Mit LOCAL_STORAGE_ACCEL_REDIRECT übernimmt
+    ein vorgeschalteter nginx das sendfile per X-Accel-Redirect. Sonst wie FileResponse.
+    """
+
+    def __init__(self, path: str, accel_path: Optional[str] = None, **kwargs):
+        # stat vorab, damit Content-Length/ETag auch ohne FileResponse.__call__ gesetzt sind
+        kwargs.setdefault("stat_result", os.stat(path))
+        super().__init__(path, **kwargs)
+        self.accel_path = accel_path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions") or {}
+        if self.accel_path is not None:
+            headers = [(k, v) for k, v in self.raw_headers if k != b"content-length"]
+            headers.append((b"x-accel-redirect", self.accel_path.encode("latin-1")))
+            await send({"type": "http.response.start", "status": self.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.pathsend" in extensions and scope.get("method") != "HEAD":
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        elif "http.response.zerocopysend" in extensions and scope.get("method") != "HEAD":
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file.fileno()})
+        else:
+            await super().__call__(scope, receive, send)
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str, signing_key: bytes, base_url: str = "", accel_prefix: str = ""):
+        self.root = os.path.abspath(root)
+        self.signing_key = signing_key
+        self.base_url = base_url.rstrip("/")
+        self.accel_prefix = accel_prefix.rstrip("/")
+
+    def _resolve(self, bucket: str, path: str) -> str:
+        # Dateinamen stammen vom Client: kein Verlassen des Bucket-Ordners zulassen
+        bucket_root = os.path.join(self.root, bucket)
+        full_path = os.path.abspath(os.path.join(bucket_root, path))
+        if os.path.commonpath([bucket_root, full_path]) != bucket_root or full_path == bucket_root:
+            raise HTTPException(status_code=400, detail="Invalid file path")
+        return full_path
+
+    def _signature(self, bucket: str, path: str, expires: int) -> str:
+        message = f"{bucket}/{path}\n{expires}".encode()
+        return hmac.new(self.signing_key, message, hashlib.sha256).hexdigest()
+
+    def _url(self, bucket: str, path: str) -> str:
+        return f"{self.base_url}/api/storage/{bucket}/{quote(path)}"
+
+    def upload(self, bucket, path, file, content_type, cache_control=None):
+        target = self._resolve(bucket, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Erst daneben schreiben, dann atomar ersetzen: Leser sehen nie eine halbe Datei
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".upload_")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if isinstance(file, bytes):
+                    out.write(file)
+                else:
+                    with open(file, "rb") as source:
+                        shutil.copyfileobj(source, out, 1024 * 1024)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def stream(self, bucket, path):
+        full_path = self._resolve(bucket, path)
+        if not os.path.isfile(full_path):
+            raise HTTPException(status_code=404, detail="File not found in storage")
+        accel_path = f"{self.accel_prefix}/{bucket}/{quote(path)}" if self.accel_prefix else None
+        cache_control = "public, max-age=31536000" if bucket in PUBLIC_BUCKETS else "private, max-age=60"
+        return SendfileResponse(full_path, accel_path=accel_path, headers={"Cache-Control": cache_control})
+
+    def delete(self, bucket, paths):
+        for path in paths:
+            try:
+                os.remove(self._resolve(bucket, path))
+            except FileNotFoundError:
+                pass
+
+    def sign_many(self, bucket, paths, expires_in):
+        expires = int(time.time()) + expires_in
+        signed = {}
+        for path in paths:
+            if os.path.isfile(self._resolve(bucket, path)):
+                signed[path] = f"{self._url(bucket, path)}?expires={expires}&signature={self._signature(bucket, path, expires)}"
+        return signed
+
+    def verify(self, bucket: str, path: str, expires: Optional[int], signature: Optional[str]) -> bool:
+        if bucket in PUBLIC_BUCKETS:
+            return True
+        if expires is None or signature is None or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(bucket, path, expires), signature)
+
+    def public_url(self, bucket, path):
+        return self._url(bucket, path)
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Liefert das konfigurierte Storage (wird beim ersten Zugriff erzeugt)."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "local":
+            # Eigener Schlüssel pro Zweck, abgeleitet aus dem JWT-Secret
+            signing_key = hmac.new(settings.SECRET_KEY.encode(), b"local-storage-urls", hashlib.sha256).digest()
+            _storage = LocalStorage(
+                settings.LOCAL_STORAGE_DIR,
+                signing_key,
+                base_url=settings.STORAGE_PUBLIC_BASE_URL,
+                accel_prefix=settings.LOCAL_STORAGE_ACCEL_REDIRECT,
+            )
+        elif settings.STORAGE_BACKEND == "supabase":
+            _storage = SupabaseStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _storage
@@ -0,0 +1,135 @@
+"""
+Mandantentrennung für alle Tabellen mit tenant_id (models.TenantMixin).
+
+Sobald für eine Session mit set_tenant() ein Mandant gesetzt ist (auth.get_current_active_user
+bzw. anonyme Endpunkte über den Host), werden alle ORM-Abfragen, UPDATEs und DELETEs
+automatisch auf diesen Mandanten eingeschränkt – auch Lazy-Loads von Beziehungen. Neue
+Objekte ohne tenant_id erhalten ihn beim Flush; ein Objekt eines fremden Mandanten in
+derselben Session ist ein Fehler.
+
+Ohne Mandant schlagen Abfragen auf diese Tabellen fehl (MissingTenant), statt ungefiltert
+alle Mandanten zu sehen. Hintergrund-Worker, Migrationen und Skripte erklären ihre Session
+mit all_tenants() ausdrücklich für mandantenübergreifend; einzelne Abfragen können die
+Einschränkung mit .execution_options(all_tenants=True) umgehen (z.B. die Suche nach der
+E-Mail beim Login, die mandantenübergreifend eindeutig ist).
+
+Der Mandant ergibt sich aus dem Token (Claim "tenant_id" bzw. app_metadata.tenant_id bei
+Supabase, sonst tenant_id des Users) oder, ohne Anmeldung, aus dem Host der Anfrage
+(tenants.domain). Ohne Treffer gilt DEFAULT_TENANT_ID.
+"""
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from . import models
+from .config import settings
+
+_TENANT_KEY = "tenant_id"
+ALL_TENANTS = "all_tenants"
+
+# Host -> (tenant_id, gültig bis (monotonic)); Domains ändern sich selten
+HOST_CACHE_SECONDS = 60.0
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+class MissingTenant(RuntimeError):
+    """Abfrage auf mandantenbezogene Tabellen in einer Session ohne Mandant."""
+
+
+def set_tenant(db: Session, tenant_id: int):
+    db.info[_TENANT_KEY] = tenant_id
+
+
+def all_tenants(db: Session):
+    """Für Worker, Migrationen und Skripte: die Session sieht bewusst alle Mandanten."""
+    db.info[ALL_TENANTS] = True
+
+
+def get_tenant(db: Session) -> Optional[int]:
+    return db.info.get(_TENANT_KEY)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _restrict_to_tenant(state):
+    tenant_id = state.session.info.get(_TENANT_KEY)
+    if state.execution_options.get(ALL_TENANTS):
+        return
+    # Lazy-Loads und nachgeladene Spalten erben das Kriterium vom ursprünglichen Statement
+    if state.is_column_load or state.is_relationship_load:
+        return
+    if not (state.is_select or state.is_update or state.is_delete):
+        return
+    if tenant_id is None:
+        if state.session.info.get(ALL_TENANTS) or not any(
+            issubclass(mapper.class_, models.TenantMixin) for mapper in state.all_mappers
+        ):
+            return
+        raise MissingTenant("Abfrage auf mandantenbezogene Daten ohne Mandant (set_tenant bzw. all_tenants fehlt)")
+    state.statement = state.statement.options(
+        with_loader_criteria(models.TenantMixin, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_tenant(session, flush_context, instances):
+    tenant_id = session.info.get(_TENANT_KEY)
+    if tenant_id is None:
+        return
+    for obj in session.new:
+        if not isinstance(obj, models.TenantMixin):
+            continue
+        if obj.tenant_id is None:
+            obj.tenant_id = tenant_id
+        elif obj.tenant_id != tenant_id:
+            raise ValueError(f"{type(obj).__name__} gehört zu Mandant {obj.tenant_id}, Session zu Mandant {tenant_id}")
+
+
+def token_tenant_id(payload: dict) -> Optional[int]:
+    """Mandant aus den JWT-Claims: eigener Claim oder app_metadata (Supabase)."""
+    claim = payload.get("tenant_id")
+    if claim is None:
+        claim = (payload.get("app_metadata") or {}).get("tenant_id")
+    try:
+        return int(claim) if claim is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_hosts(request: Request):
+    # Hinter Vercel/Proxy steht der ursprüngliche Host in X-Forwarded-Host; Aufrufe aus dem
+    # Frontend einer Hundeschule erkennt man am Origin, da die API eine eigene Domain hat.
+    for value in (request.headers.get("x-forwarded-host"), request.headers.get("host")):
+        if value:
+            yield value.split(",")[0].strip().split(":")[0].lower()
+    origin = request.headers.get("origin")
+    if origin:
+        hostname = urlsplit(origin).hostname
+        if hostname:
+            yield hostname.lower()
+
+
+def _tenant_id_for_host(db: Session, host: str) -> Optional[int]:
+    now = time.monotonic()
+    with _hosts_lock:
+        cached = _hosts.get(host)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    tenant_id = db.query(models.Tenant.id).filter(models.Tenant.domain == host).scalar()
+    with _hosts_lock:
+        _hosts[host] = (tenant_id, now + HOST_CACHE_SECONDS)
+    return tenant_id
+
+
+def resolve_request_tenant_id(request: Request, db: Session) -> int:
+    """Mandant einer anonymen Anfrage anhand des Hosts (Registrierung, öffentliche Endpunkte)."""
+    for host in _request_hosts(request):
+        tenant_id = _tenant_id_for_host(db, host)
+        if tenant_id is not None:
+            return tenant_id
+    return settings.DEFAULT_TENANT_ID
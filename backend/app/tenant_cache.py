@@ -0,0 +1,50 @@
+"""
+Prozesslokaler Cache für kompilierte Konfiguration pro Mandant (Level-Regeln, Bonusstufen).
+
+Jeder Eintrag merkt sich die Versionsnummer aus der tenants-Tabelle, aus der er gebaut
+wurde. Innerhalb von ttl_seconds wird er ohne DB-Zugriff ausgeliefert; danach kostet die
+Prüfung eine Primärschlüssel-Abfrage, neu gebaut wird nur bei geänderter Version.
+Schreibende crud-Funktionen zählen die Version hoch und rufen nach dem Commit
+invalidate() auf, damit der eigene Prozess die Änderung sofort sieht.
+"""
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+T = TypeVar("T")
+
+
+class TenantCache(Generic[T]):
+    def __init__(self, version_column, build: Callable[[Session, int], T], ttl_seconds: Callable[[], float]):
+        self.version_column = version_column
+        self.build = build
+        # Als Funktion, damit Änderungen an settings (z.B. in Tests) sofort greifen
+        self.ttl_seconds = ttl_seconds
+        # tenant_id -> (Version, zuletzt geprüft (monotonic), Wert)
+        self._entries: Dict[int, Tuple[int, float, T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, tenant_id: int) -> T:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+        if entry is not None and now - entry[1] < self.ttl_seconds():
+            return entry[2]
+
+        version = db.query(self.version_column).filter(models.Tenant.id == tenant_id).scalar() or 0
+        value = entry[2] if entry is not None and entry[0] == version else self.build(db, tenant_id)
+        with self._lock:
+            self._entries[tenant_id] = (version, now, value)
+        return value
+
+    def invalidate(self, tenant_id: Optional[int] = None):
+        with self._lock:
+            if tenant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tenant_id, None)
+
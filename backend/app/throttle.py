@@ -0,0 +1,292 @@
+"""
+Drosselung von Login und Registrierung, bevor bcrypt rechnet.
+
+Jede Anfrage verbraucht ein Token aus zwei Token-Buckets: einem pro IP und einem pro Konto
+(E-Mail). Fehlgeschlagene Logins zählen zusätzlich; ab backoff_after Fehlversuchen innerhalb
+von LOGIN_FAILURE_WINDOW_SECONDS ist der Schlüssel für LOGIN_BACKOFF_BASE_SECONDS gesperrt,
+mit jedem weiteren Fehlversuch doppelt so lange (höchstens LOGIN_BACKOFF_MAX_SECONDS).
+
+Die Prüfung läuft zuerst gegen den Zustand im Prozess: Abgewiesene Anfragen kosten nur einen
+Dictionary-Lookup, keinen DB-Zugriff und kein bcrypt. Mit LOGIN_THROTTLE_SHARED werden
+Buckets und Fehlversuche zusätzlich in login_throttle gezählt (atomare Upserts), damit alle
+Worker dieselben Zähler sehen; das Ergebnis wird in den Prozess-Zustand übernommen. Ist die
+DB nicht erreichbar, zählt nur der Prozess.
+"""
+import hashlib
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+# Veraltete Zeilen in login_throttle höchstens so oft pro Prozess aufräumen
+PURGE_INTERVAL_SECONDS = 600.0
+
+
+class Limit(NamedTuple):
+    burst: int
+    per_second: float
+    backoff_after: int
+
+
+def _limits() -> Dict[str, Limit]:
+    # Als Funktion, damit Änderungen an settings (z.B. in Tests) sofort greifen
+    return {
+        "ip": Limit(settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_SECOND, settings.LOGIN_IP_BACKOFF_AFTER),
+        "account": Limit(settings.LOGIN_ACCOUNT_BURST, settings.LOGIN_ACCOUNT_PER_SECOND, settings.LOGIN_ACCOUNT_BACKOFF_AFTER),
+    }
+
+
+class _Entry:
+    __slots__ = ("tokens", "refilled", "failures", "last_failure", "blocked_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.refilled = now
+        self.failures = 0
+        self.last_failure = 0.0
+        self.blocked_until = 0.0
+
+
+# Schlüssel -> Zustand; die am längsten unbenutzten fallen ab LOGIN_THROTTLE_MAX_KEYS heraus
+_entries: "OrderedDict[str, _Entry]" = OrderedDict()
+_lock = threading.Lock()
+_last_purge = 0.0
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(value: str):
+    if value.strip() == "*":
+        return None  # jeder Absender
+    networks = []
+    for part in value.split(","):
+        if part.strip():
+            networks.append(ipaddress.ip_network(part.strip(), strict=False))
+    return tuple(networks)
+
+
+def _is_trusted(address: str, networks) -> bool:
+    if networks is None:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(request: Request) -> str:
+    """
+    Adresse des Clients. X-Forwarded-For kann jeder Client selbst setzen; ausgewertet wird er
+    nur, wenn die Verbindung von einem Proxy aus TRUSTED_PROXIES kommt. Dann zählt der letzte
+    Eintrag, der nicht selbst ein vertrauenswürdiger Proxy ist (weiter links steht, was der
+    Client mitgeschickt hat).
+    """
+    peer = request.client.host if request.client else "unknown"
+    networks = _trusted_networks(settings.TRUSTED_PROXIES)
+    if networks == () or not _is_trusted(peer, networks):
+        return peer
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, networks):
+            return hop
+    return hops[0] if hops else peer
+
+
+def keys_for(request: Request, email: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(Art, Schlüssel) für IP und, falls angegeben, Konto; E-Mails nur als Hash."""
+    keys = [("ip", f"ip:{client_ip(request)}")]
+    if email:
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+        keys.append(("account", f"account:{digest}"))
+    return keys
+
+
+def _entry(key: str, limit: Limit, now: float) -> _Entry:
+    # Aufrufer hält _lock
+    entry = _entries.get(key)
+    if entry is None:
+        entry = _entries[key] = _Entry(float(limit.burst), now)
+        while len(_entries) > settings.LOGIN_THROTTLE_MAX_KEYS:
+            _entries.popitem(last=False)
+    else:
+        _entries.move_to_end(key)
+        entry.tokens = min(float(limit.burst), entry.tokens + (now - entry.refilled) * limit.per_second)
+        entry.refilled = now
+    return entry
+
+
+def _wait(entry: _Entry, limit: Limit, now: float) -> float:
+    if entry.blocked_until > now:
+        return entry.blocked_until - now
+    if entry.tokens < 1:
+        return (1 - entry.tokens) / limit.per_second
+    return 0.0
+
+
+def _backoff_seconds(failures: int, limit: Limit) -> float:
+    if failures < limit.backoff_after:
+        return 0.0
+    exponent = min(failures - limit.backoff_after, 30)
+    return min(settings.LOGIN_BACKOFF_MAX_SECONDS, settings.LOGIN_BACKOFF_BASE_SECONDS * 2 ** exponent)
+
+
+def retry_after(keys: List[Tuple[str, str]]) -> float:
+    """Sekunden bis zum nächsten erlaubten Versuch nach dem Prozess-Zustand (0 = erlaubt)."""
+    limits = _limits()
+    now = time.monotonic()
+    with _lock:
+        return max(_wait(_entry(key, limits[kind], now), limits[kind], now) for kind, key in keys)
+
+
+def acquire(db: Session, keys: List[Tuple[str, str]]) -> float:
+    """Verbraucht ein Token je Schlüssel; liefert 0 oder die Wartezeit in Sekunden."""
+    wait = retry_after(keys)
+    if wait > 0:
+        return wait
+    limits = _limits()
+    shared = _shared(db, "acquire", keys, limits) if settings.LOGIN_THROTTLE_SHARED else None
+    now = time.monotonic()
+    with _lock:
+        for kind, key in keys:
+            entry = _entry(key, limits[kind], now)
+            if shared is not None:
+                _apply(entry, *shared[key], now)
+            else:
+                entry.tokens -= 1
+            if entry.tokens < 0 or entry.blocked_until > now:
+                wait = max(wait, _wait(entry, limits[kind], now))
+    return wait
+
+
+def record_failure(db: Session, keys: List[Tuple[str, str]]):
+    limits = _limits()
+    shared = _shared(db, "failure", keys, limits) if settings.LOGIN_THROTTLE_SHARED else None
+    now = time.monotonic()
+    with _lock:
+        for kind, key in keys:
+            entry = _entry(key, limits[kind], now)
+            if shared is not None:
+                _apply(entry, *shared[key], now)
+                continue
+            if now - entry.last_failure > settings.LOGIN_FAILURE_WINDOW_SECONDS:
+                entry.failures = 0
+            entry.failures += 1
+            entry.last_failure = now
+            backoff = _backoff_seconds(entry.failures, limits[kind])
+            if backoff:
+                entry.blocked_until = now + backoff
+
+
+def record_success(db: Session, keys: List[Tuple[str, str]]):
+    """Erfolgreicher Login setzt die Fehlversuche des Kontos zurück (nicht die der IP)."""
+    accounts = [(kind, key) for kind, key in keys if kind == "account"]
+    if settings.LOGIN_THROTTLE_SHARED and accounts:
+        _shared(db, "success", accounts, _limits())
+    with _lock:
+        for _, key in accounts:
+            entry = _entries.get(key)
+            if entry is not None:
+                entry.failures = 0
+                entry.blocked_until = 0.0
+
+
+def check(db: Session, keys: List[Tuple[str, str]]):
+    """Wirft 429 mit Retry-After, wenn einer der Schlüssel gedrosselt ist."""
+    wait = acquire(db, keys)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(max(1, int(wait + 0.999)))},
+        )
+
+
+# --- Gemeinsame Zähler in der DB ---
+_ACQUIRE_SQL = text("""
+    INSERT INTO login_throttle AS t (key, tokens, refilled_at, failures)
+    VALUES (:key, :burst - 1, now(), 0)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = greatest(least(:burst, t.tokens + extract(epoch FROM now() - t.refilled_at) * :rate) - 1, -1),
+        refilled_at = now()
+    RETURNING tokens, failures, extract(epoch FROM t.blocked_until - now())
+""")
+
+_FAILURE_SQL = text("""
+    INSERT INTO login_throttle AS t (key, tokens, refilled_at, failures, last_failure_at)
+    VALUES (:key, :burst, now(), 1, now())
+    ON CONFLICT (key) DO UPDATE SET
+        failures = CASE WHEN t.last_failure_at > now() - make_interval(secs => :window) THEN t.failures + 1 ELSE 1 END,
+        last_failure_at = now()
+    RETURNING failures, extract(epoch FROM t.blocked_until - now())
+""")
+
+_BLOCK_SQL = text("""
+    UPDATE login_throttle SET blocked_until = now() + make_interval(secs => :seconds)
+    WHERE key = :key
+""")
+
+_SUCCESS_SQL = text("UPDATE login_throttle SET failures = 0, blocked_until = NULL WHERE key = :key")
+
+_PURGE_SQL = text("""
+    DELETE FROM login_throttle
+    WHERE refilled_at < now() - make_interval(secs => :window)
+      AND (blocked_until IS NULL OR blocked_until < now())
+""")
+
+
+def _shared(db: Session, operation: str, keys: List[Tuple[str, str]], limits: Dict[str, Limit]) -> Optional[Dict[str, tuple]]:
+    """Zählt in login_throttle; liefert {Schlüssel: (tokens, failures, gesperrt noch s)} oder
+    None, wenn die DB nicht erreichbar ist (dann zählt nur der Prozess)."""
+    global _last_purge
+    results = {}
+    try:
+        for kind, key in keys:
+            limit = limits[kind]
+            if operation == "acquire":
+                results[key] = tuple(db.execute(_ACQUIRE_SQL, {"key": key, "burst": limit.burst, "rate": limit.per_second}).one())
+            elif operation == "failure":
+                failures, remaining = db.execute(
+                    _FAILURE_SQL, {"key": key, "burst": limit.burst, "window": settings.LOGIN_FAILURE_WINDOW_SECONDS}
+                ).one()
+                backoff = _backoff_seconds(failures, limit)
+                if backoff:
+                    db.execute(_BLOCK_SQL, {"key": key, "seconds": backoff})
+                    remaining = backoff
+                # Tokens zählt nur acquire; den Prozess-Stand dafür nicht überschreiben
+                results[key] = (None, failures, remaining)
+            else:
+                db.execute(_SUCCESS_SQL, {"key": key})
+        now = time.monotonic()
+        if now - _last_purge > PURGE_INTERVAL_SECONDS:
+            _last_purge = now
+            db.execute(_PURGE_SQL, {"window": max(settings.LOGIN_FAILURE_WINDOW_SECONDS, settings.LOGIN_BACKOFF_MAX_SECONDS)})
+        db.commit()
+        return results
+    except Exception as e:
+        db.rollback()
+        print(f"FEHLER bei der Login-Drossel (nur Prozess-Zähler): {e}")
+        return None
+
+
+def _apply(entry: _Entry, tokens: Optional[float], failures: int, remaining: Optional[float], now: float):
+    if tokens is not None:
+        entry.tokens = float(tokens)
+        entry.refilled = now
+    entry.failures = failures
+    entry.blocked_until = now + float(remaining) if remaining is not None and remaining > 0 else 0.0
+
+
+def reset():
+    """Verwirft den Prozess-Zustand (Tests, Benchmarks)."""
+    global _last_purge
+    with _lock:
+        _entries.clear()
+        _last_purge = 0.0
@@ -0,0 +1,118 @@
+"""
+Streaming-Uploads für Dokumente und Bilder.
+
+Statt die Datei mit `await upload_file.read()` komplett in den Speicher zu laden, wird
+sie blockweise in eine temporäre Datei kopiert. Dabei werden Größenlimit, Dateityp
+(anhand der ersten Bytes, nicht des vom Client gesendeten Content-Type) und eine
+SHA-256-Prüfsumme laufend geprüft bzw. berechnet. Das Storage (siehe storage.py) liest
+die temporäre Datei anschließend ebenfalls blockweise, so dass pro Upload nur ein Block
+im Speicher liegt – unabhängig von der Dateigröße.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 64 * 1024
+# Reserve für Multipart-Grenzen und Header bei der Content-Length-Vorprüfung
+MULTIPART_OVERHEAD = 16 * 1024
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp", "image/heic")
+DOCUMENT_TYPES = ("application/pdf",) + IMAGE_TYPES
+
+_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+_HEIC_BRANDS = (b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1")
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Erkennt den Dateityp an den ersten Bytes (Magic Numbers)."""
+    for magic, content_type in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIC_BRANDS:
+        return "image/heic"
+    return None
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Nur der Dateiname ohne Verzeichnisanteile, damit Pfade im Bucket nicht verlassen werden."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name if name not in ("", ".", "..") else "upload"
+
+
+def check_content_length(request: Request, max_size: int):
+    """Lehnt zu große Uploads ab, bevor der Body überhaupt gelesen wird."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"File too large (max {max_size // (1024 * 1024)} MB)")
+
+
+class SpooledUpload:
+    """Eine vollständig empfangene, geprüfte Upload-Datei auf der Platte."""
+
+    def __init__(self, path: str, size: int, checksum: str, content_type: str):
+        self.path = path
+        self.size = size
+        self.checksum = checksum
+        self.content_type = content_type
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+    def cleanup(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(upload_file: UploadFile, max_size: int, allowed_types: Iterable[str]) -> SpooledUpload:
+    """
+    Kopiert den Upload blockweise in eine temporäre Datei. Bricht mit 413 ab, sobald das
+    Limit überschritten wird, und mit 415, wenn der erkannte Typ nicht erlaubt ist.
+    """
+    allowed_types = tuple(allowed_types)
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    fd, path = tempfile.mkstemp(prefix="upload_")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if content_type is None:
+                    content_type = sniff_content_type(chunk)
+                    if content_type not in allowed_types:
+                        raise HTTPException(status_code=415, detail="Unsupported file type")
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {max_size // (1024 * 1024)} MB)")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, size, digest.hexdigest(), content_type)
+
+
+def store_spooled(storage, bucket: str, path_in_bucket: str, upload: SpooledUpload):
+    """Lädt die temporäre Datei hoch; das Storage liest sie blockweise von der Platte."""
+    return storage.upload(bucket, path_in_bucket, upload.path, upload.content_type)
@@ -0,0 +1,81 @@
+"""
+Archivierung alter Transaktions-Monate (siehe app/archive.py).
+
+Aufruf im Verzeichnis backend:
+    python archive_transactions.py archive --before 2024-01 [--dir PFAD]
+    python archive_transactions.py list
+    python archive_transactions.py read DATEI... [--user-id 42]
+    python archive_transactions.py read --since 2023-01 --until 2023-07
+
+"archive" lagert alle Monate vor --before aus; "read" gibt archivierte Buchungen als
+JSON-Zeilen aus (Dateien direkt oder über den Zeitraum aus transaction_archives).
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, text
+
+from app import archive, partitions
+from app.config import settings
+
+
+def _archive(engine, args):
+    archived = archive.archive_before(engine, partitions.parse_month(args.before), args.dir)
+    print(f"{len(archived)} Partition(en) archiviert.")
+
+
+def _list(engine, args):
+    with engine.connect() as conn:
+        for p in partitions.list_partitions(conn):
+            state = "" if p.attached else " (abgehängt, Archivierung unvollständig)"
+            print(f"{p.name}: {p.start:%Y-%m-%d} bis {p.end:%Y-%m-%d}{state}")
+        for month, path, row_count in conn.execute(text(
+            "SELECT month, file_path, row_count FROM transaction_archives ORDER BY month"
+        )):
+            print(f"archiviert {month:%Y-%m}: {row_count} Zeilen in {path}")
+
+
+def _read(engine, args):
+    paths = args.files
+    if not paths:
+        with engine.connect() as conn:
+            paths = archive.archived_files(
+                conn,
+                since=partitions.parse_month(args.since) if args.since else None,
+                until=partitions.parse_month(args.until) if args.until else None,
+            )
+    for path in paths:
+        for row in archive.read_archive(path):
+            if args.user_id is not None and row["user_id"] != args.user_id:
+                continue
+            if args.tenant_id is not None and row["tenant_id"] != args.tenant_id:
+                continue
+            print(json.dumps(row, default=str, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = commands.add_parser("archive", help="Monate vor --before auslagern")
+    archive_parser.add_argument("--before", required=True, help="erster Monat, der bleibt (JJJJ-MM)")
+    archive_parser.add_argument("--dir", default=None, help="Zielverzeichnis (Standard: TRANSACTION_ARCHIVE_DIR)")
+    archive_parser.set_defaults(handler=_archive)
+
+    list_parser = commands.add_parser("list", help="Partitionen und Archive anzeigen")
+    list_parser.set_defaults(handler=_list)
+
+    read_parser = commands.add_parser("read", help="archivierte Buchungen als JSON-Zeilen ausgeben")
+    read_parser.add_argument("files", nargs="*", help="Archivdateien (ohne Angabe: aus transaction_archives)")
+    read_parser.add_argument("--since", help="ab Monat (JJJJ-MM)")
+    read_parser.add_argument("--until", help="bis vor Monat (JJJJ-MM)")
+    read_parser.add_argument("--user-id", type=int)
+    read_parser.add_argument("--tenant-id", type=int)
+    read_parser.set_defaults(handler=_read)
+
+    args = parser.parse_args()
+    args.handler(create_engine(settings.DATABASE_URL), args)
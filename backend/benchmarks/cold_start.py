@@ -0,0 +1,99 @@
+"""
+Misst den Cold Start der App wie auf Vercel: Import von api/index.py in einem frischen
+Python-Prozess (per `-X importtime`) und optional die Dauer des ersten Requests.
+
+Ausgabe: Gesamt-Importzeit (Median über alle Läufe) sowie die teuersten Module und
+Top-Level-Pakete nach kumulierter Importzeit.
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.cold_start --runs 5 --top 15 --first-request
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+IMPORT_TARGET = "api.index"
+
+# Erster Request im selben frischen Prozess; /api/users/me braucht weder DB-Schreibzugriff noch Storage
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(api.index.app) as client:
+    client.get("/api/users/me")
+done = time.perf_counter()
+print(f"{(imported - start) * 1000:.1f} {(done - imported) * 1000:.1f}")
+"""
+
+
+def parse_importtime(stderr: str):
+    """Liefert {modul: kumulierte Zeit in µs} aus der Ausgabe von `-X importtime`."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self µs> | <kumuliert µs> | <Einrückung><modul>"
+        parts = line[len("import time:"):].split("|")
+        module = parts[2].strip()
+        cumulative[module] = int(parts[1].strip())
+    return cumulative
+
+
+def measure_import():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORT_TARGET}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.splitlines()[-1] if result.stderr else "Import fehlgeschlagen")
+    return parse_importtime(result.stderr)
+
+
+def measure_first_request():
+    result = subprocess.run([sys.executable, "-c", FIRST_REQUEST], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.splitlines()[-1] if result.stderr else "Request fehlgeschlagen")
+    imported_ms, request_ms = result.stdout.strip().splitlines()[-1].split()
+    return float(imported_ms), float(request_ms)
+
+
+def run(runs: int, top: int, first_request: bool):
+    samples = [measure_import() for _ in range(runs)]
+    modules = set().union(*samples)
+    median_ms = {m: statistics.median(s.get(m, 0) for s in samples) / 1000 for m in modules}
+
+    # Top-Level-Pakete: kumulierte Zeit des Paketmoduls selbst (enthält alle Untermodule)
+    packages = defaultdict(float)
+    for module, ms in median_ms.items():
+        if "." not in module:
+            packages[module] = ms
+
+    total = median_ms.get(IMPORT_TARGET, 0.0)
+    print(f"Import {IMPORT_TARGET}: {total:.1f} ms (Median aus {runs} Läufen)")
+
+    print(f"\n{'Top-Level-Paket':<40}{'kumuliert ms':>14}{'Anteil':>9}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:<40}{ms:>14.1f}{ms / total * 100 if total else 0:>8.0f}%")
+
+    print(f"\n{'Modul':<60}{'kumuliert ms':>14}")
+    for name, ms in sorted(median_ms.items(), key=lambda item: -item[1])[:top]:
+        print(f"{name:<60}{ms:>14.1f}")
+
+    if first_request:
+        timings = [measure_first_request() for _ in range(runs)]
+        import_ms = statistics.median(t[0] for t in timings)
+        request_ms = statistics.median(t[1] for t in timings)
+        print(f"\nErster Request: Import {import_ms:.1f} ms + Start/Request {request_ms:.1f} ms = {import_ms + request_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--first-request", action="store_true", help="zusätzlich den ersten Request messen")
+    args = parser.parse_args()
+    run(args.runs, args.top, args.first_request)
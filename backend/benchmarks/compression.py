@@ -0,0 +1,63 @@
+"""
+Vergleicht Antwortgröße und Latenz der Nutzerliste ohne Komprimierung, mit gzip und mit brotli.
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.compression --users 500 --rounds 20
+"""
+import argparse
+import statistics
+import time
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from backend.app.compression import CompressionMiddleware, brotli
+from backend.benchmarks.sample_data import make_users
+
+# Typische Downlink-Raten (Bit/s) für die geschätzte Übertragungszeit
+NETWORKS = {"3G": 1_600_000, "4G": 10_000_000}
+
+
+def build_app(payload, compressed: bool, minimum_size: int) -> FastAPI:
+    app = FastAPI()
+    if compressed:
+        app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+
+    @app.get("/api/users")
+    def users():
+        return JSONResponse(payload)
+
+    return app
+
+
+def run(users: int, rounds: int, minimum_size: int):
+    payload = jsonable_encoder(make_users(users))
+    variants = [("identity", False, "identity"), ("gzip", True, "gzip")]
+    if brotli is not None:
+        variants.append(("br", True, "br"))
+
+    print(f"{users} Kunden, {rounds} Durchläufe, Mindestgröße {minimum_size} B")
+    print(f"{'Variante':<10}{'Bytes':>12}{'Server p50 ms':>16}" + "".join(f"{'+' + n + ' ms':>12}" for n in NETWORKS))
+    for name, compressed, accept in variants:
+        client = TestClient(build_app(payload, compressed, minimum_size))
+        timings, size = [], 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            response = client.get("/api/users", headers={"Accept-Encoding": accept})
+            timings.append((time.perf_counter() - start) * 1000)
+            # TestClient dekomprimiert transparent, daher die Größe vom Header bzw. Rohstrom nehmen
+            size = int(response.headers.get("content-length", len(response.content)))
+        p50 = statistics.median(timings)
+        transfer = "".join(f"{p50 + size * 8 / bps * 1000:>12.1f}" for bps in NETWORKS.values())
+        print(f"{name:<10}{size:>12}{p50:>16.2f}{transfer}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--minimum-size", type=int, default=1024)
+    args = parser.parse_args()
+    run(args.users, args.rounds, args.minimum_size)
@@ -0,0 +1,284 @@
+"""
+Micro-Benchmark der crud-Funktionen auf einer befüllten lokalen DB: Laufzeit und Anzahl
+SQL-Statements pro Aufruf, ohne HTTP, Auth und Serialisierung.
+
+Gemessen wird in einem Mandanten aus synthetic_data.py (Standard: der zuletzt angelegte
+seed-*-Mandant). Jeder Durchlauf bekommt eine eigene Session in einer äußeren Transaktion,
+die danach zurückgerollt wird; commit() gibt wie bei /api/batch nur einen Savepoint frei.
+Schreibende Funktionen verändern die Daten daher nicht, und alle Durchläufe messen denselben
+Stand. SAVEPOINT-Statements zählen nicht als Abfragen.
+
+Mit --json wird das Ergebnis als Basislinie gespeichert; --compare hält eine frühere Messung
+dagegen und endet mit Exit-Code 1, wenn ein Median um mehr als --threshold langsamer ist
+oder eine Funktion mehr Abfragen braucht.
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.synthetic_data --users 20000 --transactions 1000000
+    python -m backend.benchmarks.crud_functions --rounds 50 --json crud_basis.json
+    python -m backend.benchmarks.crud_functions --compare crud_basis.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from backend.benchmarks.load_test import git_revision, percentile
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable  # (db, fixtures) -> None
+
+
+class Fixtures(NamedTuple):
+    tenant_id: int
+    domain: str
+    staff_id: int
+    customer_id: int  # Kunde mit Buchungen, ohne freigeschaltete Prüfung
+    exam_customer_id: Optional[int]  # Kunde, dessen Prüfung freigeschaltet ist
+    search_term: str
+    customer_count: int
+    transaction_count: int
+
+
+def load_fixtures(db, domain: Optional[str]) -> Fixtures:
+    from sqlalchemy import text
+
+    from backend.app import crud, rules, tenancy
+
+    query = "SELECT id, domain FROM tenants WHERE domain LIKE 'seed-%'"
+    params = {}
+    if domain:
+        query = "SELECT id, domain FROM tenants WHERE domain = :domain"
+        params["domain"] = domain
+    row = db.execute(text(query + " ORDER BY id DESC LIMIT 1"), params).first()
+    if row is None:
+        raise SystemExit("Kein befüllter Mandant gefunden; zuerst python -m backend.benchmarks.synthetic_data ausführen")
+    tenant_id, domain = row
+    tenancy.set_tenant(db, tenant_id)
+
+    staff_id = db.execute(text(
+        "SELECT id FROM users WHERE tenant_id = :t AND role = 'mitarbeiter' ORDER BY id LIMIT 1"
+    ), {"t": tenant_id}).scalar()
+    customer_count = db.execute(text("SELECT count(*) FROM users WHERE tenant_id = :t AND role = 'kunde'"), {"t": tenant_id}).scalar()
+    transaction_count = db.execute(text("SELECT count(*) FROM transactions WHERE tenant_id = :t"), {"t": tenant_id}).scalar()
+    if not staff_id or not customer_count:
+        raise SystemExit(f"Mandant {domain} hat keine Mitarbeiter oder Kunden")
+
+    # Kunden mit den meisten Buchungen zuerst: dort sind die Abfragen am teuersten
+    candidates = db.execute(text("""
+        SELECT u.id, u.level_id, u.name FROM users u
+        JOIN (SELECT user_id, count(*) AS n FROM transactions WHERE tenant_id = :t GROUP BY user_id) c ON c.user_id = u.id
+        WHERE u.tenant_id = :t AND u.role = 'kunde' AND u.level_id < 5
+        ORDER BY c.n DESC LIMIT 200
+    """), {"t": tenant_id}).all()
+    if not candidates:
+        candidates = db.execute(text(
+            "SELECT id, level_id, name FROM users WHERE tenant_id = :t AND role = 'kunde' ORDER BY id LIMIT 200"
+        ), {"t": tenant_id}).all()
+    index = rules.get_index(db, tenant_id)
+    customer_id, exam_customer_id = None, None
+    for user_id, level_id, _ in candidates:
+        if not index.exam_prereqs.get(level_id):
+            continue
+        unlocked = index.exam_unlocked(level_id, crud.get_achievement_counts(db, user_id))
+        if unlocked and exam_customer_id is None:
+            exam_customer_id = user_id
+        elif not unlocked and customer_id is None:
+            customer_id = user_id
+        if customer_id and exam_customer_id:
+            break
+    # Nachname eines Kunden als Suchbegriff (trifft mehrere, aber nicht alle)
+    search_term = candidates[0][2].split()[-1]
+    return Fixtures(tenant_id, domain, staff_id, customer_id or candidates[0][0], exam_customer_id,
+                    search_term, customer_count, transaction_count)
+
+
+def build_cases(f: Fixtures) -> List[Case]:
+    from backend.app import crud, schemas
+
+    def transaction(requirement_id: Optional[str], customer_id: int):
+        def run(db, f):
+            staff = crud.get_user(db, f.staff_id)
+            crud.create_transaction(db, schemas.TransactionCreate(
+                user_id=customer_id, type="Benchmark", description="Benchmark", amount=-15, requirement_id=requirement_id,
+            ), booked_by=staff)
+        return run
+
+    def prerequisites(db, f):
+        crud.are_prerequisites_met_for_exam(db, crud.get_user(db, f.exam_customer_id or f.customer_id))
+
+    def create_user(db, f):
+        crud.create_user(db, schemas.UserCreate(
+            email=f"benchmark-{time.perf_counter_ns()}@{f.domain}", name="Benchmark Kunde", role="kunde",
+            dogs=[schemas.DogCreate(name="Bello", breed="Mischling")],
+        ))
+
+    cases = [
+        Case("get_users", lambda db, f: crud.get_users(db, skip=0, limit=100)),
+        Case("get_users (letzte Seite)", lambda db, f: crud.get_users(db, skip=max(0, f.customer_count - 100), limit=100)),
+        Case("get_users (Portfolio)", lambda db, f: crud.get_users(db, limit=100, portfolio_of_user_id=f.staff_id)),
+        Case("search_users", lambda db, f: crud.search_users(db, f.search_term)),
+        Case("create_transaction", transaction("group_class", f.customer_id)),
+        Case("create_transaction (Prüfung)", transaction("exam", f.exam_customer_id or f.customer_id)),
+        Case("are_prerequisites_met_for_exam", prerequisites),
+        Case("update_user_level", lambda db, f: crud.update_user_level(db, f.customer_id, 3)),
+        Case("create_user", create_user),
+    ]
+    return cases
+
+
+class QueryCounter:
+    """Zählt SQL-Statements der Engine, solange active gesetzt ist."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.active = False
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            self.count += 1
+
+
+def measure(case: Case, fixtures: Fixtures, counter: QueryCounter, rounds: int, warmup: int) -> dict:
+    from backend.app import events, tenancy
+    from backend.app.database import SessionLocal, engine
+
+    timings, queries = [], []
+    for i in range(warmup + rounds):
+        with engine.connect() as connection:
+            outer = connection.begin()
+            db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+            events.defer(db)  # nichts verteilen, die Änderungen werden verworfen
+            tenancy.set_tenant(db, fixtures.tenant_id)
+            try:
+                gc.collect()
+                gc.disable()
+                counter.count, counter.active = 0, True
+                start = time.perf_counter()
+                case.run(db, fixtures)
+                elapsed = time.perf_counter() - start
+            finally:
+                counter.active = False
+                gc.enable()
+                db.close()
+                outer.rollback()
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(counter.count)
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": percentile(timings, 95),
+        "min_ms": timings[0],
+        "mean_ms": statistics.fmean(timings),
+        "queries": max(queries),
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, r in result["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if not old:
+            continue
+        if old["p50_ms"] and r["p50_ms"] > old["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {old['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+        if r["queries"] > old["queries"]:
+            regressions.append(f"{name}: {old['queries']} -> {r['queries']} Abfragen")
+    return regressions
+
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    meta = result["meta"]
+    print(f"\nMandant {meta['domain']}: {meta['customers']} Kunden, {meta['transactions']} Transaktionen, "
+          f"{result['cases'][next(iter(result['cases']))]['rounds']} Durchläufe")
+    print(f"{'Funktion':<34}{'p50 ms':>9}{'p95 ms':>9}{'min ms':>9}{'Abfragen':>10}")
+    for name, r in result["cases"].items():
+        line = f"{name:<34}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['min_ms']:>9.2f}{r['queries']:>10}"
+        old = (baseline or {}).get("cases", {}).get(name)
+        if old and old["p50_ms"]:
+            line += f"   p50 {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+.0f}%"
+            if r["queries"] != old["queries"]:
+                line += f", Abfragen {r['queries'] - old['queries']:+d}"
+        print(line)
+
+
+def run(args) -> int:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from backend.app import tenancy
+    from backend.app.database import SessionLocal, engine
+
+    db = SessionLocal()
+    tenancy.all_tenants(db)
+    try:
+        fixtures = load_fixtures(db, args.domain)
+    finally:
+        db.close()
+    if fixtures.exam_customer_id is None:
+        print("Hinweis: kein Kunde mit freigeschalteter Prüfung gefunden; die Prüfung wird ohne Achievement gebucht.")
+
+    counter = QueryCounter(engine)
+    cases = [c for c in build_cases(fixtures) if not args.only or any(o in c.name for o in args.only)]
+    results = {}
+    # crud gibt Debug-Ausgaben aus; die sollen weder die Messung noch den Bericht stören
+    with open(os.devnull, "w") as devnull:
+        for case in cases:
+            with contextlib.redirect_stdout(devnull):
+                results[case.name] = measure(case, fixtures, counter, args.rounds, args.warmup)
+
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "domain": fixtures.domain,
+            "customers": fixtures.customer_count,
+            "transactions": fixtures.transaction_count,
+        },
+        "cases": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nErgebnis gespeichert: {args.json}")
+    if baseline:
+        regressions = compare(result, baseline, args.threshold)
+        print(f"\nVergleich mit {baseline['meta'].get('revision') or args.compare}: "
+              + ("keine Verschlechterung" if not regressions else "VERSCHLECHTERUNG"))
+        for line in regressions:
+            print(f"  {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="lokale Postgres-DB (Standard: DATABASE_URL)")
+    parser.add_argument("--domain", help="Mandant (Standard: zuletzt angelegter seed-*-Mandant)")
+    parser.add_argument("--rounds", type=int, default=30, help="gemessene Durchläufe pro Funktion")
+    parser.add_argument("--warmup", type=int, default=3, help="Durchläufe vor der Messung (nicht gewertet)")
+    parser.add_argument("--only", nargs="*", help="nur Funktionen, deren Name einen dieser Teile enthält")
+    parser.add_argument("--json", help="Ergebnis als Basislinie speichern")
+    parser.add_argument("--compare", help="frühere Basislinie zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=0.25, help="erlaubte Verschlechterung des Medians (0.25 = 25%%)")
+    args = parser.parse_args()
+    if args.rounds < 1:
+        parser.error("--rounds muss mindestens 1 sein")
+    sys.exit(run(args))
@@ -0,0 +1,136 @@
+"""
+Minimaler Ersatz für Supabase (Auth-Admin-API und Storage) für Lasttests ohne Netzwerk.
+
+Beantwortet die Aufrufe, die storage.SupabaseStorage und outbox.py über den supabase-Client
+machen: Upload, Löschen und Signieren von Dateien sowie Anlegen, Ändern, Löschen und Auflisten
+von Auth-Usern. Inhalte werden nur im Speicher gehalten; latency_ms simuliert die Laufzeit
+eines echten Aufrufs.
+
+    server = FakeSupabase(latency_ms=20).start()
+    os.environ["SUPABASE_URL"] = server.url
+"""
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import unquote, urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeSupabase/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("content-length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json(self, status: int, data):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, method: str):
+        fake: FakeSupabase = self.server.fake
+        body = self._body()
+        if fake.latency_ms:
+            time.sleep(fake.latency_ms / 1000)
+        path = unquote(urlsplit(self.path).path)
+        call = f"{method} {path.split('/')[1] if path.count('/') > 1 else path}"
+        with fake.lock:
+            fake.calls[call] = fake.calls.get(call, 0) + 1
+
+        if path.startswith("/storage/v1/object/sign/") and method == "POST":
+            bucket = path[len("/storage/v1/object/sign/"):]
+            data = json.loads(body or b"{}")
+            token = uuid.uuid4().hex
+            return self._json(200, [
+                {"path": p, "signedURL": f"/object/sign/{bucket}/{p}?token={token}",
+                 "error": None if f"{bucket}/{p}" in fake.objects else "Not found"}
+                for p in data.get("paths", [])
+            ])
+        if path.startswith("/storage/v1/object/") and method in ("POST", "PUT"):
+            key = path[len("/storage/v1/object/"):]
+            fake.objects[key] = len(body)
+            return self._json(200, {"Key": key})
+        if path.startswith("/storage/v1/object/") and method == "DELETE":
+            bucket = path[len("/storage/v1/object/"):]
+            prefixes = json.loads(body or b"{}").get("prefixes", [])
+            for p in prefixes:
+                fake.objects.pop(f"{bucket}/{p}", None)
+            return self._json(200, [{"name": p} for p in prefixes])
+
+        if path == "/auth/v1/admin/users" and method == "GET":
+            return self._json(200, {"users": list(fake.users.values()), "aud": "authenticated"})
+        if path == "/auth/v1/admin/users" and method == "POST":
+            data = json.loads(body or b"{}")
+            user = _auth_user(str(uuid.uuid4()), data)
+            fake.users[user["id"]] = user
+            return self._json(200, user)
+        if path.startswith("/auth/v1/admin/users/"):
+            uid = path.rsplit("/", 1)[-1]
+            if method == "DELETE":
+                fake.users.pop(uid, None)
+                return self._json(200, {})
+            if method == "PUT":
+                user = _auth_user(uid, {**fake.users.get(uid, {}), **json.loads(body or b"{}")})
+                fake.users[uid] = user
+                return self._json(200, user)
+
+        self._json(404, {"error": "not_found", "message": f"{method} {path}"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def _auth_user(uid: str, data: dict) -> dict:
+    return {
+        "id": uid,
+        "aud": "authenticated",
+        "email": data.get("email"),
+        "app_metadata": data.get("app_metadata") or {},
+        "user_metadata": data.get("user_metadata") or {},
+        "created_at": data.get("created_at") or datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class FakeSupabase:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.objects: Dict[str, int] = {}  # "bucket/pfad" -> Größe
+        self.users: Dict[str, dict] = {}
+        self.calls: Dict[str, int] = {}  # "METHODE auth|storage" -> Anzahl
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSupabase":
+        threading.Thread(target=self._server.serve_forever, name="fake-supabase", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
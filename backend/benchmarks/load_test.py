@@ -0,0 +1,327 @@
+"""
+Lasttest der kompletten API: startet die App mit uvicorn gegen eine lokale Postgres-DB,
+ersetzt Supabase durch fake_supabase.FakeSupabase und lässt virtuelle Mitarbeiter und Kunden
+typische Abläufe wiederholen (Login, Dashboard, Suche, Buchung, Dokument-Upload, ...).
+
+Tokens werden lokal mit settings.SECRET_KEY signiert, wie sie auch Supabase ausstellt.
+Jeder Lauf legt einen eigenen Mandanten (Domain loadtest-<id>.localhost) mit Mitarbeitern
+und Kunden an; vorhandene Daten bleiben unberührt. Das Schema muss vorhanden sein
+(migrate_db.py) oder wird bei einer leeren DB per create_all angelegt. SQLite wird nicht
+unterstützt, da transactions nach Monaten partitioniert ist (partitions.py).
+
+Ausgabe: p50/p95/p99 und Durchsatz pro Route; mit --json für den Vergleich zwischen Releases
+speichern und mit --compare gegen eine frühere Messung halten.
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.load_test --database-url postgresql+psycopg2://... \\
+        --duration 60 --users 16 --json lasttest.json [--compare lasttest_alt.json]
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from backend.benchmarks.fake_supabase import FakeSupabase
+from backend.benchmarks.sample_data import BREEDS, DOG_NAMES, FIRST_NAMES, LAST_NAMES
+
+PASSWORD = "loadtest"
+# Minimales PDF für Dokument-Uploads (Typ wird anhand der Signatur erkannt)
+PDF_BYTES = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n" + b"0" * 20_000
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-Rank-Perzentil einer aufsteigend sortierten Liste."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+        self.recording = False
+
+    def add(self, route: str, seconds: float, status: str):
+        if not self.recording:
+            return
+        with self.lock:
+            self.samples[route].append(seconds)
+            self.statuses[route][status] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for route, values in sorted(self.samples.items()):
+            values = sorted(values)
+            statuses = dict(self.statuses[route])
+            errors = sum(n for s, n in statuses.items() if not s.startswith(("2", "3")))
+            routes[route] = {
+                "count": len(values),
+                "errors": errors,
+                "statuses": statuses,
+                "rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        total = sum(r["count"] for r in routes.values())
+        return {
+            "elapsed_s": elapsed,
+            "total": {"count": total, "errors": sum(r["errors"] for r in routes.values()), "rps": total / elapsed},
+            "routes": routes,
+        }
+
+
+class VirtualUser:
+    """Ein Mitarbeiter oder Kunde mit eigener HTTP-Verbindung, eigener IP und lokal signiertem Token."""
+
+    def __init__(self, base_url: str, domain: str, index: int, user: dict, customers: List[dict],
+                 token: str, recorder: Recorder, upload_every: int, rng: random.Random):
+        import httpx
+
+        self.user = user
+        self.customers = customers
+        self.recorder = recorder
+        self.upload_every = upload_every
+        self.rng = rng
+        self.iteration = 0
+        self.client = httpx.Client(base_url=base_url, timeout=60.0, headers={
+            "X-Forwarded-Host": domain,
+            "X-Forwarded-For": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+            "Accept-Encoding": "gzip, br",
+        })
+        self.auth = {"Authorization": f"Bearer {token}"}
+
+    def request(self, route: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as e:
+            response, status = None, type(e).__name__
+        self.recorder.add(route, time.perf_counter() - start, status)
+        return response
+
+    def login(self):
+        self.request("POST /api/login", "POST", "/api/login", data={"username": self.user["email"], "password": PASSWORD})
+
+    def staff_session(self):
+        self.login()
+        self.request("GET /api/dashboard", "GET", "/api/dashboard", headers=self.auth)
+        customer = self.rng.choice(self.customers)
+        self.request("GET /api/users/search", "GET", "/api/users/search",
+                     params={"q": customer["name"].split()[self.rng.randint(0, 1)][:4]}, headers=self.auth)
+        self.request("GET /api/users/{user_id}", "GET", f"/api/users/{customer['id']}", headers=self.auth)
+        booking = {"user_id": customer["id"], "type": "Aufladung", "amount": self.rng.choice([20, 50, 100, 150])}
+        if self.rng.random() < 0.5:
+            booking = {"user_id": customer["id"], "type": "Gruppenstunde", "amount": -15, "requirement_id": "group_class"}
+        self.request("POST /api/transactions", "POST", "/api/transactions", params={"include_aggregate": "true"},
+                     json=booking, headers={**self.auth, "Idempotency-Key": uuid.uuid4().hex})
+        if self.upload_every and (self.iteration - 1) % self.upload_every == 0:
+            self.request("POST /api/users/{user_id}/documents", "POST", f"/api/users/{customer['id']}/documents",
+                         files={"upload_file": (f"Impfpass_{uuid.uuid4().hex[:8]}.pdf", PDF_BYTES, "application/pdf")},
+                         headers=self.auth)
+        self.request("GET /api/users", "GET", "/api/users", headers=self.auth)
+        self.request("GET /api/transactions", "GET", "/api/transactions", headers=self.auth)
+
+    def customer_session(self):
+        self.login()
+        self.request("GET /api/users/me", "GET", "/api/users/me", headers=self.auth)
+        self.request("GET /api/dashboard", "GET", "/api/dashboard", headers=self.auth)
+        self.request("GET /api/transactions", "GET", "/api/transactions", headers=self.auth)
+        self.request("GET /api/users/{user_id}/eligibility", "GET", f"/api/users/{self.user['id']}/eligibility", headers=self.auth)
+        self.request("GET /api/users/{user_id}/documents/urls", "GET", f"/api/users/{self.user['id']}/documents/urls", headers=self.auth)
+
+    def run(self, deadline: float):
+        session: Callable[[], None] = self.staff_session if self.user["role"] == "mitarbeiter" else self.customer_session
+        while time.monotonic() < deadline:
+            self.iteration += 1
+            session()
+        self.client.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def configure_environment(args, fake: FakeSupabase):
+    """Setzt die Umgebung, bevor backend.app (und damit settings) importiert wird."""
+    from jose import jwt
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = jwt.encode({"role": "service_role"}, os.environ["SECRET_KEY"], algorithm="HS256")
+    os.environ["STORAGE_BACKEND"] = "supabase"
+    # Alle virtuellen Nutzer kommen von wenigen Adressen; die Login-Drossel soll nicht mitmessen
+    for name in ("LOGIN_IP_BURST", "LOGIN_IP_BACKOFF_AFTER", "LOGIN_ACCOUNT_BURST", "LOGIN_ACCOUNT_BACKOFF_AFTER"):
+        os.environ[name] = "1000000"
+    os.environ["LOGIN_ACCOUNT_PER_SECOND"] = "1000"
+
+
+def seed(staff_count: int, customer_count: int, run_id: str, rng: random.Random):
+    """Legt Mandant, Mitarbeiter und Kunden (mit Hunden) für diesen Lauf an."""
+    from backend.app import auth, models, partitions
+    from backend.app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        partitions.ensure_partitions(conn)
+
+    hashed = auth.get_password_hash(PASSWORD)  # einmal rechnen statt pro Nutzer
+    db = SessionLocal()
+    try:
+        tenant = models.Tenant(name=f"Lasttest {run_id}", domain=f"loadtest-{run_id}.localhost")
+        db.add(tenant)
+        db.flush()
+        users = []
+        for i in range(staff_count):
+            users.append(models.User(tenant_id=tenant.id, email=f"staff{i}-{run_id}@loadtest.localhost", name=f"Mitarbeiter {i}",
+                                     role="mitarbeiter", hashed_password=hashed))
+        for i in range(customer_count):
+            customer = models.User(
+                tenant_id=tenant.id, email=f"kunde{i}-{run_id}@loadtest.localhost",
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", role="kunde", hashed_password=hashed,
+                balance=round(rng.uniform(0, 300), 2), level_id=rng.randint(1, 5),
+            )
+            customer.dogs = [models.Dog(tenant_id=tenant.id, name=rng.choice(DOG_NAMES), breed=rng.choice(BREEDS))]
+            users.append(customer)
+        db.add_all(users)
+        db.commit()
+        return tenant.domain, [{"id": u.id, "email": u.email, "name": u.name, "role": u.role, "tenant_id": u.tenant_id} for u in users]
+    finally:
+        db.close()
+
+
+def start_server(port: int):
+    import uvicorn
+    from backend.app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    print(f"\n{'Route':<42}{'n':>7}{'Fehler':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, r in result["routes"].items():
+        line = f"{route:<42}{r['count']:>7}{r['errors']:>8}{r['rps']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+        old = (baseline or {}).get("routes", {}).get(route)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+    total = result["total"]
+    line = f"\nGesamt: {total['count']} Anfragen, {total['errors']} Fehler, {total['rps']:.1f} req/s in {result['elapsed_s']:.0f} s"
+    if baseline:
+        line += f" (Durchsatz {(total['rps'] / baseline['total']['rps'] - 1) * 100:+.0f}% gegenüber {baseline['meta'].get('revision') or 'Basislauf'})"
+    print(line)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    fake = FakeSupabase(latency_ms=args.supabase_latency_ms).start()
+    configure_environment(args, fake)
+
+    from backend.app.config import settings
+    from jose import jwt
+
+    run_id = uuid.uuid4().hex[:8]
+    staff_count = max(1, round(args.users * args.staff_share))
+    domain, users = seed(staff_count, args.customers, run_id, rng)
+    staff = [u for u in users if u["role"] == "mitarbeiter"]
+    customers = [u for u in users if u["role"] == "kunde"]
+
+    # Die App schreibt pro Request DEBUG-Zeilen; die würden die Messung und die Ausgabe verfälschen
+    recorder = Recorder()
+    with contextlib.ExitStack() as stack:
+        if not args.app_output:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        port = _free_port()
+        server = start_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+        virtual_users = []
+        for i in range(args.users):
+            user = staff[i % len(staff)] if i < staff_count else customers[i % len(customers)]
+            token = jwt.encode({"email": user["email"], "tenant_id": user["tenant_id"], "role": "authenticated"},
+                               settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+            virtual_users.append(VirtualUser(base_url, domain, i, user, customers, token, recorder, args.upload_every,
+                                             random.Random(args.seed + i)))
+
+        deadline = time.monotonic() + args.warmup + args.duration
+        threads = [threading.Thread(target=vu.run, args=(deadline,), daemon=True) for vu in virtual_users]
+        for t in threads:
+            t.start()
+        time.sleep(args.warmup)
+        recorder.recording = True
+        started = time.monotonic()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+        recorder.recording = False
+        server.should_exit = True
+
+    result = recorder.summary(elapsed)
+    result["meta"] = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "users": args.users, "staff": staff_count, "customers": args.customers,
+        "duration_s": args.duration, "supabase_latency_ms": args.supabase_latency_ms,
+        "supabase_calls": dict(fake.calls),
+    }
+    fake.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Ergebnis gespeichert: {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("LOADTEST_DATABASE_URL") or os.environ.get("DATABASE_URL"),
+                        help="lokale Postgres-DB (Standard: LOADTEST_DATABASE_URL bzw. DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=8, help="gleichzeitige virtuelle Nutzer")
+    parser.add_argument("--staff-share", type=float, default=0.25, help="Anteil Mitarbeiter unter den virtuellen Nutzern")
+    parser.add_argument("--customers", type=int, default=200, help="angelegte Kunden im Testmandanten")
+    parser.add_argument("--duration", type=float, default=30.0, help="Messdauer in Sekunden")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Sekunden vor der Messung (nicht gewertet)")
+    parser.add_argument("--upload-every", type=int, default=5, help="Dokument-Upload in jeder n-ten Mitarbeiter-Runde (0 = nie)")
+    parser.add_argument("--supabase-latency-ms", type=float, default=20.0, help="simulierte Laufzeit eines Supabase-Aufrufs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Ergebnis als JSON speichern")
+    parser.add_argument("--compare", help="früheres JSON-Ergebnis zum Vergleich")
+    parser.add_argument("--app-output", action="store_true", help="Ausgaben der App nicht unterdrücken")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url fehlt")
+    if args.database_url.startswith("sqlite"):
+        parser.error("SQLite wird nicht unterstützt (transactions ist partitioniert); bitte eine lokale Postgres-DB angeben")
+    run(args)
@@ -0,0 +1,68 @@
+"""
+Synthetische Nutzdaten für die Benchmarks, die der Form von schemas.User entsprechen
+(Kunde mit Hunden, Dokumenten und Achievements). Benötigt weder DB noch Supabase.
+"""
+import random
+from datetime import date, datetime, timedelta
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Eva", "Felix", "Greta", "Hannes", "Ida", "Jonas", "Lena", "Max"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Hoffmann"]
+DOG_NAMES = ["Bello", "Luna", "Balu", "Emma", "Rocky", "Kira", "Sammy", "Nala"]
+BREEDS = ["Labrador", "Schäferhund", "Golden Retriever", "Mischling", "Dackel", "Border Collie"]
+REQUIREMENTS = ["group_class", "exam", "social_walk", "tavern_training", "lecture_bonding", "first_aid"]
+
+
+def make_user(user_id: int, rng: random.Random) -> dict:
+    base = datetime(2024, 1, 1)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    return {
+        "id": user_id,
+        "tenant_id": 1,
+        "auth_id": None,
+        "email": f"kunde{user_id}@example.com",
+        "name": name,
+        "role": "kunde",
+        "is_active": True,
+        "balance": round(rng.uniform(0, 400), 2),
+        "phone": f"0171 {rng.randint(1000000, 9999999)}",
+        "level_id": rng.randint(1, 5),
+        "is_vip": rng.random() < 0.1,
+        "is_expert": False,
+        "customer_since": base + timedelta(days=rng.randint(0, 600)),
+        "current_level": None,
+        "dogs": [
+            {
+                "id": user_id * 10 + i,
+                "owner_id": user_id,
+                "name": rng.choice(DOG_NAMES),
+                "breed": rng.choice(BREEDS),
+                "birth_date": date(2020, 1, 1) + timedelta(days=rng.randint(0, 1500)),
+                "chip": str(rng.randint(10**14, 10**15 - 1)),
+            }
+            for i in range(rng.randint(1, 2))
+        ],
+        "documents": [
+            {
+                "id": user_id * 10 + i,
+                "file_name": f"Impfpass_{i}.pdf",
+                "file_type": "application/pdf",
+                "upload_date": base + timedelta(days=rng.randint(0, 600)),
+                "file_path": f"1/{user_id}/Impfpass_{i}.pdf",
+            }
+            for i in range(rng.randint(0, 3))
+        ],
+        "achievements": [
+            {
+                "id": user_id * 100 + i,
+                "requirement_id": rng.choice(REQUIREMENTS),
+                "date_achieved": base + timedelta(days=rng.randint(0, 600)),
+                "is_consumed": rng.random() < 0.5,
+            }
+            for i in range(rng.randint(0, 12))
+        ],
+    }
+
+
+def make_users(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [make_user(i + 1, rng) for i in range(count)]
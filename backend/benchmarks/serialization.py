@@ -0,0 +1,95 @@
+"""
+Micro-Benchmark: Serialisierung von Kunden samt Hunden, Dokumenten und Achievements.
+
+"vorher" ist der Standardweg von FastAPI (response_model-Validierung + JSONResponse),
+"nachher" die Pfade aus backend.app.serialization: der vorab gebaute TypeAdapter
+(Fallback ohne orjson) und der OrmSerializer (ORM-Felder direkt + orjson).
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.serialization --users 1000 --rounds 20
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from backend.app import models, schemas
+from backend.app.serialization import USER_LIST_SERIALIZER, DefaultResponse, orjson
+from backend.benchmarks.sample_data import make_users
+
+
+def build_orm_users(count: int) -> list:
+    """Baut transiente ORM-Objekte (ohne Session), wie sie crud.get_users liefern würde."""
+    users = []
+    for data in make_users(count):
+        data = dict(data)
+        dogs = [models.Dog(**d) for d in data.pop("dogs")]
+        documents = [models.Document(**d, user_id=data["id"], tenant_id=1) for d in data.pop("documents")]
+        achievements = [models.Achievement(**a, user_id=data["id"]) for a in data.pop("achievements")]
+        data.pop("current_level")
+        users.append(models.User(**data, hashed_password="x", dogs=dogs, documents=documents, achievements=achievements))
+    return users
+
+
+def fastapi_default(field, users) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=users, is_coroutine=False))
+    return JSONResponse(content).body
+
+
+def fastapi_orjson(field, users) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=users, is_coroutine=False))
+    return DefaultResponse(content).body
+
+
+def type_adapter(users) -> bytes:
+    adapter = USER_LIST_SERIALIZER.adapter
+    return adapter.dump_json(adapter.validate_python(users, from_attributes=True))
+
+
+def measure(fn, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        # Wie timeit: GC während der Messung aus, damit Sammelläufe nicht zufällig eine Variante treffen
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            body = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    return statistics.median(timings), min(timings), len(body)
+
+
+def run(users_count: int, rounds: int):
+    users = build_orm_users(users_count)
+    field = create_response_field(name="Response_read_users", type_=List[schemas.User], mode="serialization")
+
+    variants = [
+        ("vorher: response_model + json", lambda: fastapi_default(field, users)),
+        ("response_model + orjson", lambda: fastapi_orjson(field, users)),
+        ("TypeAdapter.dump_json", lambda: type_adapter(users)),
+    ]
+    if orjson is not None:
+        variants.append(("nachher: OrmSerializer + orjson", lambda: USER_LIST_SERIALIZER.dump_json(users)))
+    print(f"{users_count} Kunden mit Kindobjekten, {rounds} Durchläufe")
+    print(f"{'Variante':<34}{'p50 ms':>10}{'min ms':>10}{'Bytes':>12}")
+    baseline = None
+    for name, fn in variants:
+        p50, best, size = measure(fn, rounds)
+        baseline = baseline or p50
+        print(f"{name:<34}{p50:>10.2f}{best:>10.2f}{size:>12}   x{baseline / p50:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    run(args.users, args.rounds)
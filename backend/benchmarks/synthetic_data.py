@@ -0,0 +1,321 @@
+"""
+Synthetische Daten für Tests im großen Maßstab (Paginierung, Suche, Auswertungen):
+Mandanten mit Mitarbeitern, Kunden, Hunden, Transaktionen und Achievements, geladen per COPY.
+
+Die Daten sind in sich stimmig:
+  - Pro Kunde laufen die Buchungen chronologisch; balance_after ist die Summe aller
+    bisherigen Beträge, das Guthaben wird nie negativ (bei zu wenig Guthaben wird aufgeladen)
+    und users.balance entspricht dem letzten balance_after.
+  - Aufladungen enthalten den Bonus nach bonus.DEFAULT_INDEX, Leistungen kosten die Preise
+    aus dem Frontend; Typ und Beschreibung entsprechen dem, was die App bucht.
+  - Achievements entstehen wie in crud.create_transaction (Prüfung nur, wenn freigeschaltet).
+    Sind die Anforderungen des Levels nach rules.DEFAULT_INDEX erfüllt, steigt der Kunde auf
+    und seine Leistungen werden wie in crud.update_user_level verbraucht.
+
+Jeder Lauf legt eigene Mandanten an (Domain seed-<id>-<n>.localhost); vorhandene Daten bleiben
+unberührt. Alle Nutzer haben das Passwort "seed". IDs werden vorab per setval reserviert,
+damit Transaktionen und Achievements ohne Rückfrage aufeinander verweisen können; jeder Block
+von --chunk-size Kunden wird für sich committet. Das Schema muss vorhanden sein
+(migrate_db.py) oder wird bei einer leeren DB per create_all angelegt.
+
+Aufruf aus dem Projekt-Root:
+    python -m backend.benchmarks.synthetic_data --database-url postgresql+psycopg2://... \\
+        --tenants 10 --users 100000 --transactions 10000000 --months 36
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from backend.benchmarks.sample_data import BREEDS, DOG_NAMES, FIRST_NAMES, LAST_NAMES
+
+PASSWORD = "seed"
+
+
+class Service(NamedTuple):
+    title: str
+    price: float
+    requirement_id: str
+
+
+# Wie die Abbuchungs-Buttons im Frontend (index.tsx)
+SERVICES = [
+    Service("Gruppenstunde", 15, "group_class"),
+    Service("Mantrailing", 18, "trail"),
+    Service("Prüfungsstunde", 15, "exam"),
+    Service("Social Walk", 15, "social_walk"),
+    Service("Wirtshaustraining", 15, "tavern_training"),
+    Service("Erste Hilfe Kurs", 50, "first_aid"),
+    Service("Vortrag Bindung & Beziehung", 15, "lecture_bonding"),
+    Service("Vortrag Jagdverhalten", 15, "lecture_hunting"),
+    Service("WS Kommunikation & Körpersprache", 15, "ws_communication"),
+    Service("WS Stress & Impulskontrolle", 15, "ws_stress"),
+    Service("Theorieabend Hundeführerschein", 25, "theory_license"),
+]
+SERVICES_BY_ID = {s.requirement_id: s for s in SERVICES}
+# Basisbeträge von Aufladungen (ohne Bonus), häufige Beträge mehrfach
+TOPUP_AMOUNTS = [20, 50, 50, 100, 100, 100, 150, 150, 300]
+# Wahrscheinlichkeit, gezielt eine offene Anforderung des Levels zu buchen
+FOCUS_SHARE = 0.75
+# Wahrscheinlichkeit pro Buchung, dass ein Welpe (Level 1) in Level 2 wechselt
+PUPPY_GRADUATION = 0.15
+
+USER_COLUMNS = ["id", "tenant_id", "name", "email", "hashed_password", "role", "is_active", "balance",
+                "customer_since", "phone", "level_id", "is_vip", "is_expert", "updated_at", "version"]
+DOG_COLUMNS = ["tenant_id", "owner_id", "name", "breed", "birth_date", "chip", "updated_at", "version"]
+TRANSACTION_COLUMNS = ["id", "tenant_id", "user_id", "date", "type", "description", "amount", "balance_after",
+                       "bonus", "booked_by_id", "updated_at", "version"]
+ACHIEVEMENT_COLUMNS = ["tenant_id", "user_id", "requirement_id", "date_achieved", "transaction_id", "is_consumed",
+                       "updated_at", "version"]
+
+
+def split(total: int, weights: List[float]) -> List[int]:
+    """Verteilt total ganzzahlig nach weights (größte Reste bekommen den Rest)."""
+    if not weights:
+        return []
+    scale = total / sum(weights)
+    shares = [w * scale for w in weights]
+    counts = [int(s) for s in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+class Table:
+    """Sammelt Zeilen einer Tabelle als CSV und lädt sie per COPY."""
+
+    def __init__(self, name: str, columns: List[str]):
+        self.name = name
+        self.columns = columns
+        self.rows: List[list] = []
+        self.total = 0
+
+    def copy(self, cursor):
+        if not self.rows:
+            return
+        buffer = io.StringIO()
+        # None wird zum leeren, unquotierten Feld und damit NULL
+        csv.writer(buffer).writerows(self.rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {self.name} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.total += len(self.rows)
+        self.rows = []
+
+
+def reserve_ids(cursor, table: str, count: int) -> int:
+    """Reserviert count aufeinanderfolgende IDs aus der Sequenz von table; liefert die erste."""
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence(%(t)s, 'id'), nextval(pg_get_serial_sequence(%(t)s, 'id')) + %(n)s - 1)",
+        {"t": table, "n": count},
+    )
+    return cursor.fetchone()[0] - count + 1
+
+
+class Generator:
+    def __init__(self, args, hashed_password: str, now: datetime):
+        from backend.app import bonus, rules
+
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rules = rules.DEFAULT_INDEX
+        self.bonus = bonus.DEFAULT_INDEX
+        self.exam_id = rules.EXAM_REQUIREMENT_ID
+        self.topup_type = bonus.TOPUP_TYPE
+        self.hashed_password = hashed_password
+        self.now = now
+        self.start = now - timedelta(days=30 * args.months)
+        self.users = Table("users", USER_COLUMNS)
+        self.dogs = Table("dogs", DOG_COLUMNS)
+        self.transactions = Table("transactions", TRANSACTION_COLUMNS)
+        self.achievements = Table("achievements", ACHIEVEMENT_COLUMNS)
+
+    def _user_row(self, user_id: int, tenant_id: int, domain: str, role: str, since: datetime, name: str) -> list:
+        rng = self.rng
+        return [user_id, tenant_id, name, f"{role}{user_id}@{domain}", self.hashed_password, role, True, 0.0,
+                since, f"0171 {rng.randint(1000000, 9999999)}", 1, False, False, since, 1]
+
+    def staff(self, cursor, tenant_id: int, domain: str) -> List[int]:
+        """Ein Admin und --staff-per-tenant Mitarbeiter; liefert ihre IDs."""
+        count = 1 + self.args.staff_per_tenant
+        first_id = reserve_ids(cursor, "users", count)
+        ids = list(range(first_id, first_id + count))
+        for i, user_id in enumerate(ids):
+            role = "admin" if i == 0 else "mitarbeiter"
+            self.users.rows.append(self._user_row(user_id, tenant_id, domain, role, self.start, f"{role.capitalize()} {i}"))
+        self.users.copy(cursor)
+        return ids
+
+    def customers(self, cursor, tenant_id: int, domain: str, staff_ids: List[int], tx_counts: List[int]):
+        """Legt einen Block Kunden mit Hunden, Transaktionen und Achievements an."""
+        first_user = reserve_ids(cursor, "users", len(tx_counts))
+        total_tx = sum(tx_counts)
+        next_tx = reserve_ids(cursor, "transactions", total_tx) if total_tx else 0
+        for offset, count in enumerate(tx_counts):
+            self._customer(first_user + offset, tenant_id, domain, staff_ids, count, next_tx)
+            next_tx += count
+        # Reihenfolge wegen der Fremdschlüssel auf users
+        for table in (self.users, self.dogs, self.transactions, self.achievements):
+            table.copy(cursor)
+
+    def _customer(self, user_id: int, tenant_id: int, domain: str, staff_ids: List[int], count: int, next_tx: int):
+        rng, index = self.rng, self.rules
+        span = (self.now - self.start).total_seconds()
+        since = self.start + timedelta(seconds=rng.random() * span * 0.9)
+        remaining = (self.now - since).total_seconds()
+        dates = sorted(since + timedelta(seconds=rng.random() * remaining) for _ in range(count))
+
+        balance, level, is_expert = 0.0, 1, False
+        # Unverbrauchte Achievements (Zeilen in self.achievements.rows) und ihre Anzahl je Anforderung
+        open_rows: List[list] = []
+        counts: Dict[str, int] = {}
+        for tx_id, at in zip(range(next_tx, next_tx + count), dates):
+            service = self._pick_service(level, counts)
+            booked_by = rng.choice(staff_ids)
+            if balance < service.price:
+                base = rng.choice(TOPUP_AMOUNTS)
+                topup_bonus = self.bonus.bonus_for(base, at).bonus
+                balance += base + topup_bonus
+                self.transactions.rows.append([tx_id, tenant_id, user_id, at, self.topup_type, f"Aufladung {base}€",
+                                               base + topup_bonus, balance, topup_bonus, booked_by, at, 1])
+                continue
+
+            balance -= service.price
+            self.transactions.rows.append([tx_id, tenant_id, user_id, at, service.title, service.title,
+                                           -service.price, balance, 0.0, booked_by, at, 1])
+            row = [tenant_id, user_id, service.requirement_id, at, tx_id, False, at, 1]
+            self.achievements.rows.append(row)
+            open_rows.append(row)
+            counts[service.requirement_id] = counts.get(service.requirement_id, 0) + 1
+
+            if level == 1:
+                eligible = rng.random() < PUPPY_GRADUATION
+            else:
+                eligible = index.evaluate(level, counts).level_up_eligible
+            if not eligible:
+                continue
+            if level >= 5:
+                is_expert = True
+                continue
+            # Wie crud.update_user_level: alles außer den Zusatzveranstaltungen wird verbraucht
+            kept = []
+            for open_row in open_rows:
+                if open_row[2] in index.kept_on_level_up:
+                    kept.append(open_row)
+                else:
+                    open_row[5] = True
+                    open_row[6] = at
+                    open_row[7] = 2
+            open_rows = kept
+            counts = {}
+            for open_row in kept:
+                counts[open_row[2]] = counts.get(open_row[2], 0) + 1
+            level += 1
+
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        user = self._user_row(user_id, tenant_id, domain, "kunde", since, name)
+        user[7], user[10], user[11], user[12] = balance, level, rng.random() < 0.05, is_expert
+        user[13] = dates[-1] if dates else since
+        self.users.rows.append(user)
+
+        for _ in range(1 if rng.random() < 0.8 else rng.randint(2, 3)):
+            birth = since.date() - timedelta(days=rng.randint(60, 12 * 365))
+            chip = f"276{rng.randint(0, 10 ** 12 - 1):012d}" if rng.random() < 0.7 else None
+            self.dogs.rows.append([tenant_id, user_id, rng.choice(DOG_NAMES), rng.choice(BREEDS), birth, chip, since, 1])
+
+    def _pick_service(self, level: int, counts: Dict[str, int]) -> Service:
+        rng, index = self.rng, self.rules
+        exam_unlocked = index.exam_unlocked(level, counts)
+        if rng.random() < FOCUS_SHARE:
+            open_ids = [
+                r.id for r in index.requirements_for(level)
+                if counts.get(r.id, 0) < r.required and r.id in SERVICES_BY_ID and (r.id != self.exam_id or exam_unlocked)
+            ]
+            if open_ids:
+                return SERVICES_BY_ID[rng.choice(open_ids)]
+        service = rng.choice(SERVICES)
+        if service.requirement_id == self.exam_id and not exam_unlocked:
+            # Die App würde die Prüfung ohne Voraussetzungen nicht als Leistung werten
+            return SERVICES_BY_ID["group_class"]
+        return service
+
+
+def run(args):
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from sqlalchemy import text
+
+    from backend.app import auth, models, partitions
+    from backend.app.database import engine
+
+    started = time.perf_counter()
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    with engine.connect() as conn:
+        now = conn.execute(text("SELECT now()::timestamp")).scalar()
+    generator = Generator(args, auth.get_password_hash(PASSWORD), now)  # einmal rechnen statt pro Nutzer
+    with engine.begin() as conn:
+        partitions.ensure_partitions(conn, first_month=generator.start)
+
+    run_id = uuid.uuid4().hex[:8]
+    # Ungleich große Mandanten und Kunden mit sehr unterschiedlich vielen Buchungen
+    users_per_tenant = split(args.users, [rng.lognormvariate(0, 0.5) for _ in range(args.tenants)])
+    tx_per_customer = split(args.transactions, [rng.lognormvariate(0, 1) for _ in range(args.users)])
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        position = 0
+        for number, user_count in enumerate(users_per_tenant, start=1):
+            domain = f"seed-{run_id}-{number}.localhost"
+            cursor.execute("INSERT INTO tenants (name, domain) VALUES (%s, %s) RETURNING id",
+                           (f"Hundeschule Seed {run_id} {number}", domain))
+            tenant_id = cursor.fetchone()[0]
+            staff_ids = generator.staff(cursor, tenant_id, domain)
+            raw.commit()
+            for chunk_start in range(0, user_count, args.chunk_size):
+                counts = tx_per_customer[position + chunk_start:position + min(user_count, chunk_start + args.chunk_size)]
+                generator.customers(cursor, tenant_id, domain, staff_ids, counts)
+                raw.commit()
+                elapsed = time.perf_counter() - started
+                print(f"Mandant {tenant_id} ({domain}): {chunk_start + len(counts)}/{user_count} Kunden, "
+                      f"insgesamt {generator.transactions.total} Transaktionen ({generator.transactions.total / elapsed:.0f}/s)")
+            position += user_count
+        cursor.close()
+    finally:
+        raw.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Frische Statistiken, sonst plant Postgres auf den neuen Tabellengrößen daneben
+        for table in ("users", "dogs", "transactions", "achievements"):
+            conn.execute(text(f"ANALYZE {table}"))
+
+    print(f"\nFertig in {time.perf_counter() - started:.1f} s: {args.tenants} Mandanten, {generator.users.total} Nutzer, "
+          f"{generator.dogs.total} Hunde, {generator.transactions.total} Transaktionen, "
+          f"{generator.achievements.total} Achievements. Passwort aller Nutzer: {PASSWORD}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"),
+                        help="Postgres-DB (Standard: DATABASE_URL)")
+    parser.add_argument("--tenants", type=int, default=1, help="Anzahl Mandanten")
+    parser.add_argument("--users", type=int, default=1000, help="Kunden insgesamt (bis 100000)")
+    parser.add_argument("--staff-per-tenant", type=int, default=5, help="Mitarbeiter je Mandant (zusätzlich ein Admin)")
+    parser.add_argument("--transactions", type=int, default=50000, help="Transaktionen insgesamt (bis 10000000)")
+    parser.add_argument("--months", type=int, default=24, help="Zeitraum der Buchungen in Monaten bis heute")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Kunden pro COPY-Block und Commit")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url fehlt")
+    if args.database_url.startswith("sqlite"):
+        parser.error("SQLite wird nicht unterstützt (COPY, partitionierte transactions); bitte eine Postgres-DB angeben")
+    if args.tenants < 1 or args.users < 0 or args.transactions < 0 or args.chunk_size < 1 or args.staff_per_tenant < 1:
+        parser.error("ungültige Größen")
+    run(args)
@@ -6,10 +6,15 @@ import os
 sys.path.append(os.getcwd())
 
 from app.config import settings
+from app import models, rules, partitions
 
 engine = create_engine(settings.DATABASE_URL)
 
 def migrate():
+    # 0. Fehlende Tabellen anlegen (früher beim Import von main.py)
+    models.Base.metadata.create_all(bind=engine)
+    print("Ensured all tables exist.")
+
     with engine.connect() as conn:
         print("Checking for missing columns...")
         
@@ -40,6 +45,256 @@ def migrate():
         except Exception as e:
             print(f"Error ensuring tenants table: {e}")
 
+        # 4. Indizes für das Dashboard (/api/dashboard): ersetzt durch die Mandanten-Indizes in Schritt 12
+
+        # 5. Änderungsverfolgung für /api/sync
+        try:
+            for table in ["users", "dogs", "transactions", "achievements", "documents"]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT now()"))
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS tombstones (
+                    id SERIAL PRIMARY KEY,
+                    table_name VARCHAR(50) NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    user_id INTEGER,
+                    deleted_at TIMESTAMP NOT NULL DEFAULT now()
+                )
+            """))
+            print("Ensured sync columns and tombstones table.")
+        except Exception as e:
+            print(f"Error adding sync columns: {e}")
+
+        # 6. Datenversion pro Mandant (ETag-Validator)
+        try:
+            conn.execute(text("ALTER TABLE tenants ADD COLUMN IF NOT EXISTS data_version INTEGER NOT NULL DEFAULT 1"))
+            print("Ensured tenants.data_version.")
+        except Exception as e:
+            print(f"Error adding tenants.data_version: {e}")
+
+        # 7. Idempotency-Keys für wiederholte POST-Requests
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER NOT NULL DEFAULT 0,
+                    key VARCHAR(255) NOT NULL,
+                    request_hash VARCHAR(64) NOT NULL,
+                    status_code INTEGER,
+                    response_body TEXT,
+                    created_at TIMESTAMP NOT NULL DEFAULT now(),
+                    expires_at TIMESTAMP NOT NULL,
+                    CONSTRAINT uq_idempotency_keys_user_id_key UNIQUE (user_id, key)
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)"))
+            print("Ensured idempotency_keys table.")
+        except Exception as e:
+            print(f"Error creating idempotency_keys table: {e}")
+
+        # 8. Größe und Prüfsumme hochgeladener Dokumente
+        try:
+            conn.execute(text("ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_size INTEGER"))
+            conn.execute(text("ALTER TABLE documents ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)"))
+            print("Ensured documents.file_size and documents.checksum.")
+        except Exception as e:
+            print(f"Error adding document columns: {e}")
+
+        # 9. Outbox für die Synchronisation mit Supabase Auth
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS auth_outbox (
+                    id SERIAL PRIMARY KEY,
+                    operation VARCHAR(20) NOT NULL,
+                    user_id INTEGER,
+                    email VARCHAR(255) NOT NULL,
+                    payload TEXT,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),
+                    created_at TIMESTAMP DEFAULT now(),
+                    processed_at TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_auth_outbox_status_next_attempt_at ON auth_outbox (status, next_attempt_at)"))
+            print("Ensured auth_outbox table.")
+        except Exception as e:
+            print(f"Error creating auth_outbox table: {e}")
+
+        # 10. Level-Anforderungen pro Mandant (rules.py); bestehende Mandanten erhalten die Standardregeln
+        try:
+            conn.execute(text("ALTER TABLE tenants ADD COLUMN IF NOT EXISTS rules_version INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS level_requirements (
+                    id SERIAL PRIMARY KEY,
+                    tenant_id INTEGER NOT NULL,
+                    level_id INTEGER NOT NULL,
+                    requirement_id VARCHAR(100) NOT NULL,
+                    name VARCHAR(255) NOT NULL,
+                    required INTEGER NOT NULL DEFAULT 1,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    consumed_on_level_up BOOLEAN NOT NULL DEFAULT TRUE,
+                    CONSTRAINT uq_level_requirements_tenant_level_requirement UNIQUE (tenant_id, level_id, requirement_id)
+                )
+            """))
+            tenant_ids = conn.execute(text(
+                "SELECT id FROM tenants WHERE NOT EXISTS (SELECT 1 FROM level_requirements r WHERE r.tenant_id = tenants.id)"
+            )).scalars().all()
+            rows = [
+                {"tenant_id": tenant_id, "level_id": level_id, "requirement_id": req["id"], "name": req["name"],
+                 "required": req["required"], "position": position,
+                 "consumed_on_level_up": req.get("consumed_on_level_up", True)}
+                for tenant_id in tenant_ids
+                for level_id, reqs in rules.DEFAULT_LEVEL_RULES.items()
+                for position, req in enumerate(reqs)
+            ]
+            if rows:
+                conn.execute(text("""
+                    INSERT INTO level_requirements (tenant_id, level_id, requirement_id, name, required, position, consumed_on_level_up)
+                    VALUES (:tenant_id, :level_id, :requirement_id, :name, :required, :position, :consumed_on_level_up)
+                """), rows)
+            print(f"Ensured level_requirements table (default rules for {len(tenant_ids)} tenants).")
+        except Exception as e:
+            print(f"Error creating level_requirements table: {e}")
+
+        # 11. Bonuspläne pro Mandant (bonus.py) und gebuchter Bonus je Transaktion
+        try:
+            conn.execute(text("ALTER TABLE tenants ADD COLUMN IF NOT EXISTS bonus_version INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS bonus_schedules (
+                    id SERIAL PRIMARY KEY,
+                    tenant_id INTEGER NOT NULL,
+                    name VARCHAR(255) NOT NULL,
+                    valid_from TIMESTAMP,
+                    valid_until TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT now()
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bonus_schedules_tenant_id_valid_from ON bonus_schedules (tenant_id, valid_from)"))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS bonus_tiers (
+                    id SERIAL PRIMARY KEY,
+                    schedule_id INTEGER NOT NULL REFERENCES bonus_schedules(id) ON DELETE CASCADE,
+                    min_amount FLOAT NOT NULL,
+                    bonus FLOAT NOT NULL,
+                    CONSTRAINT uq_bonus_tiers_schedule_id_min_amount UNIQUE (schedule_id, min_amount)
+                )
+            """))
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS bonus FLOAT"))
+            # Bestehende Aufladungen: Bonus aus dem Gesamtbetrag nach dem bisherigen festen Plan ableiten
+            conn.execute(text("""
+                UPDATE transactions SET bonus = CASE
+                    WHEN type = 'Aufladung' AND amount >= 450 THEN 150
+                    WHEN type = 'Aufladung' AND amount >= 180 THEN 30
+                    WHEN type = 'Aufladung' AND amount >= 115 THEN 15
+                    WHEN type = 'Aufladung' AND amount >= 55 THEN 5
+                    ELSE 0 END
+                WHERE bonus IS NULL
+            """))
+            conn.execute(text("ALTER TABLE transactions ALTER COLUMN bonus SET DEFAULT 0"))
+            conn.execute(text("ALTER TABLE transactions ALTER COLUMN bonus SET NOT NULL"))
+            print("Ensured bonus_schedules, bonus_tiers and transactions.bonus.")
+        except Exception as e:
+            print(f"Error creating bonus tables: {e}")
+
+        # 12. Mandantentrennung: tenant_id auf allen Mandanten-Tabellen, Indizes mit tenant_id vorne
+        try:
+            conn.execute(text("ALTER TABLE tenants ADD COLUMN IF NOT EXISTS domain VARCHAR(255)"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS tenants_domain_key ON tenants (domain)"))
+            # Abhängige Tabellen übernehmen den Mandanten ihres Users
+            for table, owner_column in [("dogs", "owner_id"), ("transactions", "user_id"), ("achievements", "user_id"), ("tombstones", "user_id")]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS tenant_id INTEGER"))
+                conn.execute(text(f"""
+                    UPDATE {table} t SET tenant_id = u.tenant_id
+                    FROM users u WHERE u.id = t.{owner_column} AND t.tenant_id IS NULL
+                """))
+                conn.execute(text(f"UPDATE {table} SET tenant_id = 1 WHERE tenant_id IS NULL"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN tenant_id SET DEFAULT 1"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN tenant_id SET NOT NULL"))
+            indexes = {
+                "ix_users_tenant_id_role_name": "users (tenant_id, role, name)",
+                "ix_dogs_tenant_id_owner_id": "dogs (tenant_id, owner_id)",
+                "ix_transactions_tenant_id_date": "transactions (tenant_id, date)",
+                "ix_transactions_tenant_id_user_id_date": "transactions (tenant_id, user_id, date)",
+                "ix_transactions_tenant_id_booked_by_id_date": "transactions (tenant_id, booked_by_id, date)",
+                "ix_achievements_tenant_id_user_id_is_consumed": "achievements (tenant_id, user_id, is_consumed)",
+                "ix_documents_tenant_id_user_id": "documents (tenant_id, user_id)",
+                "ix_tombstones_tenant_id_deleted_at": "tombstones (tenant_id, deleted_at)",
+                "ix_tombstones_tenant_id_user_id": "tombstones (tenant_id, user_id)",
+            }
+            for table in ["users", "dogs", "transactions", "achievements", "documents"]:
+                indexes[f"ix_{table}_tenant_id_updated_at"] = f"{table} (tenant_id, updated_at)"
+            for name, definition in indexes.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
+            # Durch die Indizes oben abgedeckt
+            for name in ["ix_users_role", "ix_transactions_date", "ix_transactions_user_id_date", "ix_transactions_booked_by_id_date",
+                         "ix_users_updated_at", "ix_dogs_updated_at", "ix_transactions_updated_at", "ix_achievements_updated_at",
+                         "ix_documents_updated_at", "ix_tombstones_user_id", "ix_tombstones_deleted_at"]:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            print("Ensured tenant_id columns and tenant-leading indexes.")
+        except Exception as e:
+            print(f"Error adding tenant scoping: {e}")
+
+        # 13. transactions monatlich nach date partitionieren (partitions.py)
+        try:
+            if not partitions.is_partitioned(conn):
+                legacy = "transactions_unpartitioned"
+                # Fremdschlüssel auf eine partitionierte Tabelle müssten date enthalten
+                conn.execute(text("ALTER TABLE achievements DROP CONSTRAINT IF EXISTS achievements_transaction_id_fkey"))
+                conn.execute(text(f"ALTER TABLE transactions RENAME TO {legacy}"))
+                conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT transactions_pkey TO {legacy}_pkey"))
+                conn.execute(text(f"ALTER SEQUENCE transactions_id_seq RENAME TO {legacy}_id_seq"))
+                # Indexnamen für die neue Tabelle freigeben
+                for (name,) in conn.execute(text(
+                    "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname <> :pkey"
+                ), {"table": legacy, "pkey": f"{legacy}_pkey"}).all():
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                models.Transaction.__table__.create(conn)  # inkl. Default-Partition
+                conn.execute(text(f"UPDATE {legacy} SET date = updated_at WHERE date IS NULL"))
+                first_month = conn.execute(text(f"SELECT min(date) FROM {legacy}")).scalar()
+                partitions.ensure_partitions(conn, first_month=first_month)
+                columns = ", ".join(column.name for column in models.Transaction.__table__.columns)
+                copied = conn.execute(text(f"INSERT INTO transactions ({columns}) SELECT {columns} FROM {legacy}")).rowcount
+                expected = conn.execute(text(f"SELECT count(*) FROM {legacy}")).scalar()
+                if copied != expected:
+                    raise RuntimeError(f"{copied} von {expected} Transaktionen kopiert")
+                conn.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('transactions', 'id'), coalesce(max(id), 0) + 1, false) FROM transactions"
+                ))
+                conn.execute(text(f"DROP TABLE {legacy}"))
+                print(f"Partitioned transactions by month ({copied} rows copied).")
+            created = partitions.ensure_partitions(conn)
+            print(f"Ensured transaction partitions ({len(created)} created).")
+        except Exception as e:
+            print(f"Error partitioning transactions: {e}")
+
+        # 14. Gemeinsame Zähler der Login-Drossel (throttle.py)
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS login_throttle (
+                    key VARCHAR(255) PRIMARY KEY,
+                    tokens FLOAT NOT NULL,
+                    refilled_at TIMESTAMP NOT NULL,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    last_failure_at TIMESTAMP,
+                    blocked_until TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_login_throttle_refilled_at ON login_throttle (refilled_at)"))
+            print("Ensured login_throttle table.")
+        except Exception as e:
+            print(f"Error creating login_throttle table: {e}")
+
+        # 15. Sync-Zeitstempel mit clock_timestamp() statt now() (crud.get_changes)
+        try:
+            for table in ["users", "dogs", "transactions", "achievements", "documents"]:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT clock_timestamp()"))
+            conn.execute(text("ALTER TABLE tombstones ALTER COLUMN deleted_at SET DEFAULT clock_timestamp()"))
+            print("Set sync timestamp defaults to clock_timestamp().")
+        except Exception as e:
+            print(f"Error updating sync timestamp defaults: {e}")
+
         conn.commit()
         print("Migration complete.")
 
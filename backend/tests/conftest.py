@@ -0,0 +1,81 @@
+"""
+Gemeinsame Fixtures. Tests mit DB brauchen eine lokale Postgres-DB in DATABASE_URL
+(transactions ist partitioniert, Zeilensperren wie in Produktion); ohne werden sie übersprungen.
+
+Aufruf aus dem Projekt-Root:
+    DATABASE_URL=postgresql+psycopg2://... SECRET_KEY=test python -m pytest -q backend/tests
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+
+requires_postgres = pytest.mark.skipif(
+    not os.environ["DATABASE_URL"].startswith("postgresql"), reason="braucht eine Postgres-DB in DATABASE_URL"
+)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from backend.app import models, partitions
+    from backend.app.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        partitions.ensure_partitions(conn)
+        # auth.py legt den Standard-Mandanten mit fester ID an; Sequenz nachziehen
+        conn.execute(text("SELECT setval(pg_get_serial_sequence('tenants', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM tenants), false)"))
+    return engine
+
+
+def _make_tenant() -> dict:
+    from backend.app import models
+    from backend.app.database import SessionLocal
+
+    run_id = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        tenant = models.Tenant(name=f"Test {run_id}", domain=f"test-{run_id}.localhost")
+        db.add(tenant)
+        db.flush()
+        staff = models.User(tenant_id=tenant.id, email=f"staff-{run_id}@test.localhost", name="Mitarbeiter",
+                            role="mitarbeiter", hashed_password="x")
+        customer = models.User(tenant_id=tenant.id, email=f"kunde-{run_id}@test.localhost", name="Kunde",
+                               role="kunde", hashed_password="x", balance=0.0)
+        db.add_all([staff, customer])
+        db.commit()
+        return {"tenant_id": tenant.id, "domain": tenant.domain, "staff_id": staff.id, "customer_id": customer.id,
+                "staff_email": staff.email, "customer_email": customer.email}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def tenant(engine):
+    """Eigener Mandant mit einem Mitarbeiter und einem Kunden; IDs und E-Mails als dict."""
+    return _make_tenant()
+
+
+@pytest.fixture
+def other_tenant(engine):
+    """Zweiter, fremder Mandant für Tests der Mandantentrennung."""
+    return _make_tenant()
+
+
+@pytest.fixture
+def client(engine):
+    from fastapi.testclient import TestClient
+    from backend.app import main
+    return TestClient(main.app)
+
+
+def auth_headers(email: str) -> dict:
+    from jose import jwt
+    from backend.app.config import settings
+    return {"Authorization": "Bearer " + jwt.encode({"email": email}, settings.SECRET_KEY, algorithm="HS256")}
@@ -0,0 +1,95 @@
+import uuid
+
+from conftest import auth_headers, requires_postgres
+
+
+def _balance(tenant):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    tenancy.set_tenant(db, tenant["tenant_id"])
+    try:
+        return crud.get_user(db, tenant["customer_id"]).balance
+    finally:
+        db.close()
+
+
+def _topup(tenant, amount, **extra):
+    return {"method": "POST", "path": "/api/transactions",
+            "body": {"user_id": tenant["customer_id"], "type": "Aufladung", "amount": amount}, **extra}
+
+
+@requires_postgres
+def test_replayed_batch_with_idempotency_keys_books_once(client, tenant):
+    headers = auth_headers(tenant["staff_email"])
+    batch = {"operations": [_topup(tenant, 20, id="1", idempotency_key=uuid.uuid4().hex)]}
+
+    first = client.post("/api/batch", json=batch, headers=headers).json()
+    # Antwort ging verloren, der Service Worker sendet die Warteschlange erneut
+    second = client.post("/api/batch", json=batch, headers=headers).json()
+
+    assert first["results"][0]["status"] == second["results"][0]["status"] == 200
+    assert first["results"][0]["body"] == second["results"][0]["body"]
+    assert _balance(tenant) == 20.0
+
+
+def _recorded_events(monkeypatch, tenant):
+    """Zeichnet veröffentlichte Ereignisse samt dem zu diesem Zeitpunkt committeten Guthaben auf."""
+    from backend.app import events
+
+    published = []
+    monkeypatch.setattr(events.broadcaster, "publish",
+                        lambda tenant_id, payload: published.append((payload["type"], _balance(tenant))))
+    return published
+
+
+@requires_postgres
+def test_failed_operation_only_rolls_back_its_savepoint(client, tenant, monkeypatch):
+    published = _recorded_events(monkeypatch, tenant)
+    response = client.post("/api/batch", headers=auth_headers(tenant["staff_email"]), json={"operations": [
+        _topup(tenant, 10, id="1"),
+        {"id": "2", "method": "POST", "path": "/api/transactions",
+         "body": {"user_id": 999999999, "type": "Aufladung", "amount": 99}},
+        _topup(tenant, 5, id="3"),
+    ]}).json()
+
+    assert response["committed"] is True
+    assert [(r["id"], r["status"]) for r in response["results"]] == [("1", 200), ("2", 404), ("3", 200)]
+    assert _balance(tenant) == 15.0
+    # Ereignisse erst nach dem Commit des ganzen Batches, nur für erfolgreiche Operationen
+    assert published == [("transaction.created", 15.0), ("transaction.created", 15.0)]
+
+
+@requires_postgres
+def test_atomic_batch_discards_everything_on_failure(client, tenant, monkeypatch):
+    published = _recorded_events(monkeypatch, tenant)
+    response = client.post("/api/batch", headers=auth_headers(tenant["staff_email"]), json={"atomic": True, "operations": [
+        _topup(tenant, 10, id="1"),
+        {"id": "2", "method": "PUT", "path": f"/api/users/{tenant['customer_id']}/level", "body": {"level_id": "kein Level"}},
+        _topup(tenant, 5, id="3"),
+    ]}).json()
+
+    assert response["committed"] is False
+    # Nach dem ersten Fehler bricht ein atomarer Batch ab
+    assert [(r["id"], r["status"]) for r in response["results"]] == [("1", 200), ("2", 422)]
+    assert _balance(tenant) == 0.0
+    assert published == []
+
+
+@requires_postgres
+def test_unexpected_error_is_not_leaked_to_the_client(client, tenant, monkeypatch):
+    from backend.app import crud
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("relation \"geheim\" does not exist")
+
+    monkeypatch.setattr(crud, "update_user_level", broken)
+    response = client.post("/api/batch", headers=auth_headers(tenant["staff_email"]), json={"operations": [
+        {"id": "1", "method": "PUT", "path": f"/api/users/{tenant['customer_id']}/level", "body": {"level_id": 2}},
+        _topup(tenant, 10, id="2"),
+    ]}).json()
+
+    assert [r["status"] for r in response["results"]] == [500, 200]
+    assert response["results"][0]["body"] == {"detail": "Internal Server Error"}
+    assert _balance(tenant) == 10.0
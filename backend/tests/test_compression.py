@@ -0,0 +1,35 @@
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend.app.compression import CompressionMiddleware
+
+LARGE = "x" * 4096
+
+
+def _client():
+    routes = [
+        Route("/large", lambda request: PlainTextResponse(LARGE)),
+        Route("/small", lambda request: PlainTextResponse("ok")),
+        Route("/image", lambda request: Response(b"\x89PNG" + b"0" * 4096, media_type="image/png")),
+        Route("/not-modified", lambda request: Response(status_code=304)),
+    ]
+    app = Starlette(routes=routes)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_vary_is_sent_for_every_compressible_representation():
+    client = _client()
+    for path in ["/large", "/small", "/not-modified"]:
+        for accept_encoding in ["gzip", "identity"]:
+            response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+            assert "Accept-Encoding" in response.headers.get("vary", ""), (path, accept_encoding)
+    assert client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_no_vary_for_uncompressible_content():
+    response = _client().get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "vary" not in response.headers
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,48 @@
+import threading
+
+from conftest import requires_postgres
+
+# Unter der Poolgröße (5 + 10 Overflow), da jeder Thread bis zur Barriere eine Verbindung hält
+BOOKINGS = 10
+AMOUNT = 10.0
+
+
+@requires_postgres
+def test_parallel_bookings_all_succeed_with_correct_balance(tenant):
+    from backend.app import crud, models, schemas, tenancy
+    from backend.app.database import SessionLocal
+
+    barrier = threading.Barrier(BOOKINGS)
+    errors = []
+
+    def book():
+        db = SessionLocal()
+        tenancy.set_tenant(db, tenant["tenant_id"])
+        try:
+            staff = crud.get_user(db, tenant["staff_id"])
+            barrier.wait(timeout=30)
+            crud.create_transaction(db, schemas.TransactionCreate(
+                user_id=tenant["customer_id"], type="Gruppenstunde", description="Test", amount=AMOUNT,
+            ), booked_by=staff)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=book) for _ in range(BOOKINGS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    db = SessionLocal()
+    tenancy.set_tenant(db, tenant["tenant_id"])
+    try:
+        customer = crud.get_user(db, tenant["customer_id"])
+        assert customer.balance == BOOKINGS * AMOUNT
+        balances = sorted(t.balance_after for t in db.query(models.Transaction).filter_by(user_id=customer.id))
+        # Jede Buchung sieht das Guthaben der vorherigen: lückenlose Kette statt verlorener Updates
+        assert balances == [AMOUNT * (i + 1) for i in range(BOOKINGS)]
+    finally:
+        db.close()
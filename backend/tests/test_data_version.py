@@ -0,0 +1,53 @@
+from sqlalchemy import text
+
+from conftest import requires_postgres
+
+
+def _data_version(db, tenant_id):
+    from backend.app import crud
+    return crud.get_data_version(db, tenant_id)
+
+
+@requires_postgres
+def test_tenant_row_is_only_locked_at_commit(tenant):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    writer = SessionLocal()
+    other = SessionLocal()
+    tenancy.set_tenant(writer, tenant["tenant_id"])
+    try:
+        before = _data_version(other, tenant["tenant_id"])
+        other.commit()
+
+        customer = crud.get_user_for_update(writer, tenant["customer_id"])
+        customer.name = "Geändert"
+        crud.touch_tenant(writer, tenant["tenant_id"])
+        writer.flush()
+
+        # Schreibzugriffe anderer Benutzer desselben Mandanten warten nicht auf diese Transaktion
+        other.execute(text("SELECT id FROM tenants WHERE id = :id FOR UPDATE NOWAIT"), {"id": tenant["tenant_id"]})
+        other.commit()
+
+        writer.commit()
+        assert _data_version(other, tenant["tenant_id"]) == before + 1
+    finally:
+        writer.close()
+        other.close()
+
+
+@requires_postgres
+def test_rolled_back_write_does_not_bump_data_version(tenant):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    tenancy.set_tenant(db, tenant["tenant_id"])
+    try:
+        before = _data_version(db, tenant["tenant_id"])
+        crud.touch_tenant(db, tenant["tenant_id"])
+        db.rollback()
+        db.commit()
+        assert _data_version(db, tenant["tenant_id"]) == before
+    finally:
+        db.close()
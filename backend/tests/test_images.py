@@ -0,0 +1,15 @@
+import io
+
+from PIL import Image
+
+
+def test_heic_upload_is_sniffed_and_converted(tmp_path):
+    from backend.app import images, uploads
+
+    path = tmp_path / "foto.heic"
+    Image.new("RGB", (640, 480), "red").save(path, format="HEIF")
+
+    assert uploads.sniff_content_type(path.read_bytes()[:64]) in uploads.IMAGE_TYPES
+    renditions = images.build_renditions(str(path), [320, 1024], quality=80)
+    assert [(r.width, r.height) for r in renditions] == [(640, 480), (320, 240)]
+    assert Image.open(io.BytesIO(renditions[0].data)).format == "WEBP"
@@ -0,0 +1,29 @@
+import pytest
+
+from backend.app import metrics
+from backend.app.config import settings
+
+
+@pytest.fixture
+def client():
+    # Ohne DB: /metrics braucht keine Session
+    from fastapi.testclient import TestClient
+    from backend.app import main
+    return TestClient(main.app)
+
+
+def test_metrics_are_not_served_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+
+@pytest.mark.skipif(metrics.prometheus_client is None, reason="prometheus_client nicht installiert")
+def test_metrics_require_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "geheim")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer falsch"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer geheim"})
+    assert response.status_code == 200
+    assert b"pfotencard_db_pool_checkout_wait_seconds" in response.content
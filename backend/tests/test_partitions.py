@@ -0,0 +1,28 @@
+from conftest import requires_postgres
+
+
+@requires_postgres
+def test_cron_route_requires_secret(client, monkeypatch):
+    from backend.app.config import settings
+
+    monkeypatch.setattr(settings, "CRON_SECRET", "")
+    assert client.get("/api/cron/partitions").status_code == 404
+    monkeypatch.setattr(settings, "CRON_SECRET", "cron-geheim")
+    assert client.get("/api/cron/partitions", headers={"Authorization": "Bearer falsch"}).status_code == 401
+
+
+@requires_postgres
+def test_cron_route_creates_upcoming_partitions(client, monkeypatch):
+    from backend.app import partitions
+    from backend.app.config import settings
+
+    monkeypatch.setattr(settings, "CRON_SECRET", "cron-geheim")
+    monkeypatch.setattr(settings, "TRANSACTION_PARTITION_MONTHS_AHEAD", settings.TRANSACTION_PARTITION_MONTHS_AHEAD + 1)
+    headers = {"Authorization": "Bearer cron-geheim"}
+    response = client.get("/api/cron/partitions", headers=headers)
+    assert response.status_code == 200
+    with partitions.engine.connect() as conn:
+        existing = {p.name for p in partitions.list_partitions(conn)}
+    assert set(response.json()["created"]) <= existing
+    # Ein zweiter Lauf hat nichts mehr zu tun
+    assert client.get("/api/cron/partitions", headers=headers).json() == {"created": []}
@@ -0,0 +1,61 @@
+"""
+Der schnelle Pfad (serialization.OrmSerializer) muss byte-genau dasselbe JSON liefern wie
+FastAPIs Standardweg über das response_model. Geprüft für jedes Schema mit schnellem Pfad.
+"""
+import uuid
+from datetime import date, datetime
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from backend.app import models, schemas, serialization
+from backend.benchmarks.serialization import build_orm_users
+
+pytestmark = pytest.mark.skipif(serialization.orjson is None, reason="schneller Pfad nur mit orjson")
+
+
+def _edge_case_users():
+    """Werte, die Pydantic beim Serialisieren umformt."""
+    auth_id = uuid.uuid4()
+    return [
+        # auth_id ist in der DB ein String; das Schema erwartet eine UUID
+        models.User(id=901, tenant_id=1, auth_id=str(auth_id).upper(), email="a@example.com", name="Groß",
+                    role="kunde", is_active=True, balance=0, level_id=1, is_vip=False, is_expert=False,
+                    customer_since=datetime(2024, 1, 1), hashed_password="x",
+                    dogs=[models.Dog(id=1, owner_id=901, name="Bello", birth_date=date(2020, 2, 29))]),
+        models.User(id=902, tenant_id=1, auth_id=auth_id.hex, email="b@example.com", name="Ohne Bindestriche",
+                    role="admin", is_active=True, balance=12, phone=None, level_id=3, is_vip=True, is_expert=True,
+                    customer_since=datetime(2024, 1, 1, 12, 30, 15, 123456), hashed_password="x"),
+    ]
+
+
+def _transactions():
+    return [
+        models.Transaction(id=1, user_id=1, date=datetime(2024, 3, 1, 9, 0), type="Aufladung", description=None,
+                           amount=100, balance_after=115, bonus=15, booked_by_id=2),
+        models.Transaction(id=2, user_id=1, date=datetime(2024, 3, 2, 9, 0, 0, 5), type="Gruppenstunde",
+                           description="Prüfung ✓", amount=-12.5, balance_after=102.5, bonus=0.0, booked_by_id=2),
+    ]
+
+
+CASES = [
+    ("user", serialization.USER_SERIALIZER, schemas.User, lambda: build_orm_users(20)[0]),
+    ("user-edge-cases", serialization.USER_SERIALIZER, schemas.User, lambda: _edge_case_users()[0]),
+    ("user-list", serialization.USER_LIST_SERIALIZER, List[schemas.User], lambda: build_orm_users(20) + _edge_case_users()),
+    ("transaction-list", serialization.TRANSACTION_LIST_SERIALIZER, List[schemas.Transaction], _transactions),
+]
+
+
+@pytest.mark.parametrize("serializer, schema, build", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_fast_path_matches_response_model(serializer, schema, build):
+    data = build()
+    adapter = TypeAdapter(schema)
+    expected = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    assert serializer.dump_json(data) == expected
+
+
+def test_every_fast_path_serializer_is_covered():
+    serializers = {name for name, value in vars(serialization).items() if isinstance(value, serialization.OrmSerializer)}
+    covered = {name for name, value in vars(serialization).items() if any(value is case[1] for case in CASES)}
+    assert serializers == covered
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from conftest import requires_postgres
+
+
+@requires_postgres
+def test_changes_of_long_running_transaction_are_not_missed(tenant, monkeypatch):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    # Nur der Cursor soll greifen, nicht die Reserve
+    monkeypatch.setattr(crud, "SYNC_CURSOR_OVERLAP", timedelta(0))
+
+    writer = SessionLocal()
+    reader = SessionLocal()
+    tenancy.set_tenant(writer, tenant["tenant_id"])
+    tenancy.set_tenant(reader, tenant["tenant_id"])
+    try:
+        customer = crud.get_user_for_update(writer, tenant["customer_id"])
+        customer.name = "Lange Transaktion"
+        writer.flush()  # updated_at steht, Commit folgt erst nach dem Abruf
+        time.sleep(0.1)
+
+        staff = crud.get_user(reader, tenant["staff_id"])
+        cursor = crud.get_changes(reader, staff)["cursor"]
+        reader.commit()
+        writer.commit()
+
+        changes = crud.get_changes(reader, staff, since=crud.datetime.fromisoformat(cursor))
+        assert tenant["customer_id"] in [u.id for u in changes["users"]]
+    finally:
+        writer.close()
+        reader.close()
+
+
+@requires_postgres
+def test_cursor_look_back_is_capped(tenant, monkeypatch):
+    from sqlalchemy import text
+    from backend.app import crud
+    from backend.app.config import settings
+    from backend.app.database import SessionLocal
+
+    monkeypatch.setattr(settings, "SYNC_CURSOR_MAX_LOOKBACK_SECONDS", 1)
+
+    stale = SessionLocal()
+    reader = SessionLocal()
+    try:
+        # Offene Transaktion, die älter als die Obergrenze wird ("idle in transaction")
+        stale_start = stale.execute(text("SELECT now()")).scalar()
+        time.sleep(1.5)
+        cursor = crud._sync_cursor(reader)
+        assert cursor > stale_start + timedelta(seconds=1)
+    finally:
+        stale.close()
+        reader.close()
@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import auth_headers, requires_postgres
+
+
+def _customer(tenant):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    tenancy.set_tenant(db, tenant["tenant_id"])
+    try:
+        customer = crud.get_user(db, tenant["customer_id"])
+        return customer.level_id, customer.balance
+    finally:
+        db.close()
+
+
+@requires_postgres
+def test_foreign_customer_is_not_found(client, tenant, other_tenant):
+    headers = auth_headers(tenant["staff_email"])
+    foreign = other_tenant["customer_id"]
+    assert client.get(f"/api/users/{foreign}", headers=headers).status_code == 404
+    assert client.put(f"/api/users/{foreign}/level", json={"level_id": 3}, headers=headers).status_code == 404
+    assert client.post("/api/transactions", json={"user_id": foreign, "type": "Aufladung", "amount": 50},
+                       headers=headers).status_code == 404
+    assert _customer(other_tenant) == (1, 0.0)
+
+
+@requires_postgres
+def test_batch_operations_are_scoped_to_the_callers_tenant(client, tenant, other_tenant):
+    foreign = other_tenant["customer_id"]
+    response = client.post("/api/batch", headers=auth_headers(tenant["staff_email"]), json={"operations": [
+        {"id": "level", "method": "PUT", "path": f"/api/users/{foreign}/level", "body": {"level_id": 3}},
+        {"id": "topup", "method": "POST", "path": "/api/transactions",
+         "body": {"user_id": foreign, "type": "Aufladung", "amount": 50}},
+    ]})
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == [404, 404]
+    assert _customer(other_tenant) == (1, 0.0)
+
+
+@requires_postgres
+def test_session_without_tenant_fails_closed(engine, tenant):
+    from backend.app import crud, tenancy
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with pytest.raises(tenancy.MissingTenant):
+            crud.get_user(db, tenant["customer_id"])
+        db.rollback()
+        tenancy.all_tenants(db)  # Worker/Skripte erklären das ausdrücklich
+        assert crud.get_user(db, tenant["customer_id"]).id == tenant["customer_id"]
+    finally:
+        db.close()
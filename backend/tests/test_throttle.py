@@ -0,0 +1,90 @@
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+from backend.app import throttle
+from backend.app.config import settings
+from conftest import requires_postgres
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    throttle.reset()
+    monkeypatch.setattr(settings, "LOGIN_THROTTLE_SHARED", False)
+    yield
+    throttle.reset()
+
+
+def _request(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/api/login", "headers": headers, "client": (peer, 40000)})
+
+
+def _keys():
+    return throttle.keys_for(_request(f"10.{uuid.uuid4().int % 250}.0.1"), f"{uuid.uuid4().hex}@test.localhost")
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "")
+    assert throttle.client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_forwarded_for_is_used_behind_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "10.0.0.0/8")
+    # Der Client hat 1.2.3.4 selbst eingetragen; der Proxy hat 198.51.100.1 angehängt
+    assert throttle.client_ip(_request("10.0.0.2", "1.2.3.4, 198.51.100.1")) == "198.51.100.1"
+    assert throttle.client_ip(_request("10.0.0.2", "198.51.100.1, 10.0.0.3")) == "198.51.100.1"
+    # Nicht vom Proxy: Header wird ignoriert
+    assert throttle.client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_platform_proxy_header_is_trusted_with_wildcard(monkeypatch):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "*")
+    assert throttle.client_ip(_request("10.0.0.2", "198.51.100.1")) == "198.51.100.1"
+
+
+def test_bucket_allows_burst_then_throttles(monkeypatch):
+    monkeypatch.setattr(settings, "LOGIN_ACCOUNT_BURST", 3)
+    monkeypatch.setattr(settings, "LOGIN_ACCOUNT_PER_SECOND", 0.01)
+    keys = _keys()
+    assert [throttle.acquire(None, keys) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert throttle.acquire(None, keys) > 0
+    with pytest.raises(throttle.HTTPException) as error:
+        throttle.check(None, keys)
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+
+
+def test_failures_back_off_exponentially_and_success_resets(monkeypatch):
+    monkeypatch.setattr(settings, "LOGIN_ACCOUNT_BACKOFF_AFTER", 2)
+    monkeypatch.setattr(settings, "LOGIN_BACKOFF_BASE_SECONDS", 10.0)
+    keys = _keys()
+    throttle.record_failure(None, keys)
+    assert throttle.retry_after(keys) == 0
+    throttle.record_failure(None, keys)
+    first = throttle.retry_after(keys)
+    assert 9 < first <= 10
+    throttle.record_failure(None, keys)
+    assert 19 < throttle.retry_after(keys) <= 20
+
+    throttle.record_success(None, keys)
+    assert throttle.retry_after([k for k in keys if k[0] == "account"]) == 0
+
+
+@requires_postgres
+def test_shared_counters_are_seen_by_other_workers(engine, monkeypatch):
+    from backend.app.database import SessionLocal
+
+    monkeypatch.setattr(settings, "LOGIN_THROTTLE_SHARED", True)
+    monkeypatch.setattr(settings, "LOGIN_ACCOUNT_BURST", 2)
+    monkeypatch.setattr(settings, "LOGIN_ACCOUNT_PER_SECOND", 0.01)
+    keys = _keys()
+    db = SessionLocal()
+    try:
+        assert throttle.acquire(db, keys) == 0
+        assert throttle.acquire(db, keys) == 0
+        throttle.reset()  # anderer Worker: leerer Prozess-Zustand, nur die DB weiß Bescheid
+        assert throttle.acquire(db, keys) > 0
+    finally:
+        db.close()
@@ -0,0 +1,58 @@
+import uuid
+
+from conftest import auth_headers, requires_postgres
+
+
+def _new_user(role="kunde"):
+    return {"email": f"neu-{uuid.uuid4().hex[:8]}@test.localhost", "name": "Neu", "role": role}
+
+
+@requires_postgres
+def test_create_user_requires_staff(client, tenant):
+    assert client.post("/api/users", json=_new_user()).status_code == 401
+    assert client.post("/api/users", json=_new_user(), headers=auth_headers(tenant["customer_email"])).status_code == 403
+    assert client.post("/api/users", json=_new_user("admin"), headers=auth_headers(tenant["staff_email"])).status_code == 403
+
+
+@requires_postgres
+def test_created_user_belongs_to_callers_tenant(client, tenant):
+    from backend.app import models
+    from backend.app.database import SessionLocal
+
+    headers = {**auth_headers(tenant["staff_email"]), "Idempotency-Key": uuid.uuid4().hex}
+    payload = _new_user()
+    first = client.post("/api/users", json=payload, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["tenant_id"] == tenant["tenant_id"]
+
+    replay = client.post("/api/users", json=payload, headers=headers)
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    assert replay.json()["id"] == first.json()["id"]
+
+    db = SessionLocal()
+    try:
+        record = db.query(models.IdempotencyKey).filter_by(key=headers["Idempotency-Key"]).one()
+        assert record.user_id == tenant["staff_id"]
+    finally:
+        db.close()
+
+
+@requires_postgres
+def test_register_idempotency_keys_are_scoped_per_email(client, tenant):
+    key = uuid.uuid4().hex
+    headers = {"Host": tenant["domain"], "Idempotency-Key": key}
+    first_payload, second_payload = _new_user(), _new_user()
+
+    first = client.post("/api/register", json=first_payload, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["tenant_id"] == tenant["tenant_id"]
+
+    # Derselbe Schlüssel für eine andere E-Mail liefert weder die fremde Antwort noch einen Konflikt
+    second = client.post("/api/register", json=second_payload, headers=headers)
+    assert second.status_code == 200
+    assert second.json()["email"] == second_payload["email"]
+    assert "Idempotent-Replayed" not in second.headers
+
+    replay = client.post("/api/register", json=first_payload, headers=headers)
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    assert replay.json()["id"] == first.json()["id"]
@@ -13,6 +13,8 @@ interface PfotencardDB extends DBSchema {
       method: string;
       body: any;
       timestamp: number;
+      // Stabil über alle Sync-Versuche: der Server bucht dieselbe Operation nur einmal
+      idempotencyKey: string;
     };
   };
 }
@@ -23,9 +25,9 @@ const dbPromise = openDB<PfotencardDB>(DB_NAME, VERSION, {
   },
 });
 
-export async function addQueuedRequest(request: Omit<PfotencardDB[typeof STORE_NAME]['value'], 'timestamp'>) {
+export async function addQueuedRequest(request: Omit<PfotencardDB[typeof STORE_NAME]['value'], 'timestamp' | 'idempotencyKey'>) {
   const db = await dbPromise;
-  await db.add(STORE_NAME, { ...request, timestamp: Date.now() });
+  await db.add(STORE_NAME, { ...request, timestamp: Date.now(), idempotencyKey: crypto.randomUUID() });
 }
 
 export async function getAllQueuedRequests() {
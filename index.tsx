@@ -103,11 +103,11 @@ const apiClient = {
     },
     setVipStatus: async (userId: string, isVip: boolean, token: string | null) => {
         if (!token) throw new Error("No auth token provided");
-        return apiClient.put(`/api/users/${userId}/vip`, { is_vip: isVip }, token);
+        return apiClient.put(`/api/users/${userId}/vip?include_aggregate=true`, { is_vip: isVip }, token);
     },
     setExpertStatus: async (userId: string, isExpert: boolean, token: string | null) => {
         if (!token) throw new Error("No auth token provided");
-        return apiClient.put(`/api/users/${userId}/expert`, { is_expert: isExpert }, token);
+        return apiClient.put(`/api/users/${userId}/expert?include_aggregate=true`, { is_expert: isExpert }, token);
     },
     delete: async (path: string, token: string | null) => {
         if (!token) throw new Error("No auth token provided");
@@ -197,7 +197,8 @@ let TRANSACTIONS: Transaction[] = [
 ];
 
 // --- LOGIK & KONSTANTEN ---
-const LEVEL_REQUIREMENTS: { [key: number]: { id: string; name: string; required: number }[] } = {
+// Standardwerte; werden nach dem Login durch die Regeln des Mandanten ersetzt (GET /api/levels/requirements)
+let LEVEL_REQUIREMENTS: { [key: number]: { id: string; name: string; required: number }[] } = {
     //   1: [{ id: 'group_class', name: 'Gruppenstunde', required: 6 }, { id: 'exam', name: 'Prüfung', required: 1 }],
     2: [{ id: 'group_class', name: 'Gruppenstunde', required: 6 }, { id: 'exam', name: 'Prüfung', required: 1 }],
     3: [{ id: 'group_class', name: 'Gruppenstunde', required: 6 }, { id: 'exam', name: 'Prüfung', required: 1 }],
@@ -206,7 +207,7 @@ const LEVEL_REQUIREMENTS: { [key: number]: { id: string; name: string; required:
 };
 // In frontend/index.tsx
 
-const DOGLICENSE_PREREQS = [
+let DOGLICENSE_PREREQS = [
     { id: 'lecture_bonding', name: 'Vortrag Bindung & Beziehung', required: 1 },
     { id: 'lecture_hunting', name: 'Vortrag Jagdverhalten', required: 1 },
     { id: 'ws_communication', name: 'WS Kommunikation & Körpersprache', required: 1 },
@@ -215,6 +216,20 @@ const DOGLICENSE_PREREQS = [
     { id: 'first_aid', name: 'Erste-Hilfe-Kurs', required: 1 },
 ];
 
+// Übernimmt die Level-Regeln vom Backend: Anforderungen, die beim Aufstieg nicht verbraucht
+// werden, sind die Zusatzveranstaltungen (Hundeführerschein), der Rest die normalen Anforderungen.
+const applyLevelRules = (rules: { level_id: number; requirements: { id: string; name: string; required: number; consumed_on_level_up: boolean }[] }[]) => {
+    const levelRequirements: typeof LEVEL_REQUIREMENTS = {};
+    const prereqs: typeof DOGLICENSE_PREREQS = [];
+    rules.forEach(rule => {
+        const consumed = rule.requirements.filter(r => r.consumed_on_level_up);
+        if (consumed.length > 0) levelRequirements[rule.level_id] = consumed.map(({ id, name, required }) => ({ id, name, required }));
+        rule.requirements.filter(r => !r.consumed_on_level_up).forEach(({ id, name, required }) => prereqs.push({ id, name, required }));
+    });
+    LEVEL_REQUIREMENTS = levelRequirements;
+    DOGLICENSE_PREREQS = prereqs;
+};
+
 // In frontend/index.tsx (ersetzt die bisherigen Level-Funktionen)
 
 const getPrereqProgress = (customer: any, untilDate?: Date) => {
@@ -863,22 +878,23 @@ const DashboardPage: FC<{
     customers: any[],
     transactions: any[],
     currentUser: any,
+    authToken: string | null,
     onKpiClick: (type: string, color: string) => void,
     setView: (view: View) => void,
-}> = ({ customers, transactions, currentUser, onKpiClick, setView }) => {
-    const startOfMonth = new Date(new Date().getFullYear(), new Date().getMonth(), 1);
-    const activeCustomersThisMonth = useMemo(() => {
-        const activeIds = new Set(transactions.filter(t => new Date(t.date) >= startOfMonth).map(t => t.user_id));
-        return customers.filter(c => activeIds.has(c.id));
-    }, [customers, transactions, startOfMonth]);
+}> = ({ customers, transactions, currentUser, authToken, onKpiClick, setView }) => {
+    // Kennzahlen rechnet der Server (GET /api/dashboard), statt sie aus allen Kunden und Transaktionen
+    // im Browser zu bilden. Neu geladen wird, sobald sich die lokalen Daten ändern (Buchung, Sync, Ereignis).
+    const [dashboard, setDashboard] = useState<any | null>(null);
+    useEffect(() => {
+        if (!authToken) return;
+        let cancelled = false;
+        apiClient.get('/api/dashboard', authToken)
+            .then(data => { if (!cancelled) setDashboard(data); })
+            .catch(err => console.error("Fehler beim Laden des Dashboards:", err));
+        return () => { cancelled = true; };
+    }, [authToken, customers, transactions]);
 
-    // KORREKTUR: createdAt -> date
-    const recentTransactions = [...transactions].sort((a, b) => new Date(b.date).getTime() - new Date(a.date).getTime()).slice(0, 5);
-    const totalCredit = customers.reduce((sum, cust) => sum + cust.balance, 0);
-    const today = new Date().toDateString();
-    // KORREKTUR: createdAt -> date (hier war der Absturz)
-    const transactionsToday = transactions.filter(t => t.date && new Date(t.date).toDateString() === today).length;
-    const transactionsMonth = transactions.filter(t => t.date && new Date(t.date) >= startOfMonth).length;
+    const kpi = (value: number | undefined) => value === undefined ? '-' : value.toString();
 
     return (
         <>
@@ -887,33 +903,28 @@ const DashboardPage: FC<{
                 <p>Übersicht Ihrer Hundeschul-Wertkarten</p>
             </header>
             <div className="kpi-grid">
-                <KpiCard title="Kunden gesamt" value={customers.length.toString()} icon="customers" bgIcon="customers" color="green" onClick={() => onKpiClick('allCustomers', 'green')} />
-                <KpiCard title="Guthaben gesamt" value={`€ ${Math.floor(totalCredit).toLocaleString('de-DE')}`} icon="creditCard" bgIcon="creditCard" color="orange" onClick={() => onKpiClick('customersWithBalance', 'orange')} />
-                <KpiCard title="Transaktionen Heute" value={transactionsToday.toString()} icon="creditCard" bgIcon="creditCard" color="blue" onClick={() => onKpiClick('transactionsToday', 'blue')} />
-                <KpiCard title="Transaktionen Monat" value={transactionsMonth.toString()} icon="trendingUp" bgIcon="trendingUp" color="purple" onClick={() => onKpiClick('transactionsMonth', 'purple')} />
+                <KpiCard title="Kunden gesamt" value={kpi(dashboard?.customer_count)} icon="customers" bgIcon="customers" color="green" onClick={() => onKpiClick('allCustomers', 'green')} />
+                <KpiCard title="Guthaben gesamt" value={dashboard ? `€ ${Math.floor(dashboard.total_credit).toLocaleString('de-DE')}` : '-'} icon="creditCard" bgIcon="creditCard" color="orange" onClick={() => onKpiClick('customersWithBalance', 'orange')} />
+                <KpiCard title="Transaktionen Heute" value={kpi(dashboard?.transactions_today)} icon="creditCard" bgIcon="creditCard" color="blue" onClick={() => onKpiClick('transactionsToday', 'blue')} />
+                <KpiCard title="Transaktionen Monat" value={kpi(dashboard?.transactions_month)} icon="trendingUp" bgIcon="trendingUp" color="purple" onClick={() => onKpiClick('transactionsMonth', 'purple')} />
             </div>
             <div className="dashboard-bottom-grid">
                 <div className="content-box">
                     <h2>Aktuelle Kunden</h2>
                     <ul className="active-customer-list">
-                        {activeCustomersThisMonth.slice(0, 4).map(cust => {
-                            // NEU: Den Namen hier genauso aufteilen
+                        {(dashboard?.active_customers || []).map((cust: any) => {
                             const nameParts = cust.name.split(' ');
                             const firstName = nameParts[0] || '';
                             const lastName = nameParts.slice(1).join(' ');
 
-
                             return (
                                 <li key={cust.id} onClick={() => setView({ page: 'customers', subPage: 'detail', customerId: cust.id })} className="clickable">
-                                    {/* KORREKTUR: Die neuen Namensvariablen verwenden */}
                                     <div className={`initials-avatar ${getAvatarColorClass(firstName)}`}>
                                         {getInitials(firstName, lastName)}
                                     </div>
                                     <div className="info">
-                                        {/* KORREKTUR: Die neuen Namensvariablen verwenden */}
                                         <div className="customer-name">{firstName} {lastName}</div>
-                                        {/* KORREKTUR: Den ersten Hund aus der Liste anzeigen */}
-                                        <div className="dog-name">{cust.dogs[0]?.name || '-'}</div>
+                                        <div className="dog-name">{cust.dog_name || '-'}</div>
                                     </div>
                                     <div className="balance">{Math.floor(cust.balance).toLocaleString('de-DE')} €</div>
                                 </li>
@@ -924,20 +935,16 @@ const DashboardPage: FC<{
                 <div className="content-box">
                     <h2>Letzte Transaktionen</h2>
                     <ul className="transaction-list">
-                        {recentTransactions.map(tx => {
-                            const customer = customers.find(c => c.id === tx.user_id);
-                            return (
-                                <li key={tx.id}>
-                                    <div className={`icon ${tx.amount < 0 ? 'down' : 'up'}`}><Icon name="arrowDown" /></div>
-                                    <div className="info">
-                                        <div className="customer">{customer?.name}</div>
-                                        {/* KORREKTUR: createdAt -> date */}
-                                        <div className="details">{new Date(tx.date).toLocaleDateString('de-DE')} - {tx.description}</div>
-                                    </div>
-                                    <div className="amount">{Math.floor(tx.amount).toLocaleString('de-DE')} €</div>
-                                </li>
-                            );
-                        })}
+                        {(dashboard?.recent_transactions || []).map((tx: any) => (
+                            <li key={tx.id}>
+                                <div className={`icon ${tx.amount < 0 ? 'down' : 'up'}`}><Icon name="arrowDown" /></div>
+                                <div className="info">
+                                    <div className="customer">{tx.customer_name}</div>
+                                    <div className="details">{new Date(tx.date).toLocaleDateString('de-DE')} - {tx.description}</div>
+                                </div>
+                                <div className="amount">{Math.floor(tx.amount).toLocaleString('de-DE')} €</div>
+                            </li>
+                        ))}
                     </ul>
                 </div>
             </div>
@@ -1218,6 +1225,19 @@ const CustomerDetailPage: FC<{
         </div>
     );
     const customerDocuments = customer.documents || [];
+
+    // Signierte URLs aller Dokumente mit einem Request vorab laden
+    const [documentUrls, setDocumentUrls] = useState<Record<number, { url: string, expires_at: string }>>({});
+    useEffect(() => {
+        if (customerDocuments.length === 0) return;
+        apiClient.get(`/api/users/${customer.id}/documents/urls`, authToken)
+            .then((items: any[]) => {
+                const map: Record<number, { url: string, expires_at: string }> = {};
+                items.forEach(item => { map[item.id] = item; });
+                setDocumentUrls(map);
+            })
+            .catch(error => console.error("Fehler beim Laden der Dokument-URLs:", error));
+    }, [customer.id, customerDocuments.length, authToken]);
     // ==================================================================
     // === FINALES LAYOUT (JSX) ===
     // ==================================================================
@@ -1446,8 +1466,11 @@ const CustomerDetailPage: FC<{
                                         <Icon name="file" className="doc-icon" />
                                         <div className="doc-info" onClick={async () => {
                                             try {
-                                                const response = await apiClient.get(`/api/documents/${doc.id}`, authToken);
-                                                const actualUrl = response.url;
+                                                // Vorab geladene URL verwenden, solange sie noch gültig ist
+                                                const cached = documentUrls[doc.id];
+                                                const actualUrl = cached && new Date(cached.expires_at).getTime() - Date.now() > 30000
+                                                    ? cached.url
+                                                    : (await apiClient.get(`/api/documents/${doc.id}`, authToken)).url;
                                                 setViewingDocument({
                                                     name: doc.file_name,
                                                     type: doc.file_type,
@@ -1522,20 +1545,23 @@ const CustomerDetailPage: FC<{
 
 
 
-const TransactionManagementPage: FC<{ customer: Customer; setView: (view: View) => void, onConfirmTransaction: (tx: any) => void, currentUser: User }> = ({ customer, setView, onConfirmTransaction, currentUser }) => {
+const TransactionManagementPage: FC<{ customer: Customer; setView: (view: View) => void, onConfirmTransaction: (tx: any) => void, currentUser: User, authToken: string | null }> = ({ customer, setView, onConfirmTransaction, currentUser, authToken }) => {
     const [modalData, setModalData] = useState<(Omit<Transaction, 'id' | 'createdAt' | 'customerId' | 'createdBy'> & { baseAmount?: number, bonus?: number }) | null>(null);
 
     const [customTopup, setCustomTopup] = useState('');
     const [customDebitAmount, setCustomDebitAmount] = useState('');
     const [customDebitDesc, setCustomDebitDesc] = useState('');
 
-    const topups = [
-        { title: 'Aufladung 50€', amount: 50, bonus: 5 },
-        { title: 'Aufladung 100€', amount: 100, bonus: 15 },
-        { title: 'Aufladung 150€', amount: 150, bonus: 30 },
-        { title: 'Aufladung 300€', amount: 300, bonus: 150 },
-        // Die 500€ Stufe ist entfernt
-    ];
+    // Aufladen-Buttons aus dem aktuell gültigen Bonusplan des Mandanten (GET /api/bonus/schedules/active)
+    const [topups, setTopups] = useState<{ title: string, amount: number, bonus: number }[]>([]);
+    useEffect(() => {
+        if (!authToken) return;
+        apiClient.get('/api/bonus/schedules/active', authToken)
+            .then((schedule: { tiers: { min_amount: number, bonus: number }[] }) => setTopups(
+                schedule.tiers.map(t => ({ title: `Aufladung ${t.min_amount.toFixed(0)}€`, amount: t.min_amount, bonus: t.bonus }))
+            ))
+            .catch(error => console.error("Bonusstufen konnten nicht geladen werden:", error));
+    }, [authToken]);
 
 
     const debits = [
@@ -1562,18 +1588,19 @@ const TransactionManagementPage: FC<{ customer: Customer; setView: (view: View)
     };
 
     // NEU: Handler für individuelle Aufladung
-    const handleCustomTopup = () => {
+    const handleCustomTopup = async () => {
         const amount = parseFloat(customTopup);
         if (!amount || amount <= 0) {
             alert("Bitte geben Sie einen gültigen Betrag ein.");
             return;
         }
+        // Bonus berechnet das Backend (nur Vorschau, gebucht wird erst nach Bestätigung)
         let bonus = 0;
-        if (amount >= 300) { bonus = 150 }
-        else if (amount >= 150) { bonus = 30 }
-        else if (amount >= 100) { bonus = 15 }
-        else if (amount >= 50) { bonus = 5 }
-        // Für individuelle Beträge gibt es keinen Bonus
+        try {
+            bonus = (await apiClient.get(`/api/bonus/preview?amount=${amount}`, authToken)).bonus;
+        } catch (error) {
+            console.error("Bonus-Vorschau fehlgeschlagen:", error);
+        }
         setModalData({ title: `Individuelle Aufladung`, amount, type: 'topup', baseAmount: amount, bonus: bonus });
         setCustomTopup(''); // Feld zurücksetzen
     };
@@ -1843,22 +1870,8 @@ const BerichtePage: FC<{
         // Abbuchungen (negative Beträge) bleiben unverändert
         if (tx.amount <= 0) return tx.amount;
 
-        // Nur bei Aufladungen wurde potenziell ein Bonus gewährt
-        // Wir prüfen auf "Aufladung" (Backend-Name) oder "topup" (falls Mocks verwendet werden)
-        if (tx.type === 'Aufladung' || tx.type === 'topup') {
-            // Logik rückwärts gerechnet basierend auf crud.py:
-            // >= 300€ Einzahlung (+150 Bonus) = >= 450€ Gesamt
-            if (tx.amount >= 450) return tx.amount - 150;
-            // >= 150€ Einzahlung (+30 Bonus) = >= 180€ Gesamt
-            if (tx.amount >= 180) return tx.amount - 30;
-            // >= 100€ Einzahlung (+15 Bonus) = >= 115€ Gesamt
-            if (tx.amount >= 115) return tx.amount - 15;
-            // >= 50€ Einzahlung (+5 Bonus) = >= 55€ Gesamt
-            if (tx.amount >= 55) return tx.amount - 5;
-        }
-
-        // Keine Bonus-Stufe erreicht oder anderer Transaktionstyp -> Betrag ist der echte Umsatz
-        return tx.amount;
+        // Das Backend speichert den gewährten Bonus je Transaktion (ohne Bonus: 0)
+        return tx.amount - (tx.bonus || 0);
     };
 
     const availablePeriods = useMemo(() => {
@@ -2403,6 +2416,68 @@ const BenutzerPage: FC<{
 
 
 
+// --- DELTA-SYNC (GET /api/sync) ---
+// /api/sync liefert nur die seit dem letzten Cursor geänderten Zeilen, flach nach Tabelle.
+// Der Client hält sie nach ID und setzt daraus Benutzer mit Hunden, Leistungen und Dokumenten
+// zusammen, so wie /api/users sie liefert.
+type SyncTable = 'users' | 'dogs' | 'transactions' | 'achievements' | 'documents';
+const SYNC_TABLES: SyncTable[] = ['users', 'dogs', 'transactions', 'achievements', 'documents'];
+type SyncStore = { cursor: string | null } & Record<SyncTable, Map<number, any>>;
+
+// Ereignistypen von GET /api/events (events.emit in crud.py), nach denen das Delta geholt wird;
+// "resync" kommt, wenn der Puffer des Servers für diesen Client übergelaufen ist
+const SYNC_EVENT_TYPES = [
+    'transaction.created', 'user.created', 'user.updated', 'user.deleted', 'user.level_changed',
+    'dog.created', 'dog.updated', 'dog.deleted', 'document.created', 'document.deleted', 'resync',
+];
+
+const emptySyncStore = (): SyncStore => ({
+    cursor: null, users: new Map(), dogs: new Map(), transactions: new Map(), achievements: new Map(), documents: new Map(),
+});
+
+const applySyncChanges = (store: SyncStore, changes: any) => {
+    if (changes.full) SYNC_TABLES.forEach(table => store[table].clear());
+    SYNC_TABLES.forEach(table => {
+        for (const row of changes[table]) {
+            const known = store[table].get(row.id);
+            // Durch die Reserve des Cursors kommen Zeilen doppelt; keine ältere Version übernehmen.
+            // Aus Schreib-Antworten übernommene Zeilen (ohne version) ersetzt der Sync immer.
+            if (!known || known.version === undefined || row.version >= known.version) store[table].set(row.id, row);
+        }
+    });
+    for (const deletion of changes.deleted) {
+        store[deletion.table_name as SyncTable]?.delete(deletion.row_id);
+    }
+    store.cursor = changes.cursor;
+};
+
+const buildSyncView = (store: SyncStore) => {
+    const groupBy = (table: SyncTable, key: string) => {
+        const grouped = new Map<number, any[]>();
+        store[table].forEach(row => {
+            const list = grouped.get(row[key]);
+            if (list) list.push(row); else grouped.set(row[key], [row]);
+        });
+        return grouped;
+    };
+    const dogs = groupBy('dogs', 'owner_id');
+    const achievements = groupBy('achievements', 'user_id');
+    const documents = groupBy('documents', 'user_id');
+    // Gleiche Reihenfolge wie /api/users (nach Name) und /api/transactions (neueste zuerst)
+    const users = Array.from(store.users.values())
+        .sort((a, b) => a.name.localeCompare(b.name))
+        .map(user => ({
+            ...user,
+            dogs: (dogs.get(user.id) || []).sort((a, b) => a.id - b.id),
+            achievements: achievements.get(user.id) || [],
+            documents: documents.get(user.id) || [],
+        }));
+    const transactions = Array.from(store.transactions.values())
+        .sort((a, b) => new Date(b.date).getTime() - new Date(a.date).getTime());
+    return { users, transactions };
+};
+
+
 // --- HAUPT-APP ---
 const App: FC = () => {
     const [loggedInUser, setLoggedInUser] = useState<any | null>(null);
@@ -2509,6 +2584,70 @@ const App: FC = () => {
         setView(newView);
     };
 
+    // Stand des Delta-Syncs; Abrufe laufen nacheinander, damit jeder mit dem Cursor des vorherigen startet
+    const syncStore = useRef<SyncStore>(emptySyncStore());
+    const syncQueue = useRef<Promise<void>>(Promise.resolve());
+
+    const publishSyncStore = () => {
+        const { users: syncedUsers, transactions: syncedTransactions } = buildSyncView(syncStore.current);
+        setUsers(syncedUsers);
+        setCustomers(syncedUsers.filter((user: any) => user.role === 'kunde'));
+        setTransactions(syncedTransactions);
+        setLoggedInUser((prev: any) => {
+            const synced = prev && syncedUsers.find((user: any) => user.id === prev.id);
+            return synced ? { ...prev, ...synced } : prev;
+        });
+    };
+
+    const runSync = async () => {
+        const cursor = syncStore.current.cursor;
+        const changes = await apiClient.get(cursor ? `/api/sync?since=${encodeURIComponent(cursor)}` : '/api/sync', authToken);
+        applySyncChanges(syncStore.current, changes);
+        publishSyncStore();
+    };
+
+    // Nach Schreibzugriffen: nur die Änderungen seit dem letzten Abruf holen statt aller Daten
+    const syncAppData = () => {
+        const run = syncQueue.current.catch(() => undefined).then(runSync);
+        syncQueue.current = run;
+        return run;
+    };
+
+    // Schreib-Antworten mit include_aggregate=true enthalten den neuen Kundenstand (Guthaben, Level,
+    // Status, neue Leistungen); er wird direkt übernommen, ohne danach erneut abzurufen.
+    // Ohne Aggregat (z.B. ältere API) bleibt es beim Delta-Sync.
+    const applyWriteResult = async (result: any) => {
+        const { aggregate, ...row } = result || {};
+        if (!aggregate) return syncAppData();
+
+        const store = syncStore.current;
+        const customerPatch = { balance: aggregate.balance, level_id: aggregate.level_id, is_vip: aggregate.is_vip, is_expert: aggregate.is_expert };
+        const known = store.users.get(aggregate.user_id);
+        // Die Version bleibt die alte, damit der nächste Sync die vollständige Zeile übernimmt
+        if (known) store.users.set(aggregate.user_id, { ...known, ...customerPatch });
+
+        let achievements: (previous: any[]) => any[];
+        if (Array.isArray(row.achievements)) {
+            // Benutzer-Antworten enthalten alle Leistungen; ein Aufstieg verbraucht welche
+            const all = row.achievements.map((ach: any) => ({ ...ach, user_id: row.id }));
+            store.achievements.forEach((ach, id) => { if (ach.user_id === row.id) store.achievements.delete(id); });
+            all.forEach((ach: any) => store.achievements.set(ach.id, ach));
+            achievements = () => all;
+        } else {
+            // Buchung: neue Transaktion und die dabei erreichten Leistungen
+            const created = aggregate.new_achievements.map((ach: any) => ({ ...ach, user_id: aggregate.user_id }));
+            created.forEach((ach: any) => store.achievements.set(ach.id, ach));
+            store.transactions.set(row.id, row);
+            achievements = previous => [...previous, ...created];
+        }
+        publishSyncStore();
+
+        // Per QR-Code geöffnete Kunden liegen nicht in den Listen
+        setDirectAccessedCustomer((prev: any) => prev && prev.id === aggregate.user_id
+            ? { ...prev, ...customerPatch, achievements: achievements(prev.achievements || []) }
+            : prev);
+    };
+
     const fetchAppData = async () => {
         if (!authToken) {
             setIsLoading(false);
@@ -2516,26 +2655,18 @@ const App: FC = () => {
         }
         setIsLoading(true);
         try {
-            const currentUser = await apiClient.get('/api/users/me', authToken);
+            const [currentUser, levelRules] = await Promise.all([
+                apiClient.get('/api/users/me', authToken),
+                // Bei Fehlern bleiben die Standardregeln aktiv
+                apiClient.get('/api/levels/requirements', authToken).catch(() => null),
+            ]);
+            if (levelRules) applyLevelRules(levelRules);
             setLoggedInUser(currentUser);
 
-            if (currentUser.role === 'kunde') {
-                // Ein Kunde holt NUR seine eigenen Transaktionen.
-                // Der Aufruf von /api/users wird bewusst ausgelassen, um einen 403-Fehler zu vermeiden.
-                const transactionsResponse = await apiClient.get('/api/transactions', authToken);
-                setTransactions(transactionsResponse);
-                setCustomers([currentUser]);
-                setUsers([currentUser]);
-            } else {
-                // Admins und Mitarbeiter laden alles wie bisher.
-                const [usersResponse, transactionsResponse] = await Promise.all([
-                    apiClient.get('/api/users', authToken),
-                    apiClient.get('/api/transactions', authToken)
-                ]);
-                setCustomers(usersResponse.filter((user: any) => user.role === 'kunde'));
-                setUsers(usersResponse);
-                setTransactions(transactionsResponse);
-            }
+            // Erst-Synchronisation ohne Cursor: vollständiger Stand in der Sicht der Rolle
+            // (Kunden erhalten nur das eigene Konto und die eigenen Transaktionen)
+            syncStore.current = emptySyncStore();
+            await syncAppData();
 
         } catch (error) {
             console.error("Authentifizierung oder Datenabruf fehlgeschlagen, logge aus:", error);
@@ -2550,6 +2681,37 @@ const App: FC = () => {
         fetchAppData(); // initializeApp wurde zu fetchAppData umbenannt, also hier anpassen
     }, [authToken]);
 
+    // Live-Ereignisse (SSE): Änderungen anderer Geräte lösen einen Delta-Sync aus, statt zu pollen.
+    // EventSource kann keine Header senden, der Token geht daher als ?access_token= mit.
+    useEffect(() => {
+        if (!authToken || !loggedInUser) return;
+        const source = new EventSource(`${API_BASE_URL}/api/events?access_token=${encodeURIComponent(authToken)}`);
+        let timer: ReturnType<typeof setTimeout> | undefined;
+        let connected = false;
+        const scheduleSync = () => {
+            // Mehrere Ereignisse kurz hintereinander (z.B. ein Batch) mit einem Abruf abholen
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                syncAppData().catch(err => console.error("Sync nach Ereignis fehlgeschlagen:", err));
+            }, 300);
+        };
+        SYNC_EVENT_TYPES.forEach(type => source.addEventListener(type, scheduleSync));
+        source.addEventListener('level_rules.updated', () => {
+            apiClient.get('/api/levels/requirements', authToken)
+                .then(rules => { applyLevelRules(rules); publishSyncStore(); })
+                .catch(err => console.error("Fehler beim Laden der Level-Regeln:", err));
+        });
+        // Nach einem Verbindungsabbruch verbindet EventSource neu; verpasste Ereignisse holt der Sync nach
+        source.onopen = () => {
+            if (connected) scheduleSync();
+            connected = true;
+        };
+        return () => {
+            clearTimeout(timer);
+            source.close();
+        };
+    }, [authToken, loggedInUser?.id]);
+
     // Funktion, die beim Login aufgerufen wird
     const handleLoginSuccess = (token: string, user: any) => {
         localStorage.setItem('authToken', token); // Token im localStorage speichern
@@ -2561,6 +2723,7 @@ const App: FC = () => {
     // Funktion zum Ausloggen
     const handleLogout = () => {
         localStorage.removeItem('authToken');
+        syncStore.current = emptySyncStore();
         setAuthToken(null);
         setLoggedInUser(null);
         setDirectAccessedCustomer(null);
@@ -2570,12 +2733,10 @@ const App: FC = () => {
     const handleUpdateStatus = async (userId: string, statusType: 'vip' | 'expert', value: boolean) => {
         if (!authToken) return;
         try {
-            if (statusType === 'vip') {
-                await apiClient.setVipStatus(userId, value, authToken);
-            } else {
-                await apiClient.setExpertStatus(userId, value, authToken);
-            }
-            await fetchAppData();
+            const result = statusType === 'vip'
+                ? await apiClient.setVipStatus(userId, value, authToken)
+                : await apiClient.setExpertStatus(userId, value, authToken);
+            await applyWriteResult(result);
         } catch (error) {
             console.error(`Fehler beim Aktualisieren des ${statusType}-Status:`, error);
             alert(`Fehler: ${error}`);
@@ -2604,13 +2765,10 @@ const App: FC = () => {
         };
 
         try {
-            // Sende die Daten an das Backend
-            await apiClient.post('/api/transactions', transactionPayload, authToken);
-
-            // Einfachste Methode, um die UI zu aktualisieren: die Seite neu laden.
-            // So werden die neuen Kontostände und Transaktionslisten vom Server geholt.
+            // Sende die Daten an das Backend; die Antwort enthält den neuen Kundenstand
+            const result = await apiClient.post('/api/transactions?include_aggregate=true', transactionPayload, authToken);
             console.log('Transaktion erfolgreich gebucht!');
-            await fetchAppData();
+            await applyWriteResult(result);
         } catch (error) {
             console.error("Fehler beim Buchen der Transaktion:", error);
             alert(`Fehler: ${error}`);
@@ -2643,7 +2801,7 @@ const App: FC = () => {
             await apiClient.post('/api/users', payload, authToken);
 
             // 3. App-Daten neu laden, um den neuen Kunden in der Liste anzuzeigen
-            await fetchAppData();
+            await syncAppData();
             console.log('Kunde erfolgreich angelegt!');
 
         } catch (error) {
@@ -2660,9 +2818,9 @@ const App: FC = () => {
 
     const handleLevelUp = async (customerId: string, newLevelId: number) => {
         try {
-            await apiClient.put(`/api/users/${customerId}/level`, { level_id: newLevelId }, authToken);
+            const result = await apiClient.put(`/api/users/${customerId}/level?include_aggregate=true`, { level_id: newLevelId }, authToken);
             console.log(`Kunde erfolgreich auf Level ${newLevelId} hochgestuft!`);
-            await fetchAppData(); // Daten neu laden, um die UI zu aktualisieren
+            await applyWriteResult(result);
         } catch (error) {
             console.error("Fehler beim Level-Up:", error);
             alert(`Fehler: ${error}`);
@@ -2674,8 +2832,8 @@ const App: FC = () => {
         // Sende immer beide Werte, um den anderen Status zurückzusetzen
         const payload = { is_vip: newStatus, is_expert: false };
         try {
-            await apiClient.put(`/api/users/${customer.id}/status`, payload, authToken);
-            await fetchAppData();
+            const result = await apiClient.put(`/api/users/${customer.id}/status?include_aggregate=true`, payload, authToken);
+            await applyWriteResult(result);
             console.log(`VIP Status für ${customer.name} auf ${newStatus} gesetzt.`);
         } catch (error) {
             console.error("Fehler beim Ändern des VIP Status:", error);
@@ -2688,8 +2846,8 @@ const App: FC = () => {
         // Sende immer beide Werte, um den anderen Status zurückzusetzen
         const payload = { is_expert: newStatus, is_vip: false };
         try {
-            await apiClient.put(`/api/users/${customer.id}/status`, payload, authToken);
-            await fetchAppData();
+            const result = await apiClient.put(`/api/users/${customer.id}/status?include_aggregate=true`, payload, authToken);
+            await applyWriteResult(result);
             console.log(`Experten-Status für ${customer.name} auf ${newStatus} gesetzt.`);
         } catch (error) {
             console.error("Fehler beim Ändern des Experten-Status:", error);
@@ -2699,7 +2857,7 @@ const App: FC = () => {
         if (userModal.user) { // Bearbeiten eines bestehenden Benutzers
             try {
                 await apiClient.put(`/api/users/${userModal.user.id}`, userData, authToken);
-                await fetchAppData();
+                await syncAppData();
                 console.log('Benutzer erfolgreich aktualisiert!');
             } catch (error) {
                 console.error("Fehler beim Aktualisieren des Benutzers:", error);
@@ -2709,7 +2867,7 @@ const App: FC = () => {
             try {
                 // Das userData-Objekt enthält jetzt das Passwort aus dem Formular
                 await apiClient.post('/api/users', userData, authToken);
-                await fetchAppData();
+                await syncAppData();
                 console.log('Benutzer erfolgreich angelegt!');
             } catch (error) {
                 console.error("Fehler beim Anlegen des Benutzers:", error);
@@ -2723,7 +2881,7 @@ const App: FC = () => {
         if (deleteUserModal) {
             try {
                 await apiClient.delete(`/api/users/${deleteUserModal.id}`, authToken);
-                await fetchAppData(); // Lade die Benutzerliste neu
+                await syncAppData(); // Änderungen der Benutzerliste laden
                 console.log('Benutzer erfolgreich gelöscht!');
             } catch (error) {
                 console.error("Fehler beim Löschen des Benutzers:", error);
@@ -2771,7 +2929,7 @@ const App: FC = () => {
             }
 
             // 3. App-Daten neu laden
-            await fetchAppData();
+            await syncAppData();
             console.log('Daten erfolgreich gespeichert!');
 
         } catch (error) {
@@ -2799,7 +2957,7 @@ const App: FC = () => {
                 // Benutze cleanDogData statt dogData
                 await apiClient.post(`/api/users/${customerId}/dogs`, cleanDogData, authToken);
             }
-            await fetchAppData();
+            await syncAppData();
             console.log("Hundedaten erfolgreich gespeichert.");
         } catch (error) {
             console.error("Fehler beim Speichern des Hundes:", error);
@@ -2811,7 +2969,7 @@ const App: FC = () => {
         if (!deletingDog) return;
         try {
             await apiClient.delete(`/api/dogs/${deletingDog.id}`, authToken);
-            await fetchAppData();
+            await syncAppData();
             console.log("Hund erfolgreich gelöscht.");
         } catch (error) {
             console.error("Fehler beim Löschen des Hundes:", error);
@@ -2828,7 +2986,7 @@ const App: FC = () => {
                 await apiClient.upload(`/api/users/${customerId}/documents`, file, authToken);
             }
             console.log(`${files.length} Dokument(e) erfolgreich hochgeladen.`);
-            await fetchAppData(); // Lade die Daten neu, um die Liste zu aktualisieren
+            await syncAppData(); // Änderungen laden, um die Liste zu aktualisieren
         } catch (error) {
             console.error("Fehler beim Dokumenten-Upload:", error);
             // Optional: Zeigen Sie eine Fehlermeldung an
@@ -2844,7 +3002,7 @@ const App: FC = () => {
         try {
             await apiClient.delete(`/api/documents/${deletingDocument.id}`, authToken);
             console.log("Dokument erfolgreich gelöscht.");
-            await fetchAppData();
+            await syncAppData();
         } catch (error) {
             console.error("Fehler beim Löschen des Dokuments:", error);
         }
@@ -3020,7 +3178,7 @@ const App: FC = () => {
                                 users={users}
                                 onUploadDocuments={(files) => onUploadDocuments(files, String(customer.id))}
                                 onDeleteDocument={setDeletingDocument}
-                                fetchAppData={fetchAppData}
+                                fetchAppData={syncAppData}
                                 authToken={authToken}
                                 onDeleteUserClick={setDeleteUserModal}
                                 setDogFormModal={setDogFormModal}
@@ -3054,7 +3212,7 @@ const App: FC = () => {
                 setView={handleSetView}
                 handleLevelUp={handleLevelUp}
                 onSave={handleSaveCustomerDetails}
-                fetchAppData={fetchAppData}
+                fetchAppData={syncAppData}
                 currentUser={loggedInUser}
                 users={users}
                 onUploadDocuments={onUploadDocuments}
@@ -3078,6 +3236,7 @@ const App: FC = () => {
                     setView={handleSetView}
                     onConfirmTransaction={handleConfirmTransaction}
                     currentUser={loggedInUser}
+                    authToken={authToken}
                 />;
             }
 
@@ -3116,6 +3275,7 @@ const App: FC = () => {
                         customers={visibleCustomers}
                         transactions={visibleTransactions}
                         currentUser={loggedInUser}
+                        authToken={authToken}
                         onKpiClick={kpiClickHandler}
                         setView={handleSetView}
                     />;
@@ -3125,6 +3285,7 @@ const App: FC = () => {
                     customers={visibleCustomers}
                     transactions={visibleTransactions}
                     currentUser={loggedInUser}
+                    authToken={authToken}
                     onKpiClick={kpiClickHandler}
                     setView={handleSetView}
                 />;
@@ -34,28 +34,55 @@ async function syncQueuedRequests() {
     const queuedRequests = await store.getAll();
 
     console.log('[Service Worker] Found requests to sync:', queuedRequests);
+    if (queuedRequests.length === 0) return;
 
-    return Promise.all(queuedRequests.map(req =>
-        fetch(req.url, {
-            method: req.method,
+    // Alle vorgemerkten Anfragen in Aufnahme-Reihenfolge als EIN Batch senden,
+    // statt sie parallel einzeln abzufeuern (Reihenfolge + eine Verbindung).
+    queuedRequests.sort((a, b) => (a.timestamp || 0) - (b.timestamp || 0));
+    const apiOrigin = new URL(queuedRequests[0].url).origin;
+    const token = queuedRequests[queuedRequests.length - 1].token;
+
+    try {
+        const response = await fetch(`${apiOrigin}/api/batch`, {
+            method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'Authorization': `Bearer ${req.token}`,
+                'Authorization': `Bearer ${token}`,
             },
-            body: req.body ? JSON.stringify(req.body) : null,
-        })
-        .then(response => {
-            if (response.ok) {
-                console.log(`[Service Worker] Request ${req.id} sent successfully, deleting from queue.`);
-                return deleteQueuedRequestFromDB(req.id);
+            body: JSON.stringify({
+                operations: queuedRequests.map(req => ({
+                    id: String(req.id),
+                    method: req.method,
+                    path: new URL(req.url).pathname,
+                    body: req.body || null,
+                    // Geht die Antwort verloren, wird der Batch erneut gesendet; mit demselben
+                    // Schlüssel liefert der Server die gespeicherte Antwort statt doppelt zu buchen.
+                    idempotency_key: req.idempotencyKey || `queued-${req.id}-${req.timestamp}`,
+                })),
+            }),
+        });
+        if (!response.ok) {
+            console.error('[Service Worker] Batch request failed, will retry later.', response);
+            return;
+        }
+        const { results } = await response.json();
+        for (const result of results) {
+            // Erfolgreiche und endgültig abgelehnte (4xx) Anfragen aus der Warteschlange entfernen,
+            // Serverfehler (5xx) beim nächsten Sync erneut versuchen.
+            if (result.status < 500) {
+                if (result.status >= 400) {
+                    console.error(`[Service Worker] Request ${result.id} rejected:`, result.body);
+                } else {
+                    console.log(`[Service Worker] Request ${result.id} sent successfully, deleting from queue.`);
+                }
+                await deleteQueuedRequestFromDB(Number(result.id));
             } else {
-                console.error(`[Service Worker] Server error for request ${req.id}, will retry later.`, response);
+                console.error(`[Service Worker] Server error for request ${result.id}, will retry later.`, result.body);
             }
-        })
-        .catch(error => {
-            console.error(`[Service Worker] Network error for request ${req.id}, will retry later.`, error);
-        })
-    ));
+        }
+    } catch (error) {
+        console.error('[Service Worker] Network error during batch sync, will retry later.', error);
+    }
 }
 
 // --- IndexedDB-Helfer direkt im Service Worker ---